@@ -23,6 +23,7 @@ DEFAULT_CONFIG = {
     'channels': 4,  #according to the paper
     'r': 'dijkstra',
     'w': 'first-fit',
+    'routing_backend': 'networkx',  # 'networkx' or 'csgraph' (scipy)
     'rwa': None,
     'load': 190,
     'load_min': 30,
@@ -38,6 +39,12 @@ DEFAULT_CONFIG = {
     'runner': 'fb_passive_qkp',  # 'base_no_upd' or 'fb_no_upd' 
     'write_qkp_log': True,
     'write_qkp_usage_log': True,
+    'qkp_log_mode': 'csv',  # 'csv', 'binary', 'aggregate' or 'memory'
+    'qkp_log_sample': 1,  # keep one QKP log record out of every N
+    'qkp_rate': 0.0,  # keys generated per link per time unit (0: bypasses only)
+    'qkp_cap': None,  # most keys a link pool accrues (None: unbounded)
+    'qkp_snapshot_interval': 0,  # slots between QKP pool snapshots (0: off)
+    'aux_cache_dir': None,  # on-disk cache of auxiliary layers / route tables
      # or 'base_upd_rearrange' or 'base_upd_no_rearrange' or
      #'fb_upd_rearrange' or 'pb_upd_rearrange' or 'pb_modified'
      #or 'fb_passive_qkp'
@@ -57,6 +64,7 @@ def main(config: dict | None = None) -> int:
             channels=cfg['channels'],
             r=cfg.get('r'),
             w=cfg.get('w'),
+            routing_backend=cfg.get('routing_backend', 'networkx'),
             rwa=cfg.get('rwa'),
             y=cfg.get('y'),
             load=cfg['load'],
@@ -73,6 +81,12 @@ def main(config: dict | None = None) -> int:
             runner=cfg['runner'],
             write_qkp_log=cfg.get('write_qkp_log', False),
             write_qkp_usage_log=cfg.get('write_qkp_usage_log', False),
+            qkp_log_mode=cfg.get('qkp_log_mode', 'csv'),
+            qkp_log_sample=cfg.get('qkp_log_sample', 1),
+            qkp_rate=cfg.get('qkp_rate', 0.0),
+            qkp_cap=cfg.get('qkp_cap', None),
+            qkp_snapshot_interval=cfg.get('qkp_snapshot_interval', 0),
+            aux_cache_dir=cfg.get('aux_cache_dir', None),
         )
 
         # Validate and run
@@ -6,7 +6,8 @@
 
 import logging
 from timeit import default_timer  # https://stackoverflow.com/a/25823885/3798300
-from typing import Callable
+from functools import partial
+from typing import Callable, Optional
 from argparse import Namespace
 
 
@@ -29,7 +30,8 @@ __all__ = (
 logger = logging.getLogger(__name__)
 
 
-def get_net_instance_from_args(topname: str, numch: int) -> Network:
+def get_net_instance_from_args(topname: str, numch: int,
+                               cache_dir: Optional[str] = None) -> Network:
     """Instantiates a Network object from CLI string identifiers
 
     This is useful because rwa_wdm supports multiple network topology
@@ -37,8 +39,11 @@ def get_net_instance_from_args(topname: str, numch: int) -> Network:
     directly.
 
     Args:
-        topname: short identifier for the network topology
+        topname: short identifier for the network topology, optionally
+            followed by '@' and comma-separated auxiliary-layer thresholds
         numch: number of wavelength channels per network link
+        cache_dir: on-disk cache of auxiliary layers and route tables, see
+            `rwa_wdm.net.cache`
 
     Returns:
         Network: network topology instance
@@ -49,29 +54,39 @@ def get_net_instance_from_args(topname: str, numch: int) -> Network:
     """
     if topname == 'nsf':
         from .net import NationalScienceFoundation
-        return NationalScienceFoundation(numch)
+        net = NationalScienceFoundation(numch)
     elif topname == 'clara':
         from .net import CooperacionLatinoAmericana
-        return CooperacionLatinoAmericana(numch)
+        net = CooperacionLatinoAmericana(numch)
     elif topname == 'janet':
         from .net import JointAcademicNetwork
-        return JointAcademicNetwork(numch)
+        net = JointAcademicNetwork(numch)
     elif topname == 'rnp':
         from .net import RedeNacionalPesquisa
-        return RedeNacionalPesquisa(numch)
+        net = RedeNacionalPesquisa(numch)
     elif topname == 'pdf':
         from .net import MyTopology
-        return MyTopology(numch)
+        net = MyTopology(numch)
     elif topname == 'auxgraph_demo_net':
         from .net import auxgraph_demo_net
-        return auxgraph_demo_net(numch)
+        net = auxgraph_demo_net(numch)
+    elif '@' in topname:
+        # auxiliary layers over another topology, e.g. 'nsf@2,3'
+        from .net import AuxGraphNetwork
+        base, thresholds = topname.split('@', 1)
+        net = AuxGraphNetwork(get_net_instance_from_args(base, numch),
+                              [float(t) for t in thresholds.split(',')],
+                              cache_dir)
     else:
         raise ValueError('No network named "%s"' % topname)
+    net.route_cache_dir = cache_dir
+    return net
 
 
 def get_rwa_algorithm_from_args(r_alg: str, wa_alg: str, rwa_alg: str,
                                 ga_popsize: int, ga_ngen: int,
                                 ga_xrate: float, ga_mrate: float,
+                                routing_backend: str = 'networkx',
                                 ) -> Callable:
     """Defines the main function to perform RWA from CLI string args
 
@@ -83,6 +98,8 @@ def get_rwa_algorithm_from_args(r_alg: str, wa_alg: str, rwa_alg: str,
         ga_ngen: number of generations for the GA-RWA procedure
         ga_xrate: crossover rate for the GA-RWA procedure
         ga_mrate: mutation rate for the GA-RWA procedure
+        routing_backend: shortest-path backend used by Dijkstra and Yen,
+            either 'networkx' (reference) or 'csgraph' (scipy)
 
     Returns:
         callable: a function that combines a routing algorithm and a
@@ -91,34 +108,48 @@ def get_rwa_algorithm_from_args(r_alg: str, wa_alg: str, rwa_alg: str,
 
     Raises:
         ValueError: if neither `rwa_alg` nor both `r_alg` and `wa_alg`
-            are provided
+            are provided, or if `routing_backend` is unknown
 
     """
 
     if r_alg is not None and wa_alg is not None:
+        if routing_backend not in ('networkx', 'csgraph'):
+            raise ValueError('Unknown routing backend "%s"' % routing_backend)
         if r_alg == 'dijkstra':
             if wa_alg == 'vertex-coloring':
                 from .rwa import dijkstra_vertex_coloring
-                return dijkstra_vertex_coloring
+                return partial(dijkstra_vertex_coloring, backend=routing_backend)
             elif wa_alg == 'first-fit':
                 from .rwa import dijkstra_first_fit
-                return dijkstra_first_fit
+                return partial(dijkstra_first_fit, backend=routing_backend)
             elif wa_alg == 'random-fit':
                 from .rwa import dijkstra_random_fit
-                return dijkstra_random_fit
+                return partial(dijkstra_random_fit, backend=routing_backend)
+            elif wa_alg == 'most-used':
+                from .rwa import dijkstra_most_used
+                return partial(dijkstra_most_used, backend=routing_backend)
+            elif wa_alg == 'least-used':
+                from .rwa import dijkstra_least_used
+                return partial(dijkstra_least_used, backend=routing_backend)
             else:
                 raise ValueError('Unknown wavelength assignment '
                                  'algorithm "%s"' % wa_alg)
         elif r_alg == 'yen':
             if wa_alg == 'vertex-coloring':
                 from .rwa import yen_vertex_coloring
-                return yen_vertex_coloring
+                return partial(yen_vertex_coloring, backend=routing_backend)
             elif wa_alg == 'first-fit':
                 from .rwa import yen_first_fit
-                return yen_first_fit
+                return partial(yen_first_fit, backend=routing_backend)
             elif wa_alg == 'random-fit':
                 from .rwa import yen_random_fit
-                return yen_random_fit
+                return partial(yen_random_fit, backend=routing_backend)
+            elif wa_alg == 'most-used':
+                from .rwa import yen_most_used
+                return partial(yen_most_used, backend=routing_backend)
+            elif wa_alg == 'least-used':
+                from .rwa import yen_least_used
+                return partial(yen_least_used, backend=routing_backend)
             else:
                 raise ValueError('Unknown wavelength assignment '
                                  'algorithm "%s"' % wa_alg)
@@ -159,7 +190,8 @@ def simulator(args: Namespace) -> None:
     time_per_simulation = []
     for simulation in range(args.num_sim):
         sim_time = default_timer()
-        net = get_net_instance_from_args(args.topology, args.channels)
+        net = get_net_instance_from_args(args.topology, args.channels,
+                                         getattr(args, 'aux_cache_dir', None))
 
         # Configure dijkstra debug logger to a per-simulation file if
         # requested. We do this here so the logger doesn't intermingle with
@@ -199,7 +231,8 @@ def simulator(args: Namespace) -> None:
                 getattr(args, 'pop_size', None),
                 getattr(args, 'num_gen', None),
                 getattr(args, 'cross_rate', None),
-                getattr(args, 'mut_rate', None)
+                getattr(args, 'mut_rate', None),
+                getattr(args, 'routing_backend', 'networkx'),
             )
 
             blocklist = []
@@ -276,31 +309,11 @@ def simulator(args: Namespace) -> None:
                     current_time = event_time
                     
                     # Advance time to this event BEFORE processing it:
-                    # release channels whose timers expire and decrement holding times.
+                    # retire lightpaths and release channels whose timers expire.
                     # This ensures resources that become free at t=event_time are
-                    # available to the event occurring at t=event_time, and avoids
-                    # subtracting the prior interval from newly-created lightpaths.
-                    for lightpath in net.t.lightpaths[:]:
-                        if lightpath.holding_time > until_next:
-                            lightpath.holding_time -= until_next
-                        else:
-                            net.t.remove_lightpath_by_id(lightpath.id)
-
-                    for edge in net.get_edges():
-                        if len(edge) == 2:
-                            i, j = edge
-                        else:
-                            i, j = edge[0], edge[1]
-                        for w in range(net.nchannels):
-                            if net.t[i][j][w] > until_next:
-                                net.t[i][j][w] -= until_next
-                            else:
-                                net.t[i][j][w] = 0
-                                if not net.n[i][j][w]:
-                                    net.n[i][j][w] = 1  # free channel
-
-                            net.t[j][i][w] = net.t[i][j][w]
-                            net.n[j][i][w] = net.n[i][j][w]
+                    # available to the event occurring at t=event_time, and newly-created
+                    # lightpaths expire relative to the current clock.
+                    net.advance_clock(until_next)
                     # optional debug trace for events
                     if getattr(args, 'debug_updates', False):
                         print(f"[event] t={current_time} type={event_type} call={call} last={is_last_update}")
@@ -387,7 +400,7 @@ def simulator(args: Namespace) -> None:
                                     except Exception:
                                         ok = False
                                         break
-                                    if not net.n[i_check][j_check][w_chk]:
+                                    if not net.is_free(i_check, j_check, w_chk):
                                         ok = False
                                         break
                                 if ok:
@@ -401,7 +414,7 @@ def simulator(args: Namespace) -> None:
                             else:
                                 for idx in range(len(route) - 1):
                                     i_check, j_check = route[idx], route[idx + 1]
-                                    if not net.n[i_check][j_check][w_alloc]:
+                                    if not net.is_free(i_check, j_check, w_alloc):
                                         ok = False
                                         break
                                 if ok:
@@ -444,7 +457,7 @@ def simulator(args: Namespace) -> None:
                         # allocate resources and set holding time
                         holding_time = 10
                         lightpath.holding_time = holding_time
-                        net.t.add_lightpath(lightpath)
+                        net.add_lightpath(lightpath)
                         # accumulate resource usage: holding_time * number_of_links
                         links_list = list(lightpath.links)
                         n_links = len(links_list) if links_list is not None else 0
@@ -459,19 +472,13 @@ def simulator(args: Namespace) -> None:
                                     w = getattr(lightpath, 'w', None)
                                     if w is None:
                                         continue
-                                net.n[i][j][w] = 0  # lock channel
-                                net.t[i][j][w] = holding_time
-                                net.n[j][i][w] = net.n[i][j][w]
-                                net.t[j][i][w] = net.t[i][j][w]
+                                net.occupy_channel(i, j, w, holding_time)  # lock channel
                         else:
                             for (i, j) in links_list:
                                 w = getattr(lightpath, 'w', None)
                                 if w is None:
                                     continue
-                                net.n[i][j][w] = 0  # lock channel
-                                net.t[i][j][w] = holding_time
-                                net.n[j][i][w] = net.n[i][j][w]
-                                net.t[j][i][w] = net.t[i][j][w]
+                                net.occupy_channel(i, j, w, holding_time)  # lock channel
                         # record original allocation for this call (only for request allocations)
                         if not is_update:
                             try:
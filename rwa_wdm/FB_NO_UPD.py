@@ -6,7 +6,8 @@
 
 import logging
 from timeit import default_timer  # https://stackoverflow.com/a/25823885/3798300
-from typing import Callable
+from functools import partial
+from typing import Callable, Optional
 from argparse import Namespace
 
 
@@ -27,7 +28,8 @@ __all__ = (
 logger = logging.getLogger(__name__)
 
 
-def get_net_instance_from_args(topname: str, numch: int) -> Network:
+def get_net_instance_from_args(topname: str, numch: int,
+                               cache_dir: Optional[str] = None) -> Network:
     """Instantiates a Network object from CLI string identifiers
 
     This is useful because rwa_wdm supports multiple network topology
@@ -35,8 +37,11 @@ def get_net_instance_from_args(topname: str, numch: int) -> Network:
     directly.
 
     Args:
-        topname: short identifier for the network topology
+        topname: short identifier for the network topology, optionally
+            followed by '@' and comma-separated auxiliary-layer thresholds
         numch: number of wavelength channels per network link
+        cache_dir: on-disk cache of auxiliary layers and route tables, see
+            `rwa_wdm.net.cache`
 
     Returns:
         Network: network topology instance
@@ -47,32 +52,42 @@ def get_net_instance_from_args(topname: str, numch: int) -> Network:
     """
     if topname == 'nsf':
         from .net import NationalScienceFoundation
-        return NationalScienceFoundation(numch)
+        net = NationalScienceFoundation(numch)
     elif topname == 'clara':
         from .net import CooperacionLatinoAmericana
-        return CooperacionLatinoAmericana(numch)
+        net = CooperacionLatinoAmericana(numch)
     elif topname == 'janet':
         from .net import JointAcademicNetwork
-        return JointAcademicNetwork(numch)
+        net = JointAcademicNetwork(numch)
     elif topname == 'rnp':
         from .net import RedeNacionalPesquisa
-        return RedeNacionalPesquisa(numch)
+        net = RedeNacionalPesquisa(numch)
     elif topname == 'pdf':
         from .net import MyTopology
-        return MyTopology(numch)
+        net = MyTopology(numch)
     elif topname == 'auxgraph_demo_net':
         from .net import auxgraph_demo_net
-        return auxgraph_demo_net(numch)
+        net = auxgraph_demo_net(numch)
     elif topname == 'auxgraph_aux_d2':
         from .net import auxgraph_aux_d2
-        return auxgraph_aux_d2(numch)
+        net = auxgraph_aux_d2(numch, cache_dir)
+    elif '@' in topname:
+        # auxiliary layers over another topology, e.g. 'nsf@2,3'
+        from .net import AuxGraphNetwork
+        base, thresholds = topname.split('@', 1)
+        net = AuxGraphNetwork(get_net_instance_from_args(base, numch),
+                              [float(t) for t in thresholds.split(',')],
+                              cache_dir)
     else:
         raise ValueError('No network named "%s"' % topname)
+    net.route_cache_dir = cache_dir
+    return net
 
 
 def get_rwa_algorithm_from_args(r_alg: str, wa_alg: str, rwa_alg: str,
                                 ga_popsize: int, ga_ngen: int,
                                 ga_xrate: float, ga_mrate: float,
+                                routing_backend: str = 'networkx',
                                 ) -> Callable:
     """Defines the main function to perform RWA from CLI string args
 
@@ -84,6 +99,8 @@ def get_rwa_algorithm_from_args(r_alg: str, wa_alg: str, rwa_alg: str,
         ga_ngen: number of generations for the GA-RWA procedure
         ga_xrate: crossover rate for the GA-RWA procedure
         ga_mrate: mutation rate for the GA-RWA procedure
+        routing_backend: shortest-path backend used by Dijkstra and Yen,
+            either 'networkx' (reference) or 'csgraph' (scipy)
 
     Returns:
         callable: a function that combines a routing algorithm and a
@@ -92,34 +109,48 @@ def get_rwa_algorithm_from_args(r_alg: str, wa_alg: str, rwa_alg: str,
 
     Raises:
         ValueError: if neither `rwa_alg` nor both `r_alg` and `wa_alg`
-            are provided
+            are provided, or if `routing_backend` is unknown
 
     """
 
     if r_alg is not None and wa_alg is not None:
+        if routing_backend not in ('networkx', 'csgraph'):
+            raise ValueError('Unknown routing backend "%s"' % routing_backend)
         if r_alg == 'dijkstra':
             if wa_alg == 'vertex-coloring':
                 from .rwa import dijkstra_vertex_coloring
-                return dijkstra_vertex_coloring
+                return partial(dijkstra_vertex_coloring, backend=routing_backend)
             elif wa_alg == 'first-fit':
                 from .rwa import dijkstra_first_fit
-                return dijkstra_first_fit
+                return partial(dijkstra_first_fit, backend=routing_backend)
             elif wa_alg == 'random-fit':
                 from .rwa import dijkstra_random_fit
-                return dijkstra_random_fit
+                return partial(dijkstra_random_fit, backend=routing_backend)
+            elif wa_alg == 'most-used':
+                from .rwa import dijkstra_most_used
+                return partial(dijkstra_most_used, backend=routing_backend)
+            elif wa_alg == 'least-used':
+                from .rwa import dijkstra_least_used
+                return partial(dijkstra_least_used, backend=routing_backend)
             else:
                 raise ValueError('Unknown wavelength assignment '
                                  'algorithm "%s"' % wa_alg)
         elif r_alg == 'yen':
             if wa_alg == 'vertex-coloring':
                 from .rwa import yen_vertex_coloring
-                return yen_vertex_coloring
+                return partial(yen_vertex_coloring, backend=routing_backend)
             elif wa_alg == 'first-fit':
                 from .rwa import yen_first_fit
-                return yen_first_fit
+                return partial(yen_first_fit, backend=routing_backend)
             elif wa_alg == 'random-fit':
                 from .rwa import yen_random_fit
-                return yen_random_fit
+                return partial(yen_random_fit, backend=routing_backend)
+            elif wa_alg == 'most-used':
+                from .rwa import yen_most_used
+                return partial(yen_most_used, backend=routing_backend)
+            elif wa_alg == 'least-used':
+                from .rwa import yen_least_used
+                return partial(yen_least_used, backend=routing_backend)
             else:
                 raise ValueError('Unknown wavelength assignment '
                                  'algorithm "%s"' % wa_alg)
@@ -161,7 +192,8 @@ def simulator(args: Namespace) -> None:
     time_per_simulation = []
     for simulation in range(args.num_sim):
         sim_time = default_timer()
-        net = get_net_instance_from_args(args.topology, args.channels)
+        net = get_net_instance_from_args(args.topology, args.channels,
+                                         getattr(args, 'aux_cache_dir', None))
 
         # Configure dijkstra debug logger to a per-simulation file if
         # requested. We do this here so the logger doesn't intermingle with
@@ -202,6 +234,7 @@ def simulator(args: Namespace) -> None:
             getattr(args, 'num_gen', None),
             getattr(args, 'cross_rate', None),
             getattr(args, 'mut_rate', None),
+            getattr(args, 'routing_backend', 'networkx'),
         )
         blocklist = []
         blocks_per_erlang = []
@@ -311,12 +344,12 @@ def simulator(args: Namespace) -> None:
                                 w = lightpath.w_list[idx]
                             except Exception:
                                 w = getattr(lightpath, 'w', None)
-                            if w is None or not net.n[i][j][w]:
+                            if w is None or not net.is_free(i, j, w):
                                 lightpath = None
                                 break
                     else:
                         for (i, j) in links_list:
-                            if not net.n[i][j][lightpath.w]:
+                            if not net.is_free(i, j, lightpath.w):
                                 lightpath = None
                                 break
                 lightpath_debug = getattr(args, 'debug_lightpath', False)
@@ -336,11 +369,17 @@ def simulator(args: Namespace) -> None:
                     else:
                         alloc_time = holding_time
 
+                    # the extended TP holding time must not run into an
+                    # advance reservation on the channels locked
+                    alloc_time = net.tp_alloc_time(
+                        lightpath.links, getattr(lightpath, 'w_list', None) or
+                        lightpath.w, holding_time, alloc_time)
+
                     # assign the holding_time to the Lightpath object and to
                     # the per-link traffic matrix so both representations stay
                     # in sync.
                     lightpath.holding_time = alloc_time
-                    net.t.add_lightpath(lightpath)
+                    net.add_lightpath(lightpath)
                     links_list = list(lightpath.links)
                     # allocate per-link wavelengths when available
                     if hasattr(lightpath, 'w_list') and lightpath.w_list:
@@ -351,60 +390,17 @@ def simulator(args: Namespace) -> None:
                                 w = getattr(lightpath, 'w', None)
                             if w is None:
                                 continue
-                            net.n[i][j][w] = 0  # lock channel
-                            net.t[i][j][w] = alloc_time
-                            # make it symmetric
-                            net.n[j][i][w] = net.n[i][j][w]
-                            net.t[j][i][w] = net.t[i][j][w]
+                            net.occupy_channel(i, j, w, alloc_time)  # lock channel
                     else:
                         for (i, j) in links_list:
                             w = getattr(lightpath, 'w', None)
                             if w is None:
                                 continue
-                            net.n[i][j][w] = 0  # lock channel
-                            net.t[i][j][w] = alloc_time
-                            # make it symmetric
-                            net.n[j][i][w] = net.n[i][j][w]
-                            net.t[j][i][w] = net.t[i][j][w]
-
-                # FIXME The following two routines below are part of the same
-                # one: decreasing the time network resources remain allocated
-                # to connections, and removing finished connections from the
-                # traffic matrix. This, however, should be a single routine
-                # iterating over lightpaths links instead of all edges, so when
-                # the time is up on all links of a lightpath, the lightpath
-                # might be popped from the matrix's list. I guess the problem
-                # is the random initialisation of the traffic matrix's holding
-                # times during network object instantiation, but if this is
-                # indeed the fact it needs some consistent testing.
-                # iterate over a copy because we may remove items while iterating
-                
-                for lightpath in net.t.lightpaths:
-                    if lightpath.holding_time > until_next:
-                        lightpath.holding_time -= until_next
-                    else:
-                        # time's up: remove conn from traffic matrix's list
-                        net.t.remove_lightpath_by_id(lightpath.id)
-
-                # Update *all* channels that are still in use
-                for edge in net.get_edges():
-                    # support (i,j) or (i,j,weight)
-                    if len(edge) == 2:
-                        i, j = edge
-                    else:
-                        i, j = edge[0], edge[1]
-                    for w in range(net.nchannels):
-                        if net.t[i][j][w] > until_next:
-                            net.t[i][j][w] -= until_next
-                        else:
-                            # time's up: free channel
-                            net.t[i][j][w] = 0
-                            if not net.n[i][j][w]:
-                                net.n[i][j][w] = 1  # free channel
-
-                        # make matrices symmetric
-                        net.t[j][i][w] = net.t[i][j][w]
-                        net.n[j][i][w] = net.n[i][j][w]
+                            net.occupy_channel(i, j, w, alloc_time)  # lock channel
+
+                # retire finished connections and release the channels whose
+                # holding time is up
+                net.advance_clock(until_next)
 
             blocklist.append(blocks)
             blocks_per_erlang.append(100.0 * blocks / args.calls)
@@ -6,7 +6,8 @@
 
 import logging
 from timeit import default_timer  # https://stackoverflow.com/a/25823885/3798300
-from typing import Callable
+from functools import partial
+from typing import Callable, Optional
 from argparse import Namespace
 
 
@@ -14,10 +15,13 @@ import numpy as np
 import shutil
 import os
 import heapq
+from datetime import datetime
 
 # normal package-relative import (works when running as a module)
 from .io import write_bp_to_disk, write_it_to_disk, write_SP_A_to_disk, write_SP_R_to_disk, plot_bp, plot_sp_a, plot_sp_r
 from .net import Network
+from .net.qkplog import CsvSink, make_qkp_sink
+from .net.qkpsnap import QkpSnapshots
 
 
 __all__ = (
@@ -29,7 +33,8 @@ __all__ = (
 logger = logging.getLogger(__name__)
 
 
-def get_net_instance_from_args(topname: str, numch: int) -> Network:
+def get_net_instance_from_args(topname: str, numch: int,
+                               cache_dir: Optional[str] = None) -> Network:
     """Instantiates a Network object from CLI string identifiers
 
     This is useful because rwa_wdm supports multiple network topology
@@ -37,8 +42,11 @@ def get_net_instance_from_args(topname: str, numch: int) -> Network:
     directly.
 
     Args:
-        topname: short identifier for the network topology
+        topname: short identifier for the network topology, optionally
+            followed by '@' and comma-separated auxiliary-layer thresholds
         numch: number of wavelength channels per network link
+        cache_dir: on-disk cache of auxiliary layers and route tables, see
+            `rwa_wdm.net.cache`
 
     Returns:
         Network: network topology instance
@@ -49,32 +57,42 @@ def get_net_instance_from_args(topname: str, numch: int) -> Network:
     """
     if topname == 'nsf':
         from .net import NationalScienceFoundation
-        return NationalScienceFoundation(numch)
+        net = NationalScienceFoundation(numch)
     elif topname == 'clara':
         from .net import CooperacionLatinoAmericana
-        return CooperacionLatinoAmericana(numch)
+        net = CooperacionLatinoAmericana(numch)
     elif topname == 'janet':
         from .net import JointAcademicNetwork
-        return JointAcademicNetwork(numch)
+        net = JointAcademicNetwork(numch)
     elif topname == 'rnp':
         from .net import RedeNacionalPesquisa
-        return RedeNacionalPesquisa(numch)
+        net = RedeNacionalPesquisa(numch)
     elif topname == 'pdf':
         from .net import MyTopology
-        return MyTopology(numch)
+        net = MyTopology(numch)
     elif topname == 'auxgraph_demo_net':
         from .net import auxgraph_demo_net
-        return auxgraph_demo_net(numch)
+        net = auxgraph_demo_net(numch)
     elif topname == 'auxgraph_aux_d2':
         from .net import auxgraph_aux_d2
-        return auxgraph_aux_d2(numch)
+        net = auxgraph_aux_d2(numch, cache_dir)
+    elif '@' in topname:
+        # auxiliary layers over another topology, e.g. 'nsf@2,3'
+        from .net import AuxGraphNetwork
+        base, thresholds = topname.split('@', 1)
+        net = AuxGraphNetwork(get_net_instance_from_args(base, numch),
+                              [float(t) for t in thresholds.split(',')],
+                              cache_dir)
     else:
         raise ValueError('No network named "%s"' % topname)
+    net.route_cache_dir = cache_dir
+    return net
 
 
 def get_rwa_algorithm_from_args(r_alg: str, wa_alg: str, rwa_alg: str,
                                 ga_popsize: int, ga_ngen: int,
                                 ga_xrate: float, ga_mrate: float,
+                                routing_backend: str = 'networkx',
                                 ) -> Callable:
     """Defines the main function to perform RWA from CLI string args
 
@@ -86,6 +104,8 @@ def get_rwa_algorithm_from_args(r_alg: str, wa_alg: str, rwa_alg: str,
         ga_ngen: number of generations for the GA-RWA procedure
         ga_xrate: crossover rate for the GA-RWA procedure
         ga_mrate: mutation rate for the GA-RWA procedure
+        routing_backend: shortest-path backend used by Dijkstra and Yen,
+            either 'networkx' (reference) or 'csgraph' (scipy)
 
     Returns:
         callable: a function that combines a routing algorithm and a
@@ -94,34 +114,48 @@ def get_rwa_algorithm_from_args(r_alg: str, wa_alg: str, rwa_alg: str,
 
     Raises:
         ValueError: if neither `rwa_alg` nor both `r_alg` and `wa_alg`
-            are provided
+            are provided, or if `routing_backend` is unknown
 
     """
 
     if r_alg is not None and wa_alg is not None:
+        if routing_backend not in ('networkx', 'csgraph'):
+            raise ValueError('Unknown routing backend "%s"' % routing_backend)
         if r_alg == 'dijkstra':
             if wa_alg == 'vertex-coloring':
                 from .rwa import dijkstra_vertex_coloring
-                return dijkstra_vertex_coloring
+                return partial(dijkstra_vertex_coloring, backend=routing_backend)
             elif wa_alg == 'first-fit':
                 from .rwa import dijkstra_first_fit
-                return dijkstra_first_fit
+                return partial(dijkstra_first_fit, backend=routing_backend)
             elif wa_alg == 'random-fit':
                 from .rwa import dijkstra_random_fit
-                return dijkstra_random_fit
+                return partial(dijkstra_random_fit, backend=routing_backend)
+            elif wa_alg == 'most-used':
+                from .rwa import dijkstra_most_used
+                return partial(dijkstra_most_used, backend=routing_backend)
+            elif wa_alg == 'least-used':
+                from .rwa import dijkstra_least_used
+                return partial(dijkstra_least_used, backend=routing_backend)
             else:
                 raise ValueError('Unknown wavelength assignment '
                                  'algorithm "%s"' % wa_alg)
         elif r_alg == 'yen':
             if wa_alg == 'vertex-coloring':
                 from .rwa import yen_vertex_coloring
-                return yen_vertex_coloring
+                return partial(yen_vertex_coloring, backend=routing_backend)
             elif wa_alg == 'first-fit':
                 from .rwa import yen_first_fit
-                return yen_first_fit
+                return partial(yen_first_fit, backend=routing_backend)
             elif wa_alg == 'random-fit':
                 from .rwa import yen_random_fit
-                return yen_random_fit
+                return partial(yen_random_fit, backend=routing_backend)
+            elif wa_alg == 'most-used':
+                from .rwa import yen_most_used
+                return partial(yen_most_used, backend=routing_backend)
+            elif wa_alg == 'least-used':
+                from .rwa import yen_least_used
+                return partial(yen_least_used, backend=routing_backend)
             else:
                 raise ValueError('Unknown wavelength assignment '
                                  'algorithm "%s"' % wa_alg)
@@ -157,64 +191,41 @@ def RWA_for_update(net: "Network", s: int, d: int,
         _dijkstra = None
         _Lightpath = None
 
-    route = []
-    if _dijkstra is not None:
-        route = _dijkstra(net.a, s, d, debug=debug)
-
-    def _expand_aux_route(rt):
-        contains_virtual_path = False
-        if not rt or len(rt) < 2:
-            return rt, contains_virtual_path
-        mapping = {}
-        try:
-            mapping = net.virtual_adjacency2physical_path()
-        except Exception:
-            mapping = {}
-        expanded = []
-        for i_idx in range(len(rt) - 1):
-            u, v = rt[i_idx], rt[i_idx + 1]
-            key = (u, v)
-            if key in mapping:
-                contains_virtual_path = True
-                phys = mapping[key]
-                if expanded and expanded[-1] == phys[0]:
-                    expanded.extend(phys[1:])
-                else:
-                    expanded.extend(phys)
-            else:
-                if not expanded:
-                    expanded.append(u)
-                expanded.append(v)
-        return (expanded if expanded else rt), contains_virtual_path
-
-    contains_virtual_path = False
-    if aux_graph_mode:
-        route, contains_virtual_path = _expand_aux_route(route)
+    expanded = None
+    if net.route_table_mode and not debug:
+        # static adjacency: look the (expanded) route up in the route table
+        if aux_graph_mode:
+            expanded = net.get_expanded_route(s, d)
+        else:
+            route = net.get_route(s, d)
+    else:
+        route = []
+        if _dijkstra is not None:
+            route = _dijkstra(net.a, s, d, debug=debug, graph=net.graph)
+        if aux_graph_mode:
+            # expansions are memoized per route by the network
+            expanded = net.expand_route(route)
+    if expanded is not None:
+        route = expanded.route
 
     if not route or len(route) < 2 or _Lightpath is None:
         return None
 
     # single-try first-fit: pick first available on first link only
     i0, j0 = route[0], route[1]
-    chosen_w = None
-    for w in range(net.nchannels):
-        if net.n[i0][j0][w]:
-            chosen_w = w
-            break
-    if chosen_w is None:
+    chosen_w = net.lowest_channel(net.free_mask(i0, j0))
+    if chosen_w < 0:
         return None
 
     # verify this wavelength along the entire path
-    for idx in range(len(route) - 1):
-        i, j = route[idx], route[idx + 1]
-        if not net.n[i][j][chosen_w]:
-            return None
+    if not (net.route_free_mask(route) >> chosen_w) & 1:
+        return None
 
-    lp = _Lightpath(route, chosen_w)
-    try:
-        lp.contains_virtual = contains_virtual_path
-    except Exception:
-        pass
+    if expanded is None:
+        return _Lightpath(route, chosen_w)
+    # the expansion carries the links of the route, precomputed
+    lp = _Lightpath(route, chosen_w, expanded.links)
+    lp.contains_virtual = expanded.contains_virtual
     return lp
 
 
@@ -244,7 +255,45 @@ def simulator(args: Namespace) -> None:
     time_per_simulation = []
     for simulation in range(args.num_sim):
         sim_time = default_timer()
-        net = get_net_instance_from_args(args.topology, args.channels)
+        net = get_net_instance_from_args(args.topology, args.channels,
+                                         getattr(args, 'aux_cache_dir', None))
+        # optional continuous key generation on every link, on top of the
+        # keys saved by bypasses; accrual is settled lazily by the network
+        qkp_rate = getattr(args, 'qkp_rate', 0.0)
+        if qkp_rate:
+            qkp_cap = getattr(args, 'qkp_cap', None)
+            net.set_qkp_rates(net.edges, qkp_rate,
+                              np.inf if qkp_cap is None else qkp_cap)
+        fbase = 'FB_%s_%dch' % (
+            args.rwa if args.rwa is not None else '%s_%s' % (args.r, args.w),
+            int(args.channels))
+
+        # periodic samples of every QKP pool level, one .npz per load
+        snapshots = None
+        snapshot_interval = getattr(args, 'qkp_snapshot_interval', 0)
+        if snapshot_interval:
+            snapshots = QkpSnapshots(net.nnodes, snapshot_interval)
+
+        # QKP history logs stream to their files in fixed-size chunks while
+        # the simulation runs (or are aggregated / kept in memory, see
+        # `rwa_wdm.net.qkplog`), so their memory use stays flat
+        qkp_paths = None
+        if getattr(args, 'write_qkp_log', False):
+            qkp_log_mode = getattr(args, 'qkp_log_mode', 'csv')
+            ext = '.bin' if qkp_log_mode == 'binary' else ''
+            qkp_paths = (os.path.join(args.result_dir, fbase + '.qkplog' + ext),
+                         os.path.join(args.result_dir, fbase + '.qkpusage' + ext))
+            qkp_sample = getattr(args, 'qkp_log_sample', 1)
+            # deposit records carry call/time info for the binary format
+            # only; the .qkplog text lines stay `i,j,amount`
+            net.set_qkp_log_sinks(
+                *(make_qkp_sink(qkp_log_mode, path, qkp_sample, simulation + 1,
+                                net.nnodes, with_info=(path == qkp_paths[1]))
+                  for path in qkp_paths))
+            qkp_header = 'Simulation %d time=%s' % (simulation + 1,
+                                                    datetime.now().isoformat())
+            net.qkp_log_sink.comment(qkp_header)
+            net.qkp_usage_sink.comment(qkp_header)
 
         # Configure dijkstra debug logger to a per-simulation file if
         # requested. We do this here so the logger doesn't intermingle with
@@ -286,7 +335,8 @@ def simulator(args: Namespace) -> None:
             getattr(args, 'pop_size', None),
             getattr(args, 'num_gen', None),
             getattr(args, 'cross_rate', None),
-            getattr(args, 'mut_rate', None)
+            getattr(args, 'mut_rate', None),
+            getattr(args, 'routing_backend', 'networkx'),
         )
 
         blocklist = []
@@ -320,6 +370,8 @@ def simulator(args: Namespace) -> None:
             current_time = 0
             next_call_id = 0
             n_nodes = net.a.shape[0]
+            if snapshots is not None:
+                snapshots.reset(net.clock)
 
             # helper to push events and validate that 'update' events
             # are only scheduled from 'request' handling
@@ -381,31 +433,13 @@ def simulator(args: Namespace) -> None:
                 until_next = event_time - current_time
 
                 # Advance time to this event BEFORE processing it:
-                # release channels whose timers expire and decrement holding times.
+                # retire lightpaths and release channels whose timers expire.
                 # This ensures resources that become free at t=event_time are
-                # available to the event occurring at t=event_time, and avoids
-                # subtracting the prior interval from newly-created lightpaths.
-                for lightpath in net.t.lightpaths[:]:
-                    if lightpath.holding_time > until_next:
-                        lightpath.holding_time -= until_next
-                    else:
-                        net.t.remove_lightpath_by_id(lightpath.id)
-
-                for edge in net.get_edges():
-                    if len(edge) == 2:
-                        i, j = edge
-                    else:
-                        i, j = edge[0], edge[1]
-                    for w in range(net.nchannels):
-                        if net.t[i][j][w] > until_next:
-                            net.t[i][j][w] -= until_next
-                        else:
-                            net.t[i][j][w] = 0
-                            if not net.n[i][j][w]:
-                                net.n[i][j][w] = 1  # free channel
-
-                        net.t[j][i][w] = net.t[i][j][w]
-                        net.n[j][i][w] = net.n[i][j][w]
+                # available to the event occurring at t=event_time, and newly-created
+                # lightpaths expire relative to the current clock.
+                net.advance_clock(until_next)
+                if snapshots is not None and snapshots.due(net.clock):
+                    snapshots.sample(net.clock, net.qkp_levels_at)
 
                 current_time = event_time
                 # optional debug trace for events
@@ -527,25 +561,34 @@ def simulator(args: Namespace) -> None:
                     else:
                         alloc_time = holding_time
                         
+                    # the extended TP holding time must not run into an
+                    # advance reservation on the channels locked
+                    alloc_time = net.tp_alloc_time(
+                        lightpath.links, getattr(lightpath, 'w_list', None) or
+                        lightpath.w, holding_time, alloc_time)
                     lightpath.holding_time = alloc_time
-                    net.t.add_lightpath(lightpath)
+                    # consume the QKP keys held by the RWA for the links it
+                    # could not cover with a wavelength, and log them
+                    net.commit_qkp(lightpath.qkp_reservation,
+                                   {'route': tuple(lightpath.r), 'sim': simulation + 1, 'time': current_time, 'call': call})
+                    net.add_lightpath(lightpath)
                     # If the allocated lightpath used auxiliary (virtual)
                     # hops, deposit QKP keys into the pools corresponding
                     # to the latter half of each mapped physical subpath.
                     try:
                         if getattr(lightpath, 'contains_virtual', False) and getattr(lightpath, 'mapped_virtual_route', None):
                             amount = holding_time  # keys proportional to data-layer holding time
+                            saved_links = []
                             for phys in lightpath.mapped_virtual_route:
                                 if not phys or len(phys) < 2:
                                     continue
                                 split = len(phys) // 2
-                                for i in range(split, len(phys) - 1):
-                                    edge = (phys[i], phys[i + 1])
-                                    try:
-                                        net.record_bypass_saved_keys(edge, amount)
-                                    except Exception:
-                                        # ignore if QKP API not supported or other errors
-                                        pass
+                                saved_links.extend(zip(phys[split:-1],
+                                                       phys[split + 1:]))
+                            if saved_links:
+                                net.record_bypass_saved_keys_batch(
+                                    saved_links, amount,
+                                    {'sim': simulation + 1, 'time': current_time, 'call': call})
                     except Exception:
                         # defensive: do not let QKP bookkeeping break simulator
                         pass
@@ -566,22 +609,9 @@ def simulator(args: Namespace) -> None:
                                     continue
                             # if w is negative (sentinel), this link was satisfied
                             # by QKP and does not consume a wavelength channel
-                            try:
-                                if isinstance(w, int) and w < 0:
-                                    # This link was satisfied by QKP; record the
-                                    # committed consumption here (simulator-level)
-                                    try:
-                                        net.record_qkp_consumption((i, j), 10,
-                                                                   {'route': tuple(lightpath.r), 'sim': simulation + 1, 'time': current_time})
-                                    except Exception:
-                                        pass
-                                    continue
-                            except Exception:
-                                pass
-                            net.n[i][j][w] = 0  # lock channel
-                            net.t[i][j][w] = alloc_time
-                            net.n[j][i][w] = net.n[i][j][w]
-                            net.t[j][i][w] = net.t[i][j][w]
+                            if isinstance(w, int) and w < 0:
+                                continue
+                            net.occupy_channel(i, j, w, alloc_time)  # lock channel
                     else:
                         for (i, j) in links_list:
                             w = getattr(lightpath, 'w', None)
@@ -589,20 +619,9 @@ def simulator(args: Namespace) -> None:
                                 continue
                             # if the uniform wavelength is negative (shouldn't
                             # normally happen) skip locking
-                            try:
-                                if isinstance(w, int) and w < 0:
-                                    try:
-                                        net.record_qkp_consumption((i, j), 10,
-                                                                   {'route': tuple(lightpath.r), 'sim': simulation + 1, 'time': current_time})
-                                    except Exception:
-                                        pass
-                                    continue
-                            except Exception:
-                                pass
-                            net.n[i][j][w] = 0  # lock channel
-                            net.t[i][j][w] = alloc_time
-                            net.n[j][i][w] = net.n[i][j][w]
-                            net.t[j][i][w] = net.t[i][j][w]
+                            if isinstance(w, int) and w < 0:
+                                continue
+                            net.occupy_channel(i, j, w, alloc_time)  # lock channel
                     # if this was an original request allocation, schedule
                     # any planned data-layer updates computed earlier
                     if not is_update:
@@ -697,6 +716,14 @@ def simulator(args: Namespace) -> None:
                 rutil = 0.0
             resource_util_per_erlang.append(rutil)
 
+            if snapshots is not None:
+                try:
+                    snapshots.save(os.path.join(
+                        args.result_dir, '%s_sim%d_load%d.qkpsnap.npz'
+                        % (fbase, simulation + 1, load)))
+                except Exception:
+                    logger.exception('Failed to write QKP snapshots')
+
         # end of per-load loop; finalize this simulation
         sim_time = default_timer() - sim_time
         time_per_simulation.append(sim_time)
@@ -718,10 +745,6 @@ def simulator(args: Namespace) -> None:
         print('\n%-7s ' % 'BP (%):', end='')
         print(' '.join(['%4.1f' % b for b in blocks_per_erlang]), end=' ')
         print('[sim %d: %.2f secs]' % (simulation + 1, sim_time))
-        fbase = 'FB_%s_%dch' % (
-            args.rwa if args.rwa is not None else '%s_%s' % (args.r, args.w),
-            int(args.channels))
-
         # Write one line per simulation (append mode)
         write_bp_to_disk(args.result_dir, fbase + '.bp', blocks_per_erlang)
 
@@ -738,49 +761,22 @@ def simulator(args: Namespace) -> None:
         # Write only the current simulation time on its own line
         write_it_to_disk(args.result_dir, fbase + '.it', [sim_time])
 
-        # Optionally write QKP history log for this simulation to a per-experiment file
-        if getattr(args, 'write_qkp_log', False):
+        # Close the streaming QKP logs of this simulation. Sinks that keep
+        # records in memory are written out now, in the CSV line format.
+        if qkp_paths is not None:
             try:
-                os.makedirs(args.result_dir, exist_ok=True)
-                qkpf = os.path.join(args.result_dir, fbase + '.qkplog')
-                # prefer public API if present
-                try:
-                    entries = net.get_qkp_log()
-                except Exception:
-                    entries = getattr(net, '_qkp_log', []) or []
-                from datetime import datetime
-                with open(qkpf, 'a', encoding='utf-8') as qf:
-                    qf.write(f"# Simulation {simulation + 1} time={datetime.now().isoformat()} sim_time={sim_time:.6f}\n")
-                    for (edge, amount) in entries:
-                        try:
-                            i, j = edge
-                        except Exception:
-                            # if edge stored differently, stringify tuple
-                            qf.write(f"{edge},{amount}\n")
-                            continue
-                        qf.write(f"{i},{j},{int(amount)}\n")
-                    qf.write('\n')
-                logger.info('Wrote QKP log to %s', qkpf)
-                # Additionally write the QKP consumption usage log (edge, amount, info)
-                try:
-                    usage_entries = net.get_qkp_usage_log()
-                except Exception:
-                    usage_entries = getattr(net, '_qkp_usage_log', []) or []
-                try:
-                    usagef = os.path.join(args.result_dir, fbase + '.qkpusage')
-                    import json
-                    with open(usagef, 'a', encoding='utf-8') as uf:
-                        uf.write(f"# Simulation {simulation + 1} time={datetime.now().isoformat()} sim_time={sim_time:.6f}\n")
-                        for (edge, amount, info) in usage_entries:
-                            try:
-                                i, j = edge
-                                uf.write(f"{i},{j},{int(amount)},{json.dumps(info, ensure_ascii=False)}\n")
-                            except Exception:
-                                uf.write(f"{edge},{int(amount)},{json.dumps(info, ensure_ascii=False)}\n")
-                        uf.write('\n')
-                    logger.info('Wrote QKP usage log to %s', usagef)
-                except Exception:
-                    logger.exception('Failed to write QKP usage log')
+                sinks = (net.qkp_log_sink, net.qkp_usage_sink)
+                for sink, path in zip(sinks, qkp_paths):
+                    if qkp_log_mode in ('memory', 'aggregate'):
+                        out = CsvSink(path, with_info=(path == qkp_paths[1]))
+                        out.comment(qkp_header)
+                        out.extend(sink.entries())
+                    else:
+                        out = sink
+                    out.comment('sim_time=%.6f' % sim_time)
+                    out.close()
+                    logger.info('Wrote QKP log to %s', path)
+                net.close_qkp_logs()
             except Exception:
                 logger.exception('Failed to write QKP log')
 
@@ -14,7 +14,7 @@ import argparse
 import tempfile
 
 from . import simulator
-from .util import validate_args
+from .util import topology_name, validate_args
 
 logger = logging.getLogger(__name__)
 TEMP_DIR = os.path.join(tempfile.gettempdir(), 'rwa_results')
@@ -34,14 +34,18 @@ sim = parser.add_argument_group('RWA simulator options')
 ga = parser.add_argument_group('Genetic algorithm options')
 
 # network topology options
-net.add_argument('-t', default='nsf', dest='topology',
-                 choices=['nsf', 'clara', 'janet', 'rnp', 'pdf'],
+net.add_argument('-t', default='nsf', dest='topology', type=topology_name,
                  metavar='<topology>',
-                 help='network topology')
+                 help='network topology, one of nsf, clara, janet, rnp, pdf, '
+                      'optionally with auxiliary layers as '
+                      '<topology>@<t1>,<t2>,...')
 net.add_argument('-c', type=int, default=8, dest='channels',
                  choices=[2 ** (i + 1) for i in range(8)],  # max: 256
                  metavar='<channels>',
                  help='number of λ per link')
+net.add_argument('--aux-cache-dir', default=None, dest='aux_cache_dir',
+                 metavar='<cache-dir>',
+                 help='dir to cache auxiliary layers and route tables in')
 
 # rwa algorithms options
 # TODO [ -r <algorithms> -w <algorithm> ] [ --rwa <algorithm> ]
@@ -50,7 +54,8 @@ rwa.add_argument('-r', metavar='<algorithm>',
                  choices=['dijkstra', 'yen'],
                  help='routing algorithm')
 rwa.add_argument('-w', metavar='<algorithm>',
-                 choices=['vertex-coloring', 'first-fit', 'random-fit'],
+                 choices=['vertex-coloring', 'first-fit', 'random-fit',
+                          'most-used', 'least-used'],
                  help='wavelength assignment algorithm')
 rwa.add_argument('--rwa', metavar='<algorithm>',
                  choices=['genetic-algorithm'],
@@ -58,6 +63,10 @@ rwa.add_argument('--rwa', metavar='<algorithm>',
 rwa.add_argument('-y', metavar='<yen-alt-paths>', type=int,
                  default=2, choices=range(2, 5),
                  help='number of routing alternate paths (Yen\'s)')
+rwa.add_argument('--routing-backend', default='networkx',
+                 dest='routing_backend', choices=['networkx', 'csgraph'],
+                 metavar='<backend>',
+                 help='shortest path backend (csgraph requires scipy)')
 
 # simulation options
 sim.add_argument('-l', type=int, default=30, dest='load',
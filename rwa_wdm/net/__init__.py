@@ -1,4 +1,6 @@
-from .net import Network, Lightpath
+from .net import Network, Lightpath, LightpathTable, ExpandedRoute
+from .timeslot import SlotGrid
+from .qkpsnap import QkpSnapshots
 from .clara import CooperacionLatinoAmericana
 from .janet import JointAcademicNetwork
 from .nsf import NationalScienceFoundation
@@ -7,5 +9,6 @@ from .topologypdf import MyTopology
 from .auxgraph_demo_net import auxgraph_demo_net
 from .auxgraph_aux_d2 import auxgraph_aux_d2
 from .auxgraph_aux_d1 import auxgraph_aux_d1
+from .auxhierarchy import AuxHierarchy, AuxGraphNetwork
 # from .arpa import AdvancedResearchProjectsAgency
 # from .italian import Italian
@@ -1,6 +1,12 @@
 """Helper utilities for auxiliary-graph cross-mapping checks.
 
-Provides a small helper `map_to_other_aux(net, lightpath)` that, given a
+Provides `aux_pairs(mat, threshold)`, which finds the node pairs an
+auxiliary graph links with virtual edges from a single all-pairs
+shortest-path computation, `shortest_paths(mat, cache_dir)`, which runs
+that computation through the on-disk cache, `expand_aux_route(route,
+mapping)`, which replaces the virtual hops of a route computed over an
+auxiliary graph by their physical subpaths, and
+a small helper `map_to_other_aux(net, lightpath)` that, given a
 `net` instance (expected to be an auxgraph d2 instance) and a `Lightpath`
 already expanded on the d2 -> physical mapping (`lightpath.mapped_virtual_route`),
 returns True if the corresponding d1 paths contain any d1-level virtual hops.
@@ -9,7 +15,107 @@ This is intentionally defensive: it tolerates missing mappings and falls
 back to conservative False when data isn't available.
 """
 
-from typing import Any
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .cache import cache_file, cache_key, load_arrays, save_arrays
+
+
+def shortest_paths(mat: np.ndarray, cache_dir: Optional[str] = None
+                   ) -> Tuple[np.ndarray, np.ndarray]:
+    """`floyd_warshall()` of `mat`, looked up in (or added to) the cache
+    under `cache_dir`; no caching if it is None, see `rwa_wdm.net.cache`"""
+    # local import: rwa.rwa imports this module
+    from ..rwa.routing.floyd import floyd_warshall
+
+    mat = np.asarray(mat, dtype=np.float64)
+    if cache_dir is None:
+        return floyd_warshall(mat)
+    path = cache_file(cache_dir, 'floyd', cache_key(mat))
+    arrays = load_arrays(path)
+    if arrays is not None:
+        return arrays['dist'], arrays['pred']
+    dist, pred = floyd_warshall(mat)
+    save_arrays(path, dist=dist, pred=pred)
+    return dist, pred
+
+
+def aux_pairs(mat: np.ndarray, threshold: float, shortest=None
+              ) -> Tuple[List[Tuple[int, int]], np.ndarray, np.ndarray]:
+    """Node pairs to link with a virtual edge in an auxiliary graph
+
+    A pair (s, d) gets a virtual edge when the nodes are not adjacent in
+    `mat` but their shortest-path distance is at most `threshold`.
+
+    Args:
+        mat: adjacency matrix of the underlying graph
+        threshold: largest distance covered by a virtual edge
+        shortest: `(dist, pred)` of `mat`, as returned by `floyd_warshall()`,
+            when already computed
+
+    Returns:
+        tuple: (pairs, dist, pred) where `pairs` lists the (s, d) pairs in
+            row-major order and `pred` gives their paths, see
+            `rwa_wdm.rwa.routing.floyd.all_pairs_path()`
+
+    """
+    mat = np.asarray(mat)
+    dist, pred = shortest_paths(mat) if shortest is None else shortest
+    mask = (dist <= threshold) & ~(mat > 0)
+    np.fill_diagonal(mask, False)
+    s, d = np.nonzero(mask)
+    return list(zip(s.tolist(), d.tolist())), dist, pred
+
+
+def expand_aux_route(route: List[int],
+                     mapping: Dict[Tuple[int, int], List[int]]
+                     ) -> Tuple[List[int], bool, List[List[int]]]:
+    """Expand auxiliary/virtual hops into their physical subpaths.
+
+    Args:
+        route: sequence of node indices as returned by the routing algorithm
+        mapping: virtual adjacency (u, v) -> physical path, as returned by
+            `virtual_adjacency2physical_path()` on auxiliary graph networks
+
+    Returns:
+        tuple: (route_nodes, contains_virtual_path, mapped_virtual_route)
+            where `mapped_virtual_route` is a list of physical subpaths (each
+            a list of nodes) corresponding to virtual hops found in the route.
+    """
+    contains_virtual_path = False
+    # normalized return even for trivial routes
+    if not route or len(route) < 2:
+        return route, contains_virtual_path, []
+
+    expanded: List[int] = []
+    mapped_virtual_route: List[List[int]] = []
+    for i in range(len(route) - 1):
+        u, v = route[i], route[i + 1]
+        key = (u, v)
+        if key in mapping:
+            contains_virtual_path = True
+            phys = mapping[key]
+            mapped_virtual_route.append(phys)
+            # append the physical path, but avoid duplicating the
+            # intermediate node when joining segments
+            if expanded and expanded[-1] == phys[0]:
+                expanded.extend(phys[1:])
+            else:
+                expanded.extend(phys)
+        else:
+            # no mapping: append the single hop (u) and let next
+            # iteration append v (or append both here for final)
+            if not expanded:
+                expanded.append(u)
+            expanded.append(v)
+
+    # ensure route is a proper node sequence; if expansion failed,
+    # fall back to original route
+    if len(expanded) == 0:
+        return route, contains_virtual_path, mapped_virtual_route
+
+    return expanded, contains_virtual_path, mapped_virtual_route
 
 
 def map_to_other_aux(net: Any, lightpath: Any) -> bool:
@@ -32,7 +138,19 @@ def map_to_other_aux(net: Any, lightpath: Any) -> bool:
     if not mapped_virtual_route:
         return False
 
-    # get mapping d2 -> d1 paths if the net provides it
+    # networks built with the d2 -> d1 cross-mapping precomputed answer
+    # with one table lookup per virtual hop
+    try:
+        table = net.virtual_adjacency2d1_virtual()
+    except Exception:
+        table = None
+    if table is not None:
+        for phys in mapped_virtual_route:
+            if phys and len(phys) >= 2 and table[phys[0], phys[-1]]:
+                return True
+        return False
+
+    # otherwise, get mapping d2 -> d1 paths if the net provides it
     try:
         d1_map = net.virtual_adjacency2d1_path()
     except Exception:
@@ -1,7 +1,8 @@
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 from collections import OrderedDict
 from . import Network
-from ..rwa.routing.dijkstra import dijkstra
+from .aux_helpers import aux_pairs, shortest_paths
+from ..rwa.routing.floyd import all_pairs_path
 
 
 class auxgraph_aux_d1(Network):
@@ -11,7 +12,10 @@ class auxgraph_aux_d1(Network):
     It also stores the physical path corresponding to each auxiliary edge.
     """
 
-    def __init__(self, ch_n: int):
+    # largest physical distance covered by a virtual edge
+    AUX_THRESHOLD = 33.0
+
+    def __init__(self, ch_n: int, cache_dir: Optional[str] = None):
         self._name = 'auxgraph_aux_d1'
         self._fullname = 'auxgraph_aux_d1'
         self._s = 0
@@ -19,12 +23,14 @@ class auxgraph_aux_d1(Network):
         super().__init__(ch_n,
                          len(self.get_nodes_2D_pos()),
                          len(self.get_edges()))
+        # on-disk cache of the shortest paths and the route table
+        self.route_cache_dir = cache_dir
 
         # containers populated by build_auxiliary_graph
         self._aux_edges: List[Tuple[int, int, float]] = []
         # map (s,d) -> physical path (list of node indices)
         self._aux_paths: Dict[Tuple[int, int], List[int]] = {}
-        self._aux_edges, self._aux_paths = self.build_auxiliary_graph(threshold=33.0)
+        self._aux_edges, self._aux_paths = self.build_auxiliary_graph(threshold=self.AUX_THRESHOLD)
         # self._aux_path shall be constructed over a lower grade
         # aux_graph like auxgraph_aux_d1 if the experiment needs 
         # to be expanded, and aux_path may look like this:
@@ -52,6 +58,8 @@ class auxgraph_aux_d1(Network):
                     self._a[v][u] = float(dist)
                 except Exception:
                     pass
+        # adjacency now holds virtual edges too: invalidate routing caches
+        self.touch_adjacency()
 
     def get_edges(self) -> List[Tuple[int, int, int]]:
         """Return the physical edges with optional weights."""
@@ -109,39 +117,22 @@ class auxgraph_aux_d1(Network):
         """Construct auxiliary edges for all node pairs whose shortest-path
         distance is <= threshold.
 
+        All the shortest paths come from a single Floyd-Warshall pass over
+        the physical adjacency.
+
         Returns:
             aux_edges: list of tuples (s, d, distance)
             aux_paths: dict mapping (s, d) -> physical path (list of node indices)
         """
         self._aux_edges = []
         self._aux_paths = {}
-        n = self._num_nodes
-
-        # Try to import the project dijkstra at runtime; if that fails,
-        # use the lightweight fallback implementation above.
-
-        for s in range(n):
-            for d in range(n):
-                if d == s:
-                    continue
-                path = list(dijkstra(self._a, s, d, debug=False))
-                if not path:
-                    continue
-                
-                # skip if there's already a direct physical link between s and d
-                try:
-                    direct = float(self._a[s][d]) 
-                #check original _a matrix for connection
-                except Exception:
-                    direct = 0.0
-                if direct > 0:
-                    # already a physical neighbour, so not an auxiliary link
-                    continue
 
-                dist = self._path_length(path)
-                if dist <= threshold:
-                    self._aux_edges.append((s, d, dist))
-                    self._aux_paths[(s, d)] = path
+        # pairs that are not physical neighbours but lie within threshold
+        pairs, dist, pred = aux_pairs(
+            self._a, threshold, shortest_paths(self._a, self.route_cache_dir))
+        for s, d in pairs:
+            self._aux_edges.append((s, d, float(dist[s, d])))
+            self._aux_paths[(s, d)] = all_pairs_path(pred, s, d)
 
         return self._aux_edges, self._aux_paths
     
@@ -1,7 +1,11 @@
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 from collections import OrderedDict
+
+import numpy as np
+
 from . import Network
-from ..rwa.routing.dijkstra import dijkstra
+from .aux_helpers import aux_pairs, shortest_paths
+from ..rwa.routing.floyd import all_pairs_path
 # import the aux d1 class from the same package and the AdjacencyMatrix type
 from .auxgraph_aux_d1 import auxgraph_aux_d1 as aux_d1_class
 from .net import AdjacencyMatrix
@@ -13,7 +17,10 @@ class auxgraph_aux_d2(Network):
     It also stores the physical path corresponding to each auxiliary edge.
     """
 
-    def __init__(self, ch_n: int):
+    # largest distance covered by a virtual edge
+    AUX_THRESHOLD = 39.0
+
+    def __init__(self, ch_n: int, cache_dir: Optional[str] = None):
         self._name = 'auxgraph_aux_d2'
         self._fullname = 'auxgraph_aux_d2'
         self._s = 0
@@ -21,6 +28,8 @@ class auxgraph_aux_d2(Network):
         super().__init__(ch_n,
                          len(self.get_nodes_2D_pos()),
                          len(self.get_edges()))
+        # on-disk cache of the shortest paths and the route table
+        self.route_cache_dir = cache_dir
 
         # containers populated by build_auxiliary_graph
         self._aux_edges: List[Tuple[int, int, float]] = []
@@ -28,10 +37,17 @@ class auxgraph_aux_d2(Network):
         self._aux_paths_physical: Dict[Tuple[int, int], List[int]] = {}
         self._aux_paths_d1: Dict[Tuple[int, int], List[int]] = {}
         self._a_d1 = AdjacencyMatrix(self._num_nodes)
+        # [s, d] is True when the d1 path of d2 virtual edge (s, d) itself
+        # uses d1 virtual edges, see `virtual_adjacency2d1_virtual()`
+        self._d1_virtual_hops = np.zeros((self._num_nodes, self._num_nodes),
+                                         dtype=np.bool_)
+        # all-pairs shortest paths over the physical links, shared by both
+        # builds below (see `_physical_shortest_paths()`)
+        self._phys_shortest = None
         # build physical-based auxiliary edges + path mapping
-        self._aux_edges, self._aux_paths_physical = self.build_auxiliary_graph_phys(threshold=39.0)
+        self._aux_edges, self._aux_paths_physical = self.build_auxiliary_graph_phys(threshold=self.AUX_THRESHOLD)
         # build mapping from this d2 virtual adjacency into the d1 auxiliary graph
-        self._aux_paths_d1 = self.build_auxiliary_graph_d1(threshold=39.0)
+        self._aux_paths_d1 = self.build_auxiliary_graph_d1(threshold=self.AUX_THRESHOLD)
         # self._aux_path shall be constructed over a lower grade
         # aux_graph like auxgraph_aux_d1 if the experiment needs 
         # to be expanded, and aux_path may look like this:
@@ -59,6 +75,8 @@ class auxgraph_aux_d2(Network):
                     self._a[v][u] = float(dist)
                 except Exception:
                     pass
+        # adjacency now holds virtual edges too: invalidate routing caches
+        self.touch_adjacency()
 
     def get_edges(self) -> List[Tuple[int, int, int]]:
         """Return the physical edges with optional weights."""
@@ -126,6 +144,16 @@ class auxgraph_aux_d2(Network):
                 pass
         return total
 
+    def _physical_shortest_paths(self):
+        """Floyd-Warshall (dist, pred) over the physical adjacency
+
+        Computed once, while `self._a` still only holds physical links.
+        """
+        if self._phys_shortest is None:
+            self._phys_shortest = shortest_paths(self._a,
+                                                 self.route_cache_dir)
+        return self._phys_shortest
+
     def build_auxiliary_graph_phys(self, threshold: float) -> Tuple[List[Tuple[int, int, float]], Dict[Tuple[int, int], List[int]]]:
         """Construct auxiliary edges for all node pairs whose shortest-path
         distance is <= threshold.
@@ -136,43 +164,21 @@ class auxgraph_aux_d2(Network):
         """
         self._aux_edges = []
         self._aux_paths_physical = {}
-        n = self._num_nodes
-
-        # Try to import the project dijkstra at runtime; if that fails,
-        # use the lightweight fallback implementation above.
-
-        for s in range(n):
-            for d in range(n):
-                if d == s:
-                    continue
-                # force concrete list in case dijkstra returns an iterator
-                path = list(dijkstra(self._a, s, d, debug=False))
-                if not path:
-                    continue
-                
-                # skip if there's already a direct physical link between s and d
-                try:
-                    direct = float(self._a[s][d]) 
-                #check original _a matrix for connection
-                except Exception:
-                    direct = 0.0
-                if direct > 0:
-                    # already a physical neighbour, so not an auxiliary link
-                    continue
-
-                # compute distance using this class' adjacency matrix
-                dist = self._path_length(path)
-
-                if dist <= threshold:
-                    p_copy = list(path)
-                    # add forward mapping if missing
-                    if (s, d) not in self._aux_paths_physical:
-                        self._aux_edges.append((s, d, dist))
-                        self._aux_paths_physical[(s, d)] = p_copy
-                    # add reverse mapping
-                    if (d, s) not in self._aux_paths_physical:
-                        self._aux_edges.append((d, s, dist))
-                        self._aux_paths_physical[(d, s)] = list(reversed(p_copy))
+
+        # pairs that are not physical neighbours but lie within threshold
+        pairs, dist, pred = aux_pairs(self._a, threshold,
+                                      self._physical_shortest_paths())
+        for s, d in pairs:
+            p_copy = all_pairs_path(pred, s, d)
+            dist_sd = float(dist[s, d])
+            # add forward mapping if missing
+            if (s, d) not in self._aux_paths_physical:
+                self._aux_edges.append((s, d, dist_sd))
+                self._aux_paths_physical[(s, d)] = p_copy
+            # add reverse mapping
+            if (d, s) not in self._aux_paths_physical:
+                self._aux_edges.append((d, s, dist_sd))
+                self._aux_paths_physical[(d, s)] = list(reversed(p_copy))
 
         return self._aux_edges, self._aux_paths_physical
     
@@ -187,58 +193,54 @@ class auxgraph_aux_d2(Network):
             aux_edges: list of tuples (s, d, distance)
             aux_paths: dict mapping (s, d) -> physical path (list of node indices)
         """
-        # build adjacency for the d1 graph by instantiating the d1 class
         self._aux_paths_d1 = {}
-        n = self._num_nodes
-
-        # instantiate an aux_d1 instance to obtain its edge list
-        try:
-            aux1 = aux_d1_class(self._num_channels)
-        except Exception:
-            # fallback: try constructing with same signature as this class
-            aux1 = aux_d1_class(self._num_channels)
 
-        # fill the local a_d1 adjacency using aux1 edges
-        for edge in aux1.get_all_edges():
+        # the d1 graph is the physical one plus the virtual edges of
+        # `auxgraph_aux_d1`, which come from the same physical shortest
+        # paths: no need to build a whole d1 network for its edge list
+        phys_shortest = self._physical_shortest_paths()
+        for edge in self.get_edges():
             if len(edge) == 2:
                 i, j = edge
                 neigh = 1
             else:
                 i, j, neigh = edge
-            try:
-                self._a_d1[i][j] = neigh
-            except Exception:
-                self._a_d1[i][j] = 1
+            self._a_d1[i][j] = neigh
+            self._a_d1[j][i] = self._a_d1[i][j]
+        d1_pairs, phys_dist, _ = aux_pairs(self._a, aux_d1_class.AUX_THRESHOLD,
+                                           phys_shortest)
+        for i, j in d1_pairs:
+            self._a_d1[i][j] = phys_dist[i, j]
             self._a_d1[j][i] = self._a_d1[i][j]
 
         # compute shortest paths over the d1 adjacency and map d2 virtual
         # adjacency to corresponding d1 paths when distance <= threshold
-        for s in range(n):
-            for d in range(n):
-                if d == s:
-                    continue
-                path = list(dijkstra(self._a_d1, s, d, debug=False))
-                if not path:
-                    continue
-
-                try:
-                    direct = float(self._a_d1[s][d])
-                except Exception:
-                    direct = 0.0
-                if direct > 0:
-                    continue
-
-                # compute distance using the d1 adjacency
-                dist = self._path_length_on(path, self._a_d1)
-
-                if dist <= threshold:
-                    p_copy = list(path)
-                    if (s, d) not in self._aux_paths_d1:
-                        self._aux_paths_d1[(s, d)] = p_copy
-                    if (d, s) not in self._aux_paths_d1:
-                        self._aux_paths_d1[(d, s)] = list(reversed(p_copy))
+        pairs, _, pred = aux_pairs(
+            self._a_d1, threshold,
+            shortest_paths(self._a_d1, self.route_cache_dir))
+        for s, d in pairs:
+            p_copy = all_pairs_path(pred, s, d)
+            if (s, d) not in self._aux_paths_d1:
+                self._aux_paths_d1[(s, d)] = p_copy
+            if (d, s) not in self._aux_paths_d1:
+                self._aux_paths_d1[(d, s)] = list(reversed(p_copy))
+
+        # precompute, for every d2 virtual edge, whether its d1 path crosses
+        # a d1 virtual edge, so the check is a single lookup at run time
+        d1_virtual = np.zeros_like(self._d1_virtual_hops)
+        for i, j in d1_pairs:
+            d1_virtual[i, j] = d1_virtual[j, i] = True
+        self._d1_virtual_hops[:] = False
+        for (s, d), path in self._aux_paths_d1.items():
+            nodes = np.asarray(path, dtype=np.intp)
+            self._d1_virtual_hops[s, d] = d1_virtual[nodes[:-1], nodes[1:]].any()
 
         return self._aux_paths_d1
 
     def virtual_adjacency2d1_path(self):
-        return self._aux_paths_d1
\ No newline at end of file
+        return self._aux_paths_d1
+
+    def virtual_adjacency2d1_virtual(self) -> np.ndarray:
+        """N x N table, True where the d1 path of d2 virtual edge (s, d)
+        contains d1 virtual hops"""
+        return self._d1_virtual_hops
\ No newline at end of file
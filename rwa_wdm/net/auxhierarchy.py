@@ -0,0 +1,263 @@
+"""Auxiliary graph hierarchy over any topology
+
+`auxgraph_aux_d1` and `auxgraph_aux_d2` hardcode one auxiliary layer each
+over a fixed 8-node topology. `AuxHierarchy` builds any number of layers
+over any physical adjacency from a list of distance thresholds: layer `k`
+(1-based) is the physical graph plus a virtual edge between every pair of
+non-adjacent nodes whose shortest physical distance is at most the `k`-th
+threshold. Layer 0 is the physical graph itself.
+
+Everything lives in (layers x N x N) arrays: adjacencies, virtual-edge
+masks, and the predecessor matrices from which paths are rebuilt. One
+Floyd-Warshall pass over the physical graph yields every layer; one more pass
+per layer gives the cross-layer maps, i.e. the path in layer `k - 1` that
+each virtual edge of layer `k` stands for.
+
+`AuxHierarchy.cached()` keeps built hierarchies in the content-addressed
+cache of `rwa_wdm.net.cache`, keyed on the physical adjacency (links and
+weights) and the thresholds.
+
+`AuxGraphNetwork` wraps a `Network` topology into an auxiliary-graph network
+routed over the top layer, with the same interface as `auxgraph_aux_d2`, so
+that the FB and PB simulators run on it unchanged.
+
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .cache import cache_file, cache_key, load_arrays, save_arrays
+from .net import Network
+from ..rwa.routing.floyd import all_pairs_path, floyd_warshall
+
+__all__ = (
+    'AuxHierarchy',
+    'AuxGraphNetwork',
+)
+
+
+class AuxHierarchy(object):
+    """Layers of auxiliary graphs built from distance thresholds
+
+    Args:
+        phys: physical adjacency matrix; zero entries are missing links
+        thresholds: largest physical distance covered by a virtual edge, one
+            per layer, in increasing order
+
+    """
+
+    def __init__(self, phys: np.ndarray,
+                 thresholds: Sequence[float]) -> None:
+        thresholds = tuple(float(t) for t in thresholds)
+        if not thresholds:
+            raise ValueError('at least one threshold is needed')
+        if any(b <= a for a, b in zip(thresholds, thresholds[1:])):
+            raise ValueError('thresholds must be strictly increasing')
+        phys = np.asarray(phys, dtype=np.float64)
+        n = phys.shape[0]
+        self._thresholds = thresholds
+        nlevels = len(thresholds) + 1
+
+        dist, pred = floyd_warshall(phys)
+        self._dist = dist
+        self._phys_pred = pred
+        linked = phys > 0
+        off_diagonal = ~np.eye(n, dtype=np.bool_)
+
+        self._virtual = np.zeros((nlevels, n, n), dtype=np.bool_)
+        self._adj = np.empty((nlevels, n, n), dtype=np.float64)
+        self._adj[0] = phys
+        for k, threshold in enumerate(thresholds, start=1):
+            self._virtual[k] = (dist <= threshold) & ~linked & off_diagonal
+            self._adj[k] = np.where(self._virtual[k], dist, phys)
+
+        # predecessors over layer k - 1, to map layer-k virtual edges down
+        # (layer 1 maps onto the physical graph, whose pass is done)
+        self._lower_pred = np.empty((nlevels, n, n), dtype=np.intp)
+        self._lower_pred[:2] = pred
+        for k in range(2, nlevels):
+            self._lower_pred[k] = floyd_warshall(self._adj[k - 1])[1]
+
+        self._adj.setflags(write=False)
+        self._virtual.setflags(write=False)
+
+    # arrays that make up a hierarchy, as stored in the cache
+    _ARRAYS = ('_dist', '_phys_pred', '_virtual', '_adj', '_lower_pred')
+
+    @classmethod
+    def cached(cls, phys: np.ndarray, thresholds: Sequence[float],
+               cache_dir: Optional[str] = None) -> 'AuxHierarchy':
+        """Same as the constructor, but look the hierarchy up in (or add it
+        to) the cache under `cache_dir`; no caching if it is None"""
+        if cache_dir is None:
+            return cls(phys, thresholds)
+        phys = np.asarray(phys, dtype=np.float64)
+        thresholds = tuple(float(t) for t in thresholds)
+        path = cache_file(cache_dir, 'auxhierarchy',
+                          cache_key(phys, thresholds=thresholds))
+        arrays = load_arrays(path)
+        if arrays is not None:
+            hierarchy = cls.__new__(cls)
+            hierarchy._thresholds = thresholds
+            for name in cls._ARRAYS:
+                setattr(hierarchy, name, arrays[name.lstrip('_')])
+            hierarchy._adj.setflags(write=False)
+            hierarchy._virtual.setflags(write=False)
+            return hierarchy
+        hierarchy = cls(phys, thresholds)
+        save_arrays(path, **{name.lstrip('_'): getattr(hierarchy, name)
+                             for name in cls._ARRAYS})
+        return hierarchy
+
+    @property
+    def thresholds(self) -> Tuple[float, ...]:
+        """Distance threshold of each auxiliary layer"""
+        return self._thresholds
+
+    @property
+    def nlevels(self) -> int:
+        """Number of layers, the physical one included"""
+        return self._adj.shape[0]
+
+    @property
+    def distances(self) -> np.ndarray:
+        """Shortest physical distance between every pair of nodes"""
+        return self._dist
+
+    def _level(self, level: int) -> int:
+        if level < 0:
+            level += self.nlevels
+        if not 0 <= level < self.nlevels:
+            raise ValueError('No auxiliary layer %d' % level)
+        return level
+
+    def adjacency(self, level: int) -> np.ndarray:
+        """Adjacency of layer `level`, virtual edges weighted by the physical
+        distance they cover"""
+        return self._adj[self._level(level)]
+
+    def virtual(self, level: int) -> np.ndarray:
+        """N x N mask of the virtual edges of layer `level`"""
+        return self._virtual[self._level(level)]
+
+    def _pairs(self, mask: np.ndarray) -> List[Tuple[int, int]]:
+        """Pairs (s, d), s < d, of a symmetric mask in row-major order"""
+        s, d = np.nonzero(np.triu(mask))
+        return list(zip(s.tolist(), d.tolist()))
+
+    def virtual_edges(self, level: int) -> List[Tuple[int, int, float]]:
+        """Virtual edges (s, d, distance) of layer `level`, both directions"""
+        edges = []
+        for s, d in self._pairs(self.virtual(level)):
+            dist = float(self._dist[s, d])
+            edges.append((s, d, dist))
+            edges.append((d, s, dist))
+        return edges
+
+    def _paths(self, mask: np.ndarray,
+               pred: np.ndarray) -> Dict[Tuple[int, int], List[int]]:
+        paths = {}
+        for s, d in self._pairs(mask):
+            path = all_pairs_path(pred, s, d)
+            paths[(s, d)] = path
+            paths[(d, s)] = list(reversed(path))
+        return paths
+
+    def physical_paths(self, level: int) -> Dict[Tuple[int, int], List[int]]:
+        """Virtual edge (s, d) of layer `level` -> physical path"""
+        return self._paths(self.virtual(level), self._phys_pred)
+
+    def _lower_mask(self, level: int) -> np.ndarray:
+        level = self._level(level)
+        if level == 0:
+            return np.zeros_like(self._virtual[0])
+        return self._virtual[level] & ~self._virtual[level - 1]
+
+    def lower_paths(self, level: int) -> Dict[Tuple[int, int], List[int]]:
+        """Virtual edge (s, d) of layer `level` that is not an edge of the
+        layer below -> path over the layer below"""
+        level = self._level(level)
+        return self._paths(self._lower_mask(level), self._lower_pred[level])
+
+    def lower_virtual_hops(self, level: int) -> np.ndarray:
+        """N x N table, True where the path of virtual edge (s, d) of layer
+        `level` over the layer below uses virtual edges of that layer"""
+        level = self._level(level)
+        table = np.zeros_like(self._virtual[0])
+        if level < 2:
+            return table
+        below = self._virtual[level - 1]
+        for (s, d), path in self.lower_paths(level).items():
+            nodes = np.asarray(path, dtype=np.intp)
+            table[s, d] = below[nodes[:-1], nodes[1:]].any()
+        return table
+
+
+class AuxGraphNetwork(Network):
+    """Auxiliary-graph network over any topology
+
+    Routes over the top layer of an `AuxHierarchy` built on the links of
+    `base`, and exposes it through the interface of `auxgraph_aux_d2`: the
+    "d1" maps refer to the layer right below the top one.
+
+    Args:
+        base: physical topology
+        thresholds: distance threshold of each auxiliary layer, increasing
+        cache_dir: directory of the on-disk cache for the hierarchy and the
+            route table (see `rwa_wdm.net.cache`), None to always build them
+
+    """
+
+    def __init__(self, base: Network, thresholds: Sequence[float],
+                 cache_dir: Optional[str] = None) -> None:
+        self._base = base
+        self._name = '%s@%s' % (base.name,
+                                ','.join('%g' % t for t in thresholds))
+        self._fullname = '%s (auxiliary layers %s)' % (
+            getattr(base, '_fullname', base.name), ', '.join('%g' % t for t in thresholds))
+        self._s = base.s
+        self._d = base.d
+        super().__init__(base.nchannels, base.nnodes, len(base.get_edges()))
+
+        self._hierarchy = AuxHierarchy.cached(self._a, thresholds, cache_dir)
+        self._aux_edges = self._hierarchy.virtual_edges(-1)
+        self._aux_paths_physical = self._hierarchy.physical_paths(-1)
+        self._aux_paths_d1 = self._hierarchy.lower_paths(-1)
+        self._d1_virtual_hops = self._hierarchy.lower_virtual_hops(-1)
+
+        # augment adjacency with the top layer's virtual edges, as the
+        # auxgraph topologies do, and invalidate routing caches
+        virtual = self._hierarchy.virtual(-1)
+        self._a[virtual] = self._hierarchy.adjacency(-1)[virtual]
+        self.touch_adjacency()
+        self.route_cache_dir = cache_dir
+
+    @property
+    def hierarchy(self) -> AuxHierarchy:
+        """All the auxiliary layers of the network"""
+        return self._hierarchy
+
+    def get_edges(self):
+        return self._base.get_edges()
+
+    def get_nodes_2D_pos(self):
+        return self._base.get_nodes_2D_pos()
+
+    def get_all_edges(self) -> List[Tuple]:
+        """Return all(phys + aux) edges with optional weights."""
+        return list(self.get_edges()) + list(self._aux_edges)
+
+    def get_aux_edges(self) -> List[Tuple[int, int, float]]:
+        """Return the auxiliary edges with weights."""
+        return self._aux_edges
+
+    def virtual_adjacency2physical_path(self):
+        return self._aux_paths_physical
+
+    def virtual_adjacency2d1_path(self):
+        return self._aux_paths_d1
+
+    def virtual_adjacency2d1_virtual(self) -> np.ndarray:
+        """N x N table, True where the lower-layer path of virtual edge
+        (s, d) contains virtual hops of that layer"""
+        return self._d1_virtual_hops
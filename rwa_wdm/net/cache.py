@@ -0,0 +1,104 @@
+"""Content-addressed on-disk cache of topology-derived arrays
+
+Auxiliary graph layers and route tables only depend on the topology (links
+and weights) and a few parameters, yet every simulation rebuilds them. They
+are stored here as ``.npz`` files named after a hash of everything they
+depend on, so a later run, or another worker process, on the same topology
+loads them instead. A stale entry can never be picked up: any change to the
+inputs changes the file name.
+
+Files are written to a temporary name and atomically renamed, so processes
+sharing a cache directory never read a partial file.
+
+"""
+import hashlib
+import os
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+__all__ = (
+    'cache_key',
+    'cache_file',
+    'load_arrays',
+    'save_arrays',
+    'pack_routes',
+    'unpack_routes',
+)
+
+# bump when the layout of cached arrays changes
+CACHE_VERSION = 1
+
+
+def cache_key(*arrays: np.ndarray, **params) -> str:
+    """Hash of the given arrays (dtype, shape and contents) and parameters"""
+    digest = hashlib.sha256(b'rwa_wdm cache v%d' % CACHE_VERSION)
+    for arr in arrays:
+        arr = np.ascontiguousarray(arr)
+        digest.update(('%s%s' % (arr.dtype.str, arr.shape)).encode())
+        digest.update(arr.tobytes())
+    for name in sorted(params):
+        digest.update(('%s=%r;' % (name, params[name])).encode())
+    return digest.hexdigest()[:32]
+
+
+def cache_file(cache_dir: str, kind: str, key: str) -> str:
+    """Path of the cache entry `key` of the given kind"""
+    return os.path.join(cache_dir, '%s-%s.npz' % (kind, key))
+
+
+def load_arrays(path: str) -> Optional[Dict[str, np.ndarray]]:
+    """Arrays stored at `path`, or None if there is no usable entry"""
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # unreadable entry (e.g. truncated by a crash): recompute it
+        return None
+
+
+def save_arrays(path: str, **arrays: np.ndarray) -> None:
+    """Store `arrays` at `path`, atomically"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.npz.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def pack_routes(routes: Dict[Tuple[int, int], List[int]]
+                ) -> Dict[str, np.ndarray]:
+    """Flatten a (s, d) -> route mapping into arrays
+
+    Returns:
+        dict: ``pairs`` (M x 2), ``offsets`` (M + 1) and ``nodes``, the
+            routes laid end to end
+
+    """
+    pairs = np.array(list(routes), dtype=np.int32).reshape(-1, 2)
+    lengths = [len(route) for route in routes.values()]
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    nodes = np.fromiter((node for route in routes.values() for node in route),
+                        dtype=np.int32, count=int(offsets[-1]))
+    return {'pairs': pairs, 'offsets': offsets, 'nodes': nodes}
+
+
+def unpack_routes(arrays: Dict[str, np.ndarray]
+                  ) -> Dict[Tuple[int, int], List[int]]:
+    """Inverse of `pack_routes()`"""
+    nodes = arrays['nodes'].tolist()
+    offsets = arrays['offsets'].tolist()
+    return {(s, d): nodes[offsets[k]:offsets[k + 1]]
+            for k, (s, d) in enumerate(arrays['pairs'].tolist())}
@@ -4,26 +4,62 @@
 
 __author__ = 'Cassio Batista'
 
+import heapq
 import logging
+import math
+import weakref
 from itertools import count
 from operator import itemgetter
 from random import randint
-from typing import Iterable, List, Tuple, Dict
+from typing import Iterable, List, NamedTuple, Optional, Tuple, Dict
 
 import numpy as np
+import networkx as nx
 import matplotlib.pyplot as plt
 
+from .qkplog import MemorySink, QkpLogSink
+from .timeslot import FOREVER, SlotGrid
+
 __all__ = (
     'Lightpath',
+    'ExpandedRoute',
     'AdjacencyMatrix',
     'WavelengthAvailabilityMatrix',
     'TrafficMatrix',
+    'LightpathRegistry',
+    'LightpathTable',
+    'QkpReservation',
     'Network',
 )
 
 logger = logging.getLogger(__name__)
 
 
+def _lightpath_links(route) -> Tuple[Tuple[int, int], ...]:
+    """The node pairs `Lightpath.links` yields for `route`"""
+    return tuple(zip(route[::2], route[1::2]))
+
+
+class ExpandedRoute(NamedTuple):
+    """A route with its auxiliary (virtual) hops expanded into the physical
+    subpaths they stand for
+
+    Built once per route by `Network.expand_route()` and shared by every
+    request routed along it, hence made of tuples only. The first three
+    fields are those returned by `aux_helpers.expand_aux_route()`.
+    """
+    #: the expanded sequence of router indices
+    route: Tuple[int, ...]
+    #: whether the unexpanded route crossed a virtual hop
+    contains_virtual: bool
+    #: physical subpath of each virtual hop crossed
+    mapped_virtual_route: Tuple[Tuple[int, ...], ...]
+    #: edge id of each hop along `route`, see `Network.route_edge_ids()`
+    edge_ids: Tuple[int, ...]
+    #: the pairs `Lightpath.links` yields for `route`
+    links: Tuple[Tuple[int, int], ...]
+
+
 class Lightpath(object):
     """Emulates a lightpath composed by a route and a wavelength channel
 
@@ -45,13 +81,20 @@ class Lightpath(object):
     # https://stackoverflow.com/questions/8628123/counting-instances-of-a-class
     _ids = count(0)
 
-    def __init__(self, route: List[int], wavelength: int):
+    # one is created per connection request: no per-instance __dict__
+    __slots__ = ('_id', '_route', '_wavelength', '_holding_time', '_expiry',
+                 '_contains_virtual', '_mapped_virtual_route', '_w_list',
+                 '_qkp_reservation', '_links', '__weakref__')
+
+    def __init__(self, route: List[int], wavelength: int,
+                 links: Optional[Tuple[Tuple[int, int], ...]] = None):
         # New optional flag `contains_virtual` is supported by RWA layer
         # to indicate the returned route used one or more auxiliary hops.
         self._id: int = next(self._ids)
         self._route: List[int] = route
         self._wavelength: int = wavelength
         self._holding_time: float = 0.0
+        self._expiry: float = 0.0
         self._contains_virtual: bool = False
         # optional container mapping virtual (aux) hops to the physical
         # paths they represent. This mirrors the `contains_virtual` flag and
@@ -63,6 +106,12 @@ class Lightpath(object):
         # single-channel value stored in `_wavelength` for allocation and
         # release operations.
         self._w_list: List[int] | None = None
+        # QKP keys held for the links covered by the key pool (-10 entries
+        # of `_w_list`); consumed when the lightpath is committed
+        self._qkp_reservation: QkpReservation | None = None
+        # `links` of the route, computed on first use unless given (e.g.
+        # `ExpandedRoute.links`)
+        self._links: Tuple[Tuple[int, int], ...] | None = links
 
     @property
     def id(self) -> int:
@@ -79,12 +128,10 @@ class Lightpath(object):
     @property
     def links(self) -> Iterable[Tuple[int, int]]:
         """Network links as a sequence of pairs of nodes"""
-        iterable = iter(self._route)
-        while True:
-            try:
-                yield next(iterable), next(iterable)
-            except StopIteration:
-                return
+        links = self._links
+        if links is None:
+            links = self._links = _lightpath_links(self._route)
+        return links
 
     @property
     def w(self) -> int:
@@ -99,7 +146,7 @@ class Lightpath(object):
         wavelength index used on the corresponding link of the route. The
         list length should match len(self.r) - 1 (number of links).
         """
-        return getattr(self, '_w_list', None)
+        return self._w_list
 
     @w_list.setter
     def w_list(self, val: List[int] | None) -> None:
@@ -115,6 +162,15 @@ class Lightpath(object):
                 except Exception:
                     self._w_list = None
 
+    @property
+    def qkp_reservation(self) -> 'QkpReservation | None':
+        """QKP keys held for this lightpath, see `Network.reserve_qkp()`"""
+        return self._qkp_reservation
+
+    @qkp_reservation.setter
+    def qkp_reservation(self, reservation: 'QkpReservation | None') -> None:
+        self._qkp_reservation = reservation
+
     @property
     def holding_time(self) -> float:
         """Time that the lightpath remains occupying net resources"""
@@ -124,6 +180,19 @@ class Lightpath(object):
     def holding_time(self, time: float) -> None:
         self._holding_time = time
 
+    @property
+    def expiry(self) -> float:
+        """Absolute time at which the lightpath terminates
+
+        Set from `holding_time` when the lightpath is added to the traffic
+        matrix.
+        """
+        return self._expiry
+
+    @expiry.setter
+    def expiry(self, time: float) -> None:
+        self._expiry = time
+
     def __len__(self):
         return len(self.r)
 
@@ -133,7 +202,7 @@ class Lightpath(object):
     @property
     def contains_virtual(self) -> bool:
         """Whether the lightpath route included auxiliary (virtual) hops."""
-        return getattr(self, '_contains_virtual', False)
+        return self._contains_virtual
 
     @contains_virtual.setter
     def contains_virtual(self, val: bool) -> None:
@@ -149,12 +218,15 @@ class Lightpath(object):
         hop in the expanded route. May be None when no virtual hops were
         present or when not set by the RWA layer.
         """
-        return getattr(self, '_mapped_virtual_route', None)
+        return self._mapped_virtual_route
 
     @mapped_virtual_route.setter
     def mapped_virtual_route(self, val: List[List[int]] | None) -> None:
         if val is None:
             self._mapped_virtual_route = None
+        elif isinstance(val, tuple):
+            # immutable, e.g. `ExpandedRoute.mapped_virtual_route`: share it
+            self._mapped_virtual_route = val
         else:
             # coerce to list-of-lists for safety
             try:
@@ -164,6 +236,132 @@ class Lightpath(object):
                 self._mapped_virtual_route = [list(val)]
 
 
+class LightpathTable(object):
+    """Struct-of-arrays store of lightpaths
+
+    Compact alternative to keeping one `Lightpath` object per connection:
+    every lightpath is a row of NumPy arrays (id, wavelength, expiry and an
+    offset into a flat buffer holding all routes back to back). Rows are
+    appended, removed rows are only flagged dead, and the arrays are
+    compacted once dead rows outnumber live ones.
+
+    Args:
+        capacity: initial number of rows to allocate
+
+    """
+
+    def __init__(self, capacity: int = 1024):
+        capacity = max(1, int(capacity))
+        self._ids = np.empty(capacity, dtype=np.int64)
+        self._w = np.empty(capacity, dtype=np.int32)
+        self._expiry = np.empty(capacity, dtype=np.float64)
+        self._alive = np.zeros(capacity, dtype=np.bool_)
+        # route of row k is _nodes[_offsets[k]:_offsets[k + 1]]
+        self._offsets = np.zeros(capacity + 1, dtype=np.int64)
+        self._nodes = np.empty(4 * capacity, dtype=np.int32)
+        self._nrows = 0
+        self._nalive = 0
+        self._rows: Dict[int, int] = {}  # lightpath id -> row
+
+    def __len__(self) -> int:
+        return self._nalive
+
+    def __contains__(self, _id: int) -> bool:
+        return _id in self._rows
+
+    def _grow(self, rows: int, nodes: int) -> None:
+        if self._nrows + rows > self._ids.shape[0]:
+            size = max(2 * self._ids.shape[0], self._nrows + rows)
+            for name in ('_ids', '_w', '_expiry', '_alive'):
+                old = getattr(self, name)
+                new = np.zeros(size, dtype=old.dtype)
+                new[:self._nrows] = old[:self._nrows]
+                setattr(self, name, new)
+            offsets = np.zeros(size + 1, dtype=np.int64)
+            offsets[:self._nrows + 1] = self._offsets[:self._nrows + 1]
+            self._offsets = offsets
+        end = self._offsets[self._nrows]
+        if end + nodes > self._nodes.shape[0]:
+            size = max(2 * self._nodes.shape[0], end + nodes)
+            buf = np.empty(size, dtype=np.int32)
+            buf[:end] = self._nodes[:end]
+            self._nodes = buf
+
+    def add(self, lightpath: Lightpath) -> int:
+        """Store `lightpath` as a new row
+
+        Args:
+            lightpath: a Lightpath instance
+
+        Returns:
+            int: the row index
+
+        """
+        route = lightpath.r
+        self._grow(1, len(route))
+        row = self._nrows
+        start = self._offsets[row]
+        self._nodes[start:start + len(route)] = route
+        self._offsets[row + 1] = start + len(route)
+        self._ids[row] = lightpath.id
+        self._w[row] = lightpath.w if lightpath.w is not None else -1
+        self._expiry[row] = lightpath.expiry
+        self._alive[row] = True
+        self._rows[lightpath.id] = row
+        self._nrows += 1
+        self._nalive += 1
+        return row
+
+    def remove(self, _id: int) -> None:
+        """Drop the lightpath with identifier `_id`, if stored"""
+        row = self._rows.pop(_id, None)
+        if row is None:
+            return
+        self._alive[row] = False
+        self._nalive -= 1
+        if self._nrows > 64 and 2 * self._nalive < self._nrows:
+            self.compact()
+
+    def compact(self) -> None:
+        """Rebuild the arrays keeping only live rows"""
+        n = self._nrows
+        keep = np.flatnonzero(self._alive[:n])
+        lengths = np.diff(self._offsets[:n + 1])[keep]
+        starts = self._offsets[:n][keep]
+        if len(keep):
+            idx = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + \
+                np.arange(lengths.sum())
+            self._nodes[:len(idx)] = self._nodes[idx]
+        self._offsets[1:len(keep) + 1] = np.cumsum(lengths)
+        for name in ('_ids', '_w', '_expiry'):
+            arr = getattr(self, name)
+            arr[:len(keep)] = arr[keep]
+        self._alive[:len(keep)] = True
+        self._alive[len(keep):n] = False
+        self._nrows = len(keep)
+        self._rows = {int(_id): row
+                      for row, _id in enumerate(self._ids[:len(keep)])}
+
+    def route(self, _id: int) -> List[int]:
+        """Route of the lightpath with identifier `_id`"""
+        row = self._rows[_id]
+        return self._nodes[self._offsets[row]:self._offsets[row + 1]].tolist()
+
+    def wavelength(self, _id: int) -> int:
+        """Wavelength of the lightpath with identifier `_id`"""
+        return int(self._w[self._rows[_id]])
+
+    def expiry(self, _id: int) -> float:
+        """Absolute expiry time of the lightpath with identifier `_id`"""
+        return float(self._expiry[self._rows[_id]])
+
+    def expired(self, now: float) -> np.ndarray:
+        """Identifiers of the live lightpaths whose expiry is <= `now`"""
+        n = self._nrows
+        mask = self._alive[:n] & (self._expiry[:n] <= now)
+        return self._ids[:n][mask]
+
+
 class AdjacencyMatrix(np.ndarray):
     """Boolean 2D matrix that stores network neighbourhood info
 
@@ -215,24 +413,165 @@ class WavelengthAvailabilityMatrix(np.ndarray):
             return
 
 
+class LightpathRegistry(object):
+    """Registry of running connections (lightpaths), indexed by id
+
+    Each lightpath gets an absolute expiry time on the registry clock when it
+    is added, so nothing needs to be decremented per event:
+    `advance_clock()` retires every expired lightpath at once.
+
+    """
+
+    def __init__(self):
+        self._lightpaths: Dict[int, Lightpath] = {}
+        # conflict index: undirected link (i, j), i < j -> ids of the live
+        # lightpaths routed over it
+        self._by_link: Dict[Tuple[int, int], set] = {}
+        self._clock: float = 0.0
+        self._expiry_heap: List[Tuple[float, int]] = []
+        self._table: 'LightpathTable | None' = None
+
+    @property
+    def table(self) -> 'LightpathTable | None':
+        """Optional struct-of-arrays mirror of the running lightpaths"""
+        return self._table
+
+    @table.setter
+    def table(self, table: 'LightpathTable | None') -> None:
+        if table is not None:
+            for lightpath in self._lightpaths.values():
+                table.add(lightpath)
+        self._table = table
+
+    @property
+    def lightpaths(self) -> List[Lightpath]:
+        """The list of connections (lightpaths) currently running"""
+        return list(self._lightpaths.values())
+
+    @property
+    def nconns(self) -> int:
+        """The number of connections (lightpaths) currently running"""
+        return len(self._lightpaths)
+
+    def add_lightpath(self, lightpath: Lightpath) -> None:
+        """Add a lightpath to the registry of running connections
+
+        The lightpath expires once its `holding_time` has elapsed on the
+        registry clock.
+
+        Args:
+            lightpath: a Lightpath instance
+
+        """
+        expiry = self._clock + float(lightpath.holding_time)
+        lightpath.expiry = expiry
+        if lightpath.id in self._lightpaths:
+            self._unlink(self._lightpaths[lightpath.id])
+        self._lightpaths[lightpath.id] = lightpath
+        for key in self._link_keys(lightpath.r):
+            self._by_link.setdefault(key, set()).add(lightpath.id)
+        heapq.heappush(self._expiry_heap, (expiry, lightpath.id))
+        if self._table is not None:
+            self._table.add(lightpath)
+
+    def remove_lightpath_by_id(self, _id: int) -> None:
+        """Remove a lightpath from the list of currently running connections
+
+        Args:
+            _id: the unique identifier of a lightpath
+
+        """
+        lightpath = self._lightpaths.pop(_id, None)
+        if lightpath is not None:
+            self._unlink(lightpath)
+        if self._table is not None:
+            self._table.remove(_id)
+
+    @staticmethod
+    def _link_keys(route: List[int]) -> Iterable[Tuple[int, int]]:
+        for idx in range(1, len(route)):
+            i, j = route[idx - 1], route[idx]
+            yield (i, j) if i <= j else (j, i)
+
+    def _unlink(self, lightpath: Lightpath) -> None:
+        for key in self._link_keys(lightpath.r):
+            ids = self._by_link.get(key)
+            if ids is not None:
+                ids.discard(lightpath.id)
+                if not ids:
+                    del self._by_link[key]
+
+    def conflicting(self, route: List[int]) -> List[Lightpath]:
+        """Live lightpaths sharing at least one link with `route`
+
+        Args:
+            route: path encoded as a sequence of router indices
+
+        Returns:
+            :obj:`list` of :obj:`Lightpath`: ordered by lightpath id
+
+        """
+        ids = set()
+        for key in self._link_keys(route):
+            ids.update(self._by_link.get(key, ()))
+        return [self._lightpaths[_id] for _id in sorted(ids)]
+
+    def advance_clock(self, elapsed: float) -> List[Lightpath]:
+        """Move the clock forward and retire the expired lightpaths
+
+        A lightpath expires when its remaining holding time is less than or
+        equal to `elapsed`.
+
+        Args:
+            elapsed: time since the previous call
+
+        Returns:
+            :obj:`list` of :obj:`Lightpath`: the lightpaths just retired
+
+        """
+        self._clock += elapsed
+        heap = self._expiry_heap
+        retired = []
+        while heap and heap[0][0] <= self._clock:
+            expiry, _id = heapq.heappop(heap)
+            lightpath = self._lightpaths.get(_id)
+            if lightpath is None or lightpath.expiry != expiry:
+                continue  # stale entry: already removed or re-added
+            del self._lightpaths[_id]
+            self._unlink(lightpath)
+            if self._table is not None:
+                self._table.remove(_id)
+            retired.append(lightpath)
+        return retired
+
+
 class TrafficMatrix(np.ndarray):
     """Boolean 3D matrix that stores traffic info
 
+    Also exposes the registry of running connections (lightpaths), see
+    `LightpathRegistry`.
+
     Args:
         num_nodes: number of nodes in the network, which defines two of the
             matrix's dimensions
         num_ch: number of wavelength channels on each link, defining the shape
             of the third dimension of the matrix
+        registry: lightpath registry to expose; a new one by default
+        usage: per-channel usage counters to expose; zeros by default
 
     """
 
-    def __new__(cls, num_nodes: int, num_ch: int):
+    def __new__(cls, num_nodes: int, num_ch: int,
+                registry: 'LightpathRegistry | None' = None,
+                usage: 'np.ndarray | None' = None):
         arr = np.zeros((num_nodes, num_nodes, num_ch))
         obj = np.asarray(arr, dtype=np.float32).view(cls)
 
         # set extra parameters
-        obj._usage = np.zeros(num_ch, dtype=np.uint16)
-        obj._lightpaths = []
+        obj._usage = usage if usage is not None \
+            else np.zeros(num_ch, dtype=np.int64)
+        obj._registry = registry if registry is not None \
+            else LightpathRegistry()
 
         return obj
 
@@ -240,17 +579,36 @@ class TrafficMatrix(np.ndarray):
         if obj is None:
             return
         self._usage = getattr(obj, "_usage", None)
-        self._lightpaths = getattr(obj, "_lightpaths", None)
+        self._registry = getattr(obj, "_registry", None)
+
+    @property
+    def registry(self) -> LightpathRegistry:
+        """The registry of running connections"""
+        return self._registry
+
+    @property
+    def usage(self) -> np.ndarray:
+        """Number of links on which each channel is busy"""
+        return self._usage
+
+    @property
+    def table(self) -> 'LightpathTable | None':
+        """Optional struct-of-arrays mirror of the running lightpaths"""
+        return self._registry.table
+
+    @table.setter
+    def table(self, table: 'LightpathTable | None') -> None:
+        self._registry.table = table
 
     @property
     def lightpaths(self) -> List[Lightpath]:
         """The list of connections (lightpaths) currently running"""
-        return self._lightpaths
+        return self._registry.lightpaths
 
     @property
     def nconns(self):
         """The number of connections (lightpaths) currently running"""
-        return len(self._lightpaths)
+        return self._registry.nconns
 
     def add_lightpath(self, lightpath: Lightpath) -> None:
         """Add a lightpath to the list of lightpath
@@ -259,11 +617,8 @@ class TrafficMatrix(np.ndarray):
             lightpath: a Lightpath instance
 
         """
-        self._lightpaths.append(lightpath)
+        self._registry.add_lightpath(lightpath)
 
-    # FIXME this seems silly, but...
-    # https://stackoverflow.com/questions/9140857/oop-python-removing-class-instance-from-a-list/9140906
-    
     def remove_lightpath_by_id(self, _id: int) -> None:
         """Remove a lightpath from the list of currently running connections
 
@@ -271,10 +626,65 @@ class TrafficMatrix(np.ndarray):
             _id: the unique identifier of a lightpath
 
         """
-        for i, lightpath in enumerate(self.lightpaths):
-            if lightpath.id == _id:
-                del self._lightpaths[i]
-                break
+        self._registry.remove_lightpath_by_id(_id)
+
+    def advance_clock(self, elapsed: float) -> List[Lightpath]:
+        """Move the registry clock forward, see
+        `LightpathRegistry.advance_clock()`"""
+        return self._registry.advance_clock(elapsed)
+
+
+class QkpReservation(object):
+    """Keys held in the QKP pools of a set of links, not yet consumed
+
+    Created by `Network.reserve_qkp()`. The held keys cannot be reserved or
+    used by anyone else, but stay in the pools until the reservation is
+    committed by `Network.commit_qkp()`, or handed back by
+    `Network.abort_qkp()`.
+
+    Args:
+        links: links the keys are held on, in route order
+        amount: number of keys held on each link
+        ids: QKP pool indices of the distinct links
+        need: number of keys held in each of those pools
+
+    """
+
+    __slots__ = ('_links', '_amount', '_ids', '_need', '_state')
+
+    PENDING, COMMITTED, ABORTED = 'pending', 'committed', 'aborted'
+
+    def __init__(self, links: List[Tuple[int, int]], amount: int,
+                 ids: np.ndarray, need: np.ndarray) -> None:
+        self._links = links
+        self._amount = amount
+        self._ids = ids
+        self._need = need
+        self._state = self.PENDING
+
+    @property
+    def links(self) -> List[Tuple[int, int]]:
+        """Links the keys are held on"""
+        return self._links
+
+    @property
+    def amount(self) -> int:
+        """Number of keys held per link"""
+        return self._amount
+
+    @property
+    def state(self) -> str:
+        """One of 'pending', 'committed' or 'aborted'"""
+        return self._state
+
+    @property
+    def pending(self) -> bool:
+        """Whether the keys are still held"""
+        return self._state == self.PENDING
+
+    def __repr__(self) -> str:
+        return 'QkpReservation(%s x %d, %s)' % (self._links, self._amount,
+                                                self._state)
 
 
 class Network(object):
@@ -297,22 +707,54 @@ class Network(object):
         self._num_nodes = num_nodes
         self._num_links = num_links
 
-        self._n = WavelengthAvailabilityMatrix(self._num_nodes,
-                                               self._num_channels)
         self._a = AdjacencyMatrix(self._num_nodes)
-        self._t = TrafficMatrix(self._num_nodes, self._num_channels)
 
-        # fill in wavelength availability matrix (original behaviour)
+        # undirected edge index: link (i, j) and (j, i) share one edge id, and
+        # per-channel state is stored once per edge in E x W arrays instead
+        # of mirrored N x N x W matrices. Node pairs that are not links map to
+        # a trailing sentinel row that is never free.
+        self._edges: List[Tuple[int, int]] = []
+        self._edge_id: Dict[Tuple[int, int], int] = {}
+        for edge in self.get_edges():
+            i, j = edge[0], edge[1]
+            if (i, j) not in self._edge_id:
+                self._edge_id[(i, j)] = self._edge_id[(j, i)] = \
+                    len(self._edges)
+                self._edges.append((i, j) if i <= j else (j, i))
+        self._no_edge: int = len(self._edges)
+        num_edges = len(self._edges) + 1
+        self._avail = np.zeros((num_edges, self._num_channels), dtype=np.bool_)
+        self._timer = np.zeros((num_edges, self._num_channels),
+                               dtype=np.float32)
+        # `n` and `t` are materialized from the arrays above on demand
+        self._state_version: int = 0
+        self._n: WavelengthAvailabilityMatrix | None = None
+        self._n_version: int = -1
+        self._registry = LightpathRegistry()
+        self._t: TrafficMatrix | None = None
+        self._t_version: int = -1
+
+        # fill in wavelength availability (original behaviour)
         for edge in self.get_edges():
             # support edge formats: (i, j) or (i, j, weight)
-            if len(edge) == 2:
-                i, j = edge
-            else:
-                i, j = edge[0], edge[1]
+            eid = self._edge_id[(edge[0], edge[1])]
             for w in range(self._num_channels):
-                availability = np.random.choice((0, 1))
-                self._n[i][j][w] = availability
-                self._n[j][i][w] = self._n[i][j][w] #for symmetry
+                self._avail[eid][w] = np.random.choice((0, 1))
+
+        # packed copy of the availability: one integer bitmask per edge
+        # whose bit w is set when channel w is free. Kept in sync by
+        # occupy_channel() and release_channel().
+        self._free_masks: List[int] = []
+        self._all_channels_mask: int = (1 << self._num_channels) - 1
+        self.rebuild_free_masks()
+
+        # usage counters: number of links on which each channel is busy,
+        # and number of busy channels on each link. Updated in O(1) by
+        # occupy_channel() / release_channel(); they drive the most-used and
+        # least-used wavelength assignment strategies.
+        busy = ~self._avail[:-1]
+        self._channel_usage = busy.sum(axis=0).astype(np.int64)
+        self._link_usage = np.append(busy.sum(axis=1), 0).astype(np.int64)
 
         # fill in adjacency matrix using only physical edges (get_edges()).
         # Auxiliary edges must not populate the base adjacency/availability
@@ -338,48 +780,104 @@ class Network(object):
         # since decreasing values by until_next leads T to be uneven and
         # unbalanced
         for edge in self.get_edges():
-            if len(edge) == 2:
-                i, j = edge
-            else:
-                i, j = edge[0], edge[1]
+            eid = self._edge_id[(edge[0], edge[1])]
             for w in range(self._num_channels):
                 # initialize traffic matrix times: when a wavelength is
-                # currently occupied (self._n[i][j][w] == 1), assign a
+                # currently occupied (self._avail[eid][w] == 1), assign a
                 # random integer remaining time in [0, 10] so initial
                 # allocations are spread over the first 10 slots. When the
                 # wavelength is free, time is 0.
-                if self._n[i][j][w]:
+                if self._avail[eid][w]:
                     random_time = np.random.randint(1, 11)
                 else:
                     random_time = 0
-                self._t[i][j][w] = random_time
-                self._t[j][i][w] = self._t[i][j][w]
-
-        # initialize Quantum Key Pools (QKP) for every unordered node pair
-        # Keys are stored as integer counters per undirected edge (i, j) with
-        # i < j. This supports recording keys saved by bypass operations and
-        # querying/consuming keys during routing decisions.
-        self._qkp_pools: Dict[Tuple[int, int], int] = {}
-        for i in range(self._num_nodes):
-            for j in range(i + 1, self._num_nodes):
-                self._qkp_pools[(i, j)] = 0
+                self._timer[eid][w] = random_time
+
+        # channel release scheduler: every busy (edge, channel) has an
+        # absolute expiry time on the network clock, kept in a min-heap so
+        # advancing the clock only touches the channels that actually expire.
+        # Heap entries are deleted lazily: an entry is stale once its expiry
+        # no longer matches the one recorded in `_expiry`.
+        self._clock: float = 0.0
+        self._expiry: Dict[Tuple[int, int], float] = {}
+        self._expiry_heap: List[Tuple[float, int, int]] = []
+        # advance bookings of wavelength x timeslot blocks; built on first
+        # use, so runs that book nothing never pay for it. Ongoing
+        # occupations are read from the release schedule instead.
+        self._slots: Optional[SlotGrid] = None
+        # channels that start busy carry no holding time and are released
+        # as soon as the clock first moves
+        for eid in range(len(self._edges)):
+            for w in np.flatnonzero(~self._avail[eid]).tolist():
+                self._schedule_release(eid, w, 0.0)
+
+        # routing graph cache: `a` is static for the whole run in every
+        # simulator, so the networkx graph built from it is kept around and
+        # only rebuilt when the adjacency version counter moves. Code that
+        # writes into `a` after construction must call `touch_adjacency()`.
+        self._adj_version: int = 0
+        self._graph: nx.Graph | None = None
+        self._graph_version: int = -1
+        # same for the CSR copy used by the scipy csgraph routing backend
+        self._csr = None
+        self._csr_version: int = -1
+
+        # all-pairs route table: since `a` does not change during a run,
+        # the shortest route (and its expansion through the auxiliary
+        # graph's virtual hops) for every (s, d) pair is computed once and
+        # then looked up per request. Built lazily on first lookup and
+        # rebuilt only when the adjacency version changes.
+        self._route_table_mode: bool = True
+        self._route_table: Dict[Tuple[int, int], List[int]] = {}
+        self._expanded_route_table: Dict[Tuple[int, int],
+                                         ExpandedRoute] = {}
+        # expansion of every route seen so far, see `expand_route()`
+        self._expanded_routes: Dict[Tuple[int, ...], ExpandedRoute] = {}
+        self._expanded_routes_version: int = -1
+        self._route_table_version: int = -1
+        self._route_table_backend: str = 'networkx'
+        # optional on-disk cache of route tables, see `route_cache_dir`
+        self._route_cache_dir: Optional[str] = None
+        # k-shortest candidate paths per (s, d, k, backend), shared by the
+        # yen_* RWA algorithms; dropped when the adjacency version changes
+        self._k_paths: Dict[Tuple[int, int, int, str], List[List[int]]] = {}
+        self._k_paths_version: int = -1
+
+        # initialize Quantum Key Pools (QKP) for every unordered node pair.
+        # Keys are stored as integer counters in a NumPy array indexed by
+        # pair id: `_qkp_pair_id[i, j]` maps any ordered pair to the id of
+        # its unordered pair and `_qkp_pairs[id]` maps back to the (i, j)
+        # tuple with i <= j used in the logs. Whole routes can then be
+        # checked, consumed from or deposited into with array operations.
+        iu, ju = np.triu_indices(self._num_nodes)
+        pair_ids = np.arange(iu.size, dtype=np.intp)
+        self._qkp_pairs: List[Tuple[int, int]] = \
+            list(zip(iu.tolist(), ju.tolist()))
+        self._qkp_pair_id = np.empty((self._num_nodes, self._num_nodes),
+                                     dtype=np.intp)
+        self._qkp_pair_id[iu, ju] = pair_ids
+        self._qkp_pair_id[ju, iu] = pair_ids
+        self._qkp = np.zeros(iu.size, dtype=np.int64)
+        # keys held by pending reservations: still in `_qkp`, but no longer
+        # available to other reservations or consumers
+        self._qkp_held = np.zeros(iu.size, dtype=np.int64)
+        # continuous key generation, settled lazily: a pool with a positive
+        # rate gains one key every 1 / rate time units of the network clock,
+        # up to its cap. Accrual since `_qkp_last` is only added to `_qkp`
+        # when the pool is read, consumed from or deposited into, so pools
+        # nobody touches cost nothing. `_qkp_accrual` stays False (skipping
+        # settlement altogether) until some rate is set.
+        self._qkp_rate = np.zeros(iu.size, dtype=np.float64)
+        self._qkp_cap = np.full(iu.size, np.inf, dtype=np.float64)
+        self._qkp_last = np.zeros(iu.size, dtype=np.float64)
+        self._qkp_accrual: bool = False
 
         # history log of recorded bypass-saved keys (edge, amount)
-        self._qkp_log: List[Tuple[Tuple[int, int], int]] = []
+        self._qkp_log: QkpLogSink = MemorySink()
 
         # history log of QKP consumption events (edge, amount, info)
         # info is an optional dict describing the request that consumed keys
-        self._qkp_usage_log: List[Tuple[Tuple[int, int], int, dict]] = []
-
-        # precompute a fast lookup map from any ordered node pair (i,j)
-        # to the normalized QKP key (undirected tuple with i <= j). This
-        # avoids repeated normalization computations during runtime.
-        self._qkp_key_map: Dict[Tuple[int, int], Tuple[int, int]] = {}
-        for i in range(self._num_nodes):
-            for j in range(self._num_nodes):
-                if i == j:
-                    continue
-                self._qkp_key_map[(i, j)] = (i, j) if i <= j else (j, i)
+        self._qkp_usage_log: QkpLogSink = MemorySink()
 
     # Children are responsible for overriding this method
     def get_edges(self):
@@ -391,7 +889,18 @@ class Network(object):
 
     @property
     def n(self) -> np.ndarray:
-        """The wavelength availability matrix graph"""
+        """The wavelength availability matrix graph
+
+        Read-only N x N x W view materialized from the per-edge availability
+        array. Use `occupy_channel()` / `release_channel()` to change it.
+        """
+        if self._n_version != self._state_version:
+            n = WavelengthAvailabilityMatrix(self._num_nodes,
+                                             self._num_channels)
+            self._fill_view(n, self._avail)
+            n.setflags(write=False)
+            self._n = n
+            self._n_version = self._state_version
         return self._n
 
     @property
@@ -399,11 +908,274 @@ class Network(object):
         """The adjacency matrix graph"""
         return self._a
 
+    @property
+    def adjacency_version(self) -> int:
+        """Counter bumped every time the adjacency matrix is modified"""
+        return self._adj_version
+
+    def touch_adjacency(self) -> None:
+        """Flag the adjacency matrix as modified so routing caches rebuild
+
+        Must be called after writing into `a` in place (e.g. when auxiliary
+        edges are added on top of the physical topology).
+        """
+        self._adj_version += 1
+
+    @property
+    def graph(self) -> nx.Graph:
+        """The routing graph built from `a`, cached per adjacency version"""
+        if self._graph is None or self._graph_version != self._adj_version:
+            self._graph = nx.from_numpy_array(self._a, create_using=nx.Graph())
+            self._graph_version = self._adj_version
+        return self._graph
+
+    @property
+    def csr(self):
+        """CSR copy of `a` for the csgraph backend, cached per version"""
+        if self._csr is None or self._csr_version != self._adj_version:
+            from ..rwa.routing.csgraph import to_csr
+            self._csr = to_csr(self._a)
+            self._csr_version = self._adj_version
+        return self._csr
+
+    # --- Route table --------------------------------------------------
+    @property
+    def route_table_mode(self) -> bool:
+        """Whether RWA routines look routes up in the precomputed table"""
+        return self._route_table_mode
+
+    @route_table_mode.setter
+    def route_table_mode(self, val: bool) -> None:
+        self._route_table_mode = bool(val)
+
+    @property
+    def route_cache_dir(self) -> Optional[str]:
+        """Directory where `build_route_table()` caches route tables
+
+        Entries are keyed on the adjacency and the backend (see
+        `rwa_wdm.net.cache`), so runs on the same topology, and worker
+        processes, load the table instead of computing it. None disables
+        the cache.
+        """
+        return self._route_cache_dir
+
+    @route_cache_dir.setter
+    def route_cache_dir(self, path: Optional[str]) -> None:
+        self._route_cache_dir = path
+
+    def build_route_table(self, backend: str = 'networkx') -> None:
+        """Compute the shortest route between every ordered pair of nodes
+
+        With the 'networkx' backend routes are computed over `graph` exactly
+        as `dijkstra()` does, so a table lookup returns the very same path a
+        per-request call would. The 'csgraph' backend gets all pairs from a
+        single array-based call and rebuilds paths from the predecessor
+        matrix. Each route is also expanded through
+        `virtual_adjacency2physical_path()` when the topology provides one
+        (auxiliary graph networks). With `route_cache_dir` set, the table
+        is loaded from the on-disk cache when already there.
+
+        Args:
+            backend: routing backend, either 'networkx' or 'csgraph'
+
+        """
+        # local imports: the routing package imports this module
+        from ..rwa.routing.dijkstra import dijkstra
+        from ..rwa.routing.csgraph import shortest_paths, path_from_predecessors
+
+        if backend not in ('networkx', 'csgraph'):
+            raise ValueError('Unknown routing backend "%s"' % backend)
+
+        cache = None
+        if self._route_cache_dir is not None:
+            from .cache import (cache_file, cache_key, load_arrays,
+                                pack_routes, save_arrays, unpack_routes)
+            # networkx breaks ties between equal routes its own way
+            cache = cache_file(self._route_cache_dir, 'routes',
+                               cache_key(np.asarray(self._a), backend=backend,
+                                         networkx=nx.__version__))
+            arrays = load_arrays(cache)
+            if arrays is not None:
+                self._route_table = unpack_routes(arrays)
+                self._expanded_route_table = {
+                    pair: self.expand_route(route)
+                    for pair, route in self._route_table.items()}
+                self._route_table_version = self._adj_version
+                self._route_table_backend = backend
+                return
+
+        if backend == 'csgraph':
+            _, pred = shortest_paths(self.csr)
+        else:
+            G = self.graph
+
+        self._route_table = {}
+        self._expanded_route_table = {}
+        for s in range(self._num_nodes):
+            for d in range(self._num_nodes):
+                if s == d:
+                    continue
+                if backend == 'csgraph':
+                    route = path_from_predecessors(pred[s], s, d)
+                    if not route:
+                        continue
+                else:
+                    try:
+                        route = dijkstra(self._a, s, d, graph=G)
+                    except nx.NetworkXNoPath:
+                        # unreachable pairs are left out; get_route() will
+                        # defer to dijkstra() so the caller sees the same
+                        # error
+                        continue
+                self._route_table[(s, d)] = route
+                self._expanded_route_table[(s, d)] = self.expand_route(route)
+        self._route_table_version = self._adj_version
+        self._route_table_backend = backend
+        if cache is not None:
+            save_arrays(cache, **pack_routes(self._route_table))
+
+    def _check_route_table(self, backend: str) -> None:
+        if self._route_table_version != self._adj_version or \
+                self._route_table_backend != backend:
+            self.build_route_table(backend)
+
+    def get_route(self, s: int, d: int,
+                  backend: str = 'networkx') -> List[int]:
+        """Shortest route from `s` to `d` looked up in the route table"""
+        self._check_route_table(backend)
+        try:
+            return self._route_table[(s, d)]
+        except KeyError:
+            from ..rwa.routing.dijkstra import dijkstra
+            if backend == 'csgraph':
+                return dijkstra(self._a, s, d, backend=backend, csr=self.csr)
+            return dijkstra(self._a, s, d, graph=self.graph)
+
+    def get_expanded_route(self, s: int, d: int, backend: str = 'networkx'
+                           ) -> ExpandedRoute:
+        """Route from `s` to `d` with virtual hops expanded (table lookup)"""
+        self._check_route_table(backend)
+        try:
+            return self._expanded_route_table[(s, d)]
+        except KeyError:
+            return self.expand_route(self.get_route(s, d, backend))
+
+    def expand_route(self, route: List[int]) -> ExpandedRoute:
+        """Expand the virtual hops of `route` into their physical subpaths
+
+        Expansions are memoized per route (until the adjacency changes), so
+        every request routed along the same path shares one immutable
+        `ExpandedRoute`, link ids included. Topologies without
+        `virtual_adjacency2physical_path()` leave routes as they are.
+        """
+        if self._expanded_routes_version != self._adj_version:
+            self._expanded_routes = {}
+            self._expanded_routes_version = self._adj_version
+        key = tuple(route)
+        try:
+            return self._expanded_routes[key]
+        except KeyError:
+            pass
+        from .aux_helpers import expand_aux_route
+        try:
+            mapping = self.virtual_adjacency2physical_path()
+        except Exception:
+            mapping = {}
+        nodes, contains_virtual, mapped = expand_aux_route(list(key), mapping)
+        nodes = tuple(nodes)
+        expanded = ExpandedRoute(nodes, contains_virtual,
+                                 tuple(tuple(p) for p in mapped),
+                                 tuple(self.route_edge_ids(nodes)),
+                                 _lightpath_links(nodes))
+        self._expanded_routes[key] = expanded
+        return expanded
+
+    def get_k_paths(self, s: int, d: int, k: int,
+                    backend: str = 'networkx') -> List[List[int]]:
+        """Up to `k` shortest candidate paths from `s` to `d` (cached)
+
+        Args:
+            s: source node index
+            d: destination node index
+            k: number of alternate paths
+            backend: routing backend, 'networkx' (reference) or 'csgraph'
+
+        Returns:
+            :obj:`list` of :obj:`list`: at most `k` paths, as returned by
+                `rwa.routing.yen()`
+
+        """
+        if self._k_paths_version != self._adj_version:
+            self._k_paths = {}
+            self._k_paths_version = self._adj_version
+        key = (s, d, k, backend)
+        try:
+            return self._k_paths[key]
+        except KeyError:
+            pass
+        from ..rwa.routing.yen import yen
+        if backend == 'csgraph':
+            paths = yen(self._a, s, d, k, backend=backend, csr=self.csr)
+        else:
+            paths = yen(self._a, s, d, k, graph=self.graph, backend=backend)
+        self._k_paths[key] = paths
+        return paths
+
     @property
     def t(self) -> np.ndarray:
-        """The traffic matrix"""
+        """The traffic matrix
+
+        Read-only N x N x W view materialized from the per-edge timer array:
+        the holding time assigned to each busy channel, 0 once released. It
+        also exposes the lightpath registry (see `add_lightpath()`).
+        """
+        if self._t_version != self._state_version:
+            t = TrafficMatrix(self._num_nodes, self._num_channels,
+                              self._registry, self._channel_usage)
+            self._fill_view(t, self._timer)
+            t.setflags(write=False)
+            self._t = t
+            self._t_version = self._state_version
         return self._t
 
+    def _fill_view(self, view: np.ndarray, per_edge: np.ndarray) -> None:
+        if not self._edges:
+            return
+        i, j = np.array(self._edges).T
+        view[i, j] = per_edge[:-1]
+        view[j, i] = per_edge[:-1]
+
+    # --- Lightpath registry ------------------------------------------
+    @property
+    def lightpaths(self) -> List[Lightpath]:
+        """The list of connections (lightpaths) currently running"""
+        return self._registry.lightpaths
+
+    @property
+    def nconns(self) -> int:
+        """The number of connections (lightpaths) currently running"""
+        return self._registry.nconns
+
+    @property
+    def lightpath_registry(self) -> LightpathRegistry:
+        """The registry of running connections"""
+        return self._registry
+
+    def add_lightpath(self, lightpath: Lightpath) -> None:
+        """Register a running connection, see
+        `LightpathRegistry.add_lightpath()`
+
+        QKP keys still held for the lightpath are consumed at this point.
+
+        """
+        self.commit_qkp(lightpath.qkp_reservation,
+                        {'route': tuple(lightpath.r)})
+        self._registry.add_lightpath(lightpath)
+
+    def remove_lightpath_by_id(self, _id: int) -> None:
+        """Unregister a running connection by lightpath id"""
+        self._registry.remove_lightpath_by_id(_id)
+
     @property
     def s(self) -> int:
         """The source node"""
@@ -434,94 +1206,713 @@ class Network(object):
         """The number of links (edges) in the network"""
         return self._num_links
 
+    # --- Packed wavelength availability ------------------------------
+    @property
+    def edges(self) -> List[Tuple[int, int]]:
+        """Undirected links (i, j), i < j, in edge-id order"""
+        return self._edges
+
+    def edge_id(self, i: int, j: int) -> int:
+        """Edge id of link (i, j); `nedges` if the nodes are not linked"""
+        return self._edge_id.get((i, j), self._no_edge)
+
+    def route_edge_ids(self, route: List[int]) -> List[int]:
+        """Edge ids of the links along `route`"""
+        get, none = self._edge_id.get, self._no_edge
+        return [get((route[idx], route[idx + 1]), none)
+                for idx in range(len(route) - 1)]
+
+    @property
+    def nedges(self) -> int:
+        """Number of distinct undirected links"""
+        return self._no_edge
+
+    @property
+    def availability(self) -> np.ndarray:
+        """Per-edge channel availability, shape (`nedges` + 1) x W
+
+        Row `edge_id(i, j)` tells which channels are free on link (i, j); the
+        trailing row stands for node pairs without a link and is all False.
+        Read-only, use `occupy_channel()` / `release_channel()`.
+        """
+        view = self._avail.view()
+        view.setflags(write=False)
+        return view
+
+    def rebuild_free_masks(self) -> None:
+        """Recompute the per-edge free-channel bitmasks from the availability
+        array"""
+        self._free_masks = []
+        for row in self._avail:
+            bits = np.packbits(row, bitorder='little')
+            self._free_masks.append(int.from_bytes(bits.tobytes(), 'little'))
+
+    @property
+    def all_channels_mask(self) -> int:
+        """Bitmask with one bit set per wavelength channel"""
+        return self._all_channels_mask
+
+    def free_mask(self, i: int, j: int) -> int:
+        """Bitmask of the free wavelength channels on link (i, j)"""
+        return self._free_masks[self._edge_id.get((i, j), self._no_edge)]
+
+    def is_free(self, i: int, j: int, w: int) -> bool:
+        """Whether channel `w` is free on link (i, j)
+
+        Scalar equivalent of `n[i][j][w]` that reads the packed bitmasks
+        instead of slicing through intermediate array views.
+        """
+        w = int(w)
+        if not -self._num_channels <= w < self._num_channels:
+            raise IndexError('channel index %d is out of bounds for %d '
+                             'channels' % (w, self._num_channels))
+        mask = self._free_masks[self._edge_id.get((i, j), self._no_edge)]
+        return bool((mask >> (w % self._num_channels)) & 1)
+
+    def free_count(self, i: int, j: int) -> int:
+        """Number of free channels on link (i, j)"""
+        eid = self._edge_id.get((i, j))
+        if eid is None:
+            return 0
+        return self._num_channels - int(self._link_usage[eid])
+
+    def link_usage(self, i: int, j: int) -> int:
+        """Number of busy channels on link (i, j)"""
+        return int(self._link_usage[self._edge_id.get((i, j),
+                                                      self._no_edge)])
+
+    @property
+    def channel_usage(self) -> np.ndarray:
+        """Number of links on which each channel is busy (read-only)"""
+        view = self._channel_usage.view()
+        view.setflags(write=False)
+        return view
+
+    def route_free_mask(self, route: List[int]) -> int:
+        """Bitmask of the channels free on every link along `route`"""
+        masks = self._free_masks
+        get, none = self._edge_id.get, self._no_edge
+        mask = self._all_channels_mask
+        for idx in range(len(route) - 1):
+            mask &= masks[get((route[idx], route[idx + 1]), none)]
+            if not mask:
+                break
+        return mask
+
+    def occupy_channel(self, i: int, j: int, w: int,
+                       holding_time: Optional[float] = None) -> None:
+        """Mark channel `w` as busy on link (i, j)
+
+        Args:
+            i: link endpoint
+            j: link endpoint
+            w: wavelength channel index
+            holding_time: if given, the channel is released automatically by
+                `advance_clock()` once this much time has elapsed
+
+        """
+        w = int(w)
+        if not -self._num_channels <= w < self._num_channels:
+            raise IndexError('channel index %d is out of bounds for %d '
+                             'channels' % (w, self._num_channels))
+        if w < 0:
+            w += self._num_channels  # same wrap-around as indexing `n`
+        eid = self._edge_id.get((i, j))
+        if eid is None:
+            return  # not a link: nothing is ever free there
+        bit = 1 << w
+        if self._free_masks[eid] & bit:
+            self._avail[eid, w] = False
+            self._free_masks[eid] &= ~bit
+            self._channel_usage[w] += 1
+            self._link_usage[eid] += 1
+        if holding_time is not None:
+            self._timer[eid, w] = holding_time
+            self._schedule_release(eid, w, holding_time)
+        else:
+            # held until released explicitly: drop any pending expiry
+            self._expiry.pop((eid, w), None)
+        self._state_version += 1
+
+    def release_channel(self, i: int, j: int, w: int) -> None:
+        """Mark channel `w` as free on link (i, j)"""
+        eid = self._edge_id.get((i, j))
+        if eid is not None:
+            self._release(eid, int(w) % self._num_channels)
+
+    def _release(self, eid: int, w: int) -> None:
+        self._expiry.pop((eid, w), None)
+        self._timer[eid, w] = 0
+        bit = 1 << w
+        if not self._free_masks[eid] & bit:
+            self._avail[eid, w] = True
+            self._free_masks[eid] |= bit
+            self._channel_usage[w] -= 1
+            self._link_usage[eid] -= 1
+        self._state_version += 1
+
+    @staticmethod
+    def lowest_channel(mask: int) -> int:
+        """Index of the lowest set bit in `mask`, or -1 if it is empty"""
+        return (mask & -mask).bit_length() - 1
+
+    @staticmethod
+    def mask_channels(mask: int) -> List[int]:
+        """Indices of the set bits in `mask`, in increasing order"""
+        channels = []
+        while mask:
+            low = mask & -mask
+            channels.append(low.bit_length() - 1)
+            mask ^= low
+        return channels
+
+    # --- Channel release scheduler -----------------------------------
+    @property
+    def clock(self) -> float:
+        """Network clock, i.e. the total time elapsed via `advance_clock()`"""
+        return self._clock
+
+    def _schedule_release(self, eid: int, w: int,
+                          holding_time: float) -> None:
+        expiry = self._clock + float(holding_time)
+        self._expiry[(eid, w)] = expiry
+        heapq.heappush(self._expiry_heap, (expiry, eid, w))
+
+    def advance_clock(self, elapsed: float) -> None:
+        """Move the network clock forward and release expired resources
+
+        A channel or lightpath expires once its holding time is fully
+        elapsed, i.e. when the remaining time is less than or equal to
+        `elapsed`. Expired lightpaths are retired from the registry;
+        expired channels get their timer cleared and are freed.
+
+        Args:
+            elapsed: time since the previous call
+
+        """
+        self._registry.advance_clock(elapsed)
+        self._clock += elapsed
+        heap = self._expiry_heap
+        expiry_of = self._expiry
+        while heap and heap[0][0] <= self._clock:
+            expiry, eid, w = heapq.heappop(heap)
+            if expiry_of.get((eid, w)) != expiry:
+                continue  # stale entry, channel was rescheduled or released
+            self._release(eid, w)
+
+    def remaining_time(self, i: int, j: int, w: int) -> float:
+        """Time left before channel `w` on link (i, j) is released"""
+        key = (self.edge_id(i, j), int(w) % self._num_channels)
+        try:
+            return max(0.0, self._expiry[key] - self._clock)
+        except KeyError:
+            return 0.0
+
+    # --- Wavelength x timeslot occupancy ------------------------------
+    @property
+    def slots(self) -> SlotGrid:
+        """Per-link wavelength x timeslot advance bookings, with the ring
+        head at the current slot; built on first access"""
+        head = math.floor(self._clock)
+        if self._slots is None:
+            self._slots = SlotGrid(self._avail.shape[0], self._num_channels,
+                                   head=head)
+        else:
+            self._slots.advance(head)
+        return self._slots
+
+    @property
+    def has_slot_bookings(self) -> bool:
+        """Whether any timeslot is booked in advance"""
+        return self._slots is not None and not self.slots.empty
+
+    def _channel_end(self, eid: int, w: int) -> int:
+        """Absolute slot where the ongoing occupation of busy channel `w`
+        on edge `eid` ends"""
+        expiry = self._expiry.get((eid, w))
+        return FOREVER if expiry is None else math.ceil(expiry)
+
+    def _slot_ends(self, eids: List[int], ws=None) -> np.ndarray:
+        """Absolute slots where the ongoing occupations end, the current
+        slot for free channels
+
+        Returns:
+            np.ndarray: one entry per edge for channels `ws[k]` of edges
+                `eids[k]`, or a len(eids) x W array if `ws` is None
+
+        """
+        head = math.floor(self._clock)
+        if ws is None:
+            ends = np.full((len(eids), self._num_channels), head,
+                           dtype=np.int64)
+            for k, eid in enumerate(eids):
+                for w in np.flatnonzero(~self._avail[eid]).tolist():
+                    ends[k, w] = self._channel_end(eid, w)
+            return ends
+        ends = np.full(len(eids), head, dtype=np.int64)
+        for k, (eid, w) in enumerate(zip(eids, ws)):
+            if not self._avail[eid, w]:
+                ends[k] = self._channel_end(eid, w)
+        return ends
+
+    def _slot_channels(self, eids: List[int], w) -> List[int]:
+        """Channel of each edge: `w` on every edge, or one per edge"""
+        if np.ndim(w) == 0:
+            return [int(w) % self._num_channels] * len(eids)
+        return [int(ch) % self._num_channels for ch in w]
+
+    def slot_span(self, holding_time: float, start: float = 0.0) -> int:
+        """Number of timeslots touched by a holding time beginning `start`
+        time units from now"""
+        begin = self._clock + start
+        return max(0, math.ceil(begin + holding_time) - math.floor(begin))
+
+    def route_slots_fit(self, route: List[int], w, holding_time: float,
+                        start: int = 0) -> bool:
+        """Whether channel `w` (or one channel per link) is free along
+        `route` for the whole `holding_time`, from `start` slots ahead
+
+        Ongoing occupations are checked up to their expiry, however far;
+        advance bookings only exist within the horizon of the slot ring.
+
+        """
+        return self.links_slots_fit(list(zip(route, route[1:])), w,
+                                    holding_time, start)
+
+    def links_slots_fit(self, links: List[Tuple[int, int]], w,
+                        holding_time: float, start: int = 0,
+                        replace: bool = False) -> bool:
+        """Same as `route_slots_fit()` over an explicit list of links
+
+        With `replace`, the ongoing occupation of the channels is ignored,
+        as `occupy_channel()` overwrites it.
+
+        """
+        get = self._edge_id.get
+        eids = [get(link) for link in links]
+        if not eids or None in eids:
+            return False
+        ws = self._slot_channels(eids, w)
+        ends = None if replace else self._slot_ends(eids, ws)
+        return self.slots.fits(eids, ws, self.slot_span(holding_time), start,
+                               ends)
+
+    def tp_alloc_time(self, links: Iterable[Tuple[int, int]], ws,
+                      holding_time: float, alloc_time: float) -> float:
+        """Holding time to lock a lightpath's channels for, given the TP
+        extended `alloc_time`
+
+        The extension beyond `holding_time` is only granted if it does not
+        run into an advance reservation on any of the channels locked,
+        otherwise the base `holding_time` is returned. Locking overwrites
+        the ongoing occupation of the channels, so that is no conflict.
+        Nothing to check while no slot is booked.
+
+        Args:
+            links: links of the route
+            ws: channel used on every link, or one channel per link; links
+                covered by QKP keys (negative entries) lock nothing
+            holding_time: base holding time of the request
+            alloc_time: holding time with the TP multiplier applied
+
+        """
+        if alloc_time <= holding_time or not self.has_slot_bookings:
+            return alloc_time
+        links = list(links)
+        if np.ndim(ws) == 0:
+            ws = [ws] * len(links)
+        locked = [(link, w) for link, w in zip(links, ws)
+                  if w is not None and w >= 0]
+        if locked and not self.links_slots_fit(
+                [link for link, _ in locked], [w for _, w in locked],
+                alloc_time, replace=True):
+            return holding_time
+        return alloc_time
+
+    def route_slot_first_fit(self, route: List[int],
+                             holding_time: float) -> Optional[int]:
+        """Lowest channel free along `route` for the whole `holding_time`
+        starting now"""
+        eids = self.route_edge_ids(route)
+        if not eids or self._no_edge in eids:
+            return None
+        return self.slots.first_fit(eids, self.slot_span(holding_time),
+                                    ends=self._slot_ends(eids))
+
+    def reserve_slots(self, route: List[int], holding_time: float,
+                      w=None, start: Optional[int] = None
+                      ) -> Optional[Tuple[int, int]]:
+        """Book an advance reservation of `holding_time` along `route`
+
+        Args:
+            route: path encoded as a sequence of router indices
+            holding_time: duration of the reservation
+            w: channel to book; the earliest fitting one if None
+            start: slot offset to book at; the earliest fitting one if None
+
+        Returns:
+            tuple: (start offset, channel) of the booked block, or None if no
+                block fits within the horizon
+
+        """
+        eids = self.route_edge_ids(route)
+        if not eids or self._no_edge in eids:
+            return None
+        grid = self.slots
+        length = max(1, math.ceil(holding_time))
+        if length > grid.horizon:
+            return None
+        ends = self._slot_ends(eids)
+        if w is None and start is None:
+            found = grid.earliest_fit(eids, length, ends)
+            if found is None:
+                return None
+            start, w = found
+        elif w is None:
+            w = grid.first_fit(eids, length, start, ends)
+            if w is None:
+                return None
+        ws = self._slot_channels(eids, w)
+        ends = ends[np.arange(len(eids)), ws]
+        if start is None:
+            start = next((off for off in range(grid.horizon - length + 1)
+                          if grid.fits(eids, ws, length, off, ends)), None)
+            if start is None:
+                return None
+        if not grid.reserve(eids, ws, length, start, ends):
+            return None
+        return start, w
+
     # --- Quantum Key Pool (QKP) API ---------------------------------
+    def _qkp_pair(self, edge: Tuple[int, int]) -> int:
+        """Pair id of `edge`, a 2-tuple (i, j) or a sequence whose first two
+        elements are node indices"""
+        try:
+            return int(self._qkp_pair_id[edge[0], edge[1]])
+        except (IndexError, TypeError):
+            raise ValueError('edge must be a pair of node indices') from None
+
     def _normalize_edge(self, edge: Tuple[int, int]) -> Tuple[int, int]:
         """Return the unordered (i, j) tuple used as key for QKP pools.
 
         Accepts either a 2-tuple (i, j) or a sequence where first two
         elements are node indices. Normalizes so that i < j.
         """
-        # Fast-path: if the edge is an ordered pair present in precomputed
-        # map, return it directly. Otherwise coerce and fallback to compute.
-        try:
-            # support sequences (list/tuple) and numeric-like inputs
-            i = int(edge[0])
-            j = int(edge[1])
-        except Exception:
-            raise ValueError('edge must be a pair of node indices')
+        return self._qkp_pairs[self._qkp_pair(edge)]
+
+    def qkp_ids(self, links: Iterable[Tuple[int, int]]) -> np.ndarray:
+        """Pair ids of `links`, as an array usable to index the QKP pools"""
+        links = np.asarray(list(links), dtype=np.intp).reshape(-1, 2)
+        return self._qkp_pair_id[links[:, 0], links[:, 1]]
+
+    def route_qkp_ids(self, route: List[int]) -> np.ndarray:
+        """Pair ids of the links along `route`"""
+        nodes = np.asarray(route, dtype=np.intp)
+        return self._qkp_pair_id[nodes[:-1], nodes[1:]]
+
+    def _settle_qkp(self, ids) -> None:
+        """Add to the pools `ids` (a pair id or an array of them) the keys
+        generated since they were last settled"""
+        rate = self._qkp_rate[ids]
+        elapsed = self._clock - self._qkp_last[ids]
+        amount = self._qkp[ids]
+        new = np.floor(rate * elapsed)
+        room = np.maximum(self._qkp_cap[ids] - amount, 0)
+        capped = new >= room
+        # keep the progress towards the next key, unless the cap is reached
+        last = np.where(capped | (rate <= 0), self._clock,
+                        self._qkp_last[ids] + new / np.where(rate > 0, rate, 1))
+        self._qkp[ids] = amount + np.minimum(new, room).astype(np.int64)
+        self._qkp_last[ids] = last
+
+    def set_qkp_rate(self, edge: Tuple[int, int], rate: float,
+                     cap: float = np.inf) -> None:
+        """Generate keys continuously on the pool of `edge`
 
-        key = self._qkp_key_map.get((i, j))
-        if key is not None:
-            return key
-        # fallback (shouldn't happen if map was built for all pairs)
-        return (i, j) if i <= j else (j, i)
+        Args:
+            edge: pair of node indices
+            rate: keys generated per unit of network time, 0 to stop
+            cap: the pool stops accruing once it holds this many keys
+
+        """
+        self.set_qkp_rates([edge], rate, cap)
+
+    def set_qkp_rates(self, links: Iterable[Tuple[int, int]], rate: float,
+                      cap: float = np.inf) -> None:
+        """Same as `set_qkp_rate()` for every link in `links`"""
+        if rate < 0:
+            raise ValueError('key generation rate must not be negative')
+        ids = self.qkp_ids(links)
+        if self._qkp_accrual:
+            self._settle_qkp(ids)   # the old rate applies up to now
+        self._qkp_rate[ids] = rate
+        self._qkp_cap[ids] = cap
+        self._qkp_last[ids] = self._clock
+        self._qkp_accrual = bool((self._qkp_rate > 0).any())
+
+    def qkp_rate(self, edge: Tuple[int, int]) -> float:
+        """Key generation rate of the pool of `edge`"""
+        return float(self._qkp_rate[self._qkp_pair(edge)])
 
     def add_qkp(self, edge: Tuple[int, int], amount: int = 1) -> None:
         """Add `amount` keys to the QKP pool for `edge` (undirected).
 
         edge: pair of node indices or sequence with first two elements.
         """
-        # inline fast lookup using precomputed map to avoid repeated
-        # normalization calls and reduce overhead.
-        try:
-            i = int(edge[0]); j = int(edge[1])
-            key = self._qkp_key_map.get((i, j))
-        except Exception:
-            key = None
-        if key is None:
-            # final fallback to normalized pair
-            key = self._normalize_edge(edge)
-        self._qkp_pools[key] = int(self._qkp_pools.get(key, 0)) + int(amount)
+        pid = self._qkp_pair(edge)
+        if self._qkp_accrual:
+            self._settle_qkp(pid)
+        self._qkp[pid] += int(amount)
 
     def use_qkp(self, edge: Tuple[int, int], amount: int = 1) -> bool:
         """Consume `amount` keys from the pool for `edge` if available.
 
         Returns True if keys were available and consumed, False otherwise.
         """
-        try:
-            i = int(edge[0]); j = int(edge[1])
-            key = self._qkp_key_map.get((i, j))
-        except Exception:
-            key = None
-        if key is None:
-            key = self._normalize_edge(edge)
-        avail = int(self._qkp_pools.get(key, 0))
-        if avail >= amount:
-            self._qkp_pools[key] = avail - int(amount)
+        pid = self._qkp_pair(edge)
+        if self._qkp_accrual:
+            self._settle_qkp(pid)
+        if self._qkp[pid] - self._qkp_held[pid] >= amount:
+            self._qkp[pid] -= amount
             return True
         return False
 
     def get_qkp(self, edge: Tuple[int, int]) -> int:
         """Return the number of keys in the pool for `edge` (undirected)."""
-        try:
-            i = int(edge[0]); j = int(edge[1])
-            key = self._qkp_key_map.get((i, j))
-        except Exception:
-            key = None
-        if key is None:
-            key = self._normalize_edge(edge)
-        return int(self._qkp_pools.get(key, 0))
+        pid = self._qkp_pair(edge)
+        if self._qkp_accrual:
+            self._settle_qkp(pid)
+        return int(self._qkp[pid])
+
+    def get_qkp_batch(self, links: Iterable[Tuple[int, int]]) -> np.ndarray:
+        """Number of keys in the pool of each link, as an array"""
+        ids = self.qkp_ids(links)
+        if self._qkp_accrual:
+            self._settle_qkp(ids)
+        return self._qkp[ids]
+
+    def add_qkp_batch(self, links: Iterable[Tuple[int, int]],
+                      amount: int = 1) -> None:
+        """Add `amount` keys to the pool of every link in `links`"""
+        ids = self.qkp_ids(links)
+        if self._qkp_accrual:
+            self._settle_qkp(ids)
+        np.add.at(self._qkp, ids, int(amount))
+
+    def use_qkp_batch(self, links: Iterable[Tuple[int, int]],
+                      amount: int = 1) -> bool:
+        """Consume `amount` keys on every link in `links`, all or nothing
+
+        A link listed more than once is charged once per occurrence.
+
+        Returns True if every pool could pay and keys were consumed, False
+        (with the pools untouched) otherwise.
+        """
+        ids, counts = np.unique(self.qkp_ids(links), return_counts=True)
+        if self._qkp_accrual:
+            self._settle_qkp(ids)
+        need = counts * amount
+        if (self._qkp[ids] - self._qkp_held[ids] < need).any():
+            return False
+        self._qkp[ids] -= need
+        return True
+
+    def free_qkp_batch(self, links: Iterable[Tuple[int, int]]) -> np.ndarray:
+        """Number of keys of each link not held by a pending reservation"""
+        ids = self.qkp_ids(links)
+        if self._qkp_accrual:
+            self._settle_qkp(ids)
+        return self._qkp[ids] - self._qkp_held[ids]
+
+    def qkp_available(self, links: Iterable[Tuple[int, int]],
+                      amount: int = 1) -> bool:
+        """Whether `amount` keys could be reserved on every link in `links`
+        (read-only check, a link listed twice needs twice the keys)"""
+        ids, counts = np.unique(self.qkp_ids(links), return_counts=True)
+        if self._qkp_accrual:
+            self._settle_qkp(ids)
+        return bool((self._qkp[ids] - self._qkp_held[ids]
+                     >= counts * amount).all())
+
+    def reserve_qkp(self, links: Iterable[Tuple[int, int]],
+                    amount: int = 1) -> Optional[QkpReservation]:
+        """Hold `amount` keys on every link in `links`, all or nothing
+
+        The pools are left untouched: the keys are only set aside, so a
+        reservation that is not going to be used costs nothing to undo.
+
+        Returns:
+            QkpReservation: the pending reservation, or None (with nothing
+                held) if some pool cannot cover it
 
-    def record_bypass_saved_keys(self, edge: Tuple[int, int], amount: int = 1) -> None:
-        """Record keys saved by performing a bypass: increment pool and log it."""
-        try:
-            i = int(edge[0]); j = int(edge[1])
-            key = self._qkp_key_map.get((i, j))
-        except Exception:
-            key = None
-        if key is None:
-            key = self._normalize_edge(edge)
-        self._qkp_pools[key] = int(self._qkp_pools.get(key, 0)) + int(amount)
-        self._qkp_log.append((key, int(amount)))
+        """
+        links = [(link[0], link[1]) for link in links]
+        ids, counts = np.unique(self.qkp_ids(links), return_counts=True)
+        if self._qkp_accrual:
+            self._settle_qkp(ids)
+        need = counts * int(amount)
+        if (self._qkp[ids] - self._qkp_held[ids] < need).any():
+            return None
+        self._qkp_held[ids] += need
+        return QkpReservation(links, int(amount), ids, need)
+
+    def commit_qkp(self, reservation: Optional[QkpReservation],
+                   info: dict | None = None) -> None:
+        """Consume the keys held by `reservation` and log the consumption
+
+        One usage log entry is written per link, as with
+        `record_qkp_consumption()`. Committing anything but a pending
+        reservation is a no-op.
+
+        """
+        if reservation is None or not reservation.pending:
+            return
+        self._qkp[reservation._ids] -= reservation._need
+        self._qkp_held[reservation._ids] -= reservation._need
+        reservation._state = QkpReservation.COMMITTED
+        # the links of one commit share a single copy of `info`
+        info = dict(info or {})
+        pairs, pair_id = self._qkp_pairs, self._qkp_pair_id
+        self._qkp_usage_log.extend(
+            (pairs[pair_id[i, j]], reservation.amount, info)
+            for (i, j) in reservation.links)
+
+    def abort_qkp(self, reservation: Optional[QkpReservation]) -> None:
+        """Release the keys held by `reservation` back to the pools"""
+        if reservation is None or not reservation.pending:
+            return
+        self._qkp_held[reservation._ids] -= reservation._need
+        reservation._state = QkpReservation.ABORTED
+
+    def reserve_lightpath_qkp(self, lightpath: Lightpath,
+                              links: Iterable[Tuple[int, int]],
+                              amount: int = 1) -> bool:
+        """Hold QKP keys for `lightpath`, see `reserve_qkp()`
+
+        The reservation is stored in `lightpath.qkp_reservation` and must be
+        committed by allocating the lightpath (`add_lightpath()` or
+        `commit_qkp()`), or aborted with `abort_qkp()`. A lightpath dropped
+        without either hands its keys back once it is garbage collected.
+
+        Returns:
+            bool: True if the keys are held, False (with nothing held) if
+                some pool cannot cover them
+
+        """
+        reservation = self.reserve_qkp(links, amount)
+        if reservation is None:
+            return False
+        lightpath.qkp_reservation = reservation
+        weakref.finalize(lightpath, self.abort_qkp, reservation)
+        return True
+
+    def record_bypass_saved_keys(self, edge: Tuple[int, int], amount: int = 1,
+                                 info: dict | None = None) -> None:
+        """Record keys saved by performing a bypass: increment pool and log it.
+
+        info: optional metadata (e.g. call id and time) appended to the log
+        record.
+        """
+        pid = self._qkp_pair(edge)
+        if self._qkp_accrual:
+            self._settle_qkp(pid)
+        self._qkp[pid] += int(amount)
+        if info is None:
+            self._qkp_log.append((self._qkp_pairs[pid], int(amount)))
+        else:
+            self._qkp_log.append((self._qkp_pairs[pid], int(amount), info))
+
+    def record_bypass_saved_keys_batch(self,
+                                       links: Iterable[Tuple[int, int]],
+                                       amount: int = 1,
+                                       info: dict | None = None) -> None:
+        """Same as `record_bypass_saved_keys()` for every link in `links`,
+        logged in order"""
+        ids = self.qkp_ids(links)
+        if self._qkp_accrual:
+            self._settle_qkp(ids)
+        amount = int(amount)
+        np.add.at(self._qkp, ids, amount)
+        pairs = self._qkp_pairs
+        if info is None:
+            self._qkp_log.extend((pairs[pid], amount) for pid in ids.tolist())
+        else:
+            self._qkp_log.extend((pairs[pid], amount, info)
+                                 for pid in ids.tolist())
+
+    @property
+    def qkp_levels(self) -> np.ndarray:
+        """Read-only view of the key count of every pool, by pair id"""
+        if self._qkp_accrual:
+            self._settle_qkp(slice(None))
+        levels = self._qkp.view()
+        levels.setflags(write=False)
+        return levels
+
+    def qkp_levels_at(self, times) -> np.ndarray:
+        """Key count of every pool, by pair id, at each of `times`
+
+        Only the keys generated since the pools were last settled are
+        accounted for, so `times` must lie between the last change of the
+        pools and the network clock. Nothing is settled.
+
+        Returns:
+            np.ndarray: len(times) x pairs array of levels
+
+        """
+        times = np.asarray(times, dtype=np.float64)
+        if not self._qkp_accrual:
+            return np.broadcast_to(self._qkp, times.shape + self._qkp.shape)
+        elapsed = np.maximum(times[:, None] - self._qkp_last, 0)
+        new = np.floor(self._qkp_rate * elapsed)
+        room = np.maximum(self._qkp_cap - self._qkp, 0)
+        return self._qkp + np.minimum(new, room).astype(np.int64)
 
     @property
     def qkp_pools(self) -> Dict[Tuple[int, int], int]:
         """A copy of the all-pairs QKP pools mapping."""
-        return dict(self._qkp_pools)
+        if self._qkp_accrual:
+            self._settle_qkp(slice(None))
+        return {pair: amount
+                for pair, amount in zip(self._qkp_pairs, self._qkp.tolist())
+                if pair[0] != pair[1] or amount}
 
     def get_qkp_log(self) -> List[Tuple[Tuple[int, int], int]]:
-        """Return a copy of the QKP history log (edge, amount)."""
-        return list(self._qkp_log)
+        """Return a copy of the QKP history log (edge, amount[, info]).
+
+        Only the records still held in memory by the log sink are returned,
+        i.e. all of them with the default `MemorySink`.
+        """
+        return self._qkp_log.entries()
+
+    @property
+    def qkp_log_sink(self) -> QkpLogSink:
+        """Sink receiving the bypass-saved keys log"""
+        return self._qkp_log
+
+    @property
+    def qkp_usage_sink(self) -> QkpLogSink:
+        """Sink receiving the QKP consumption log"""
+        return self._qkp_usage_log
+
+    def set_qkp_log_sinks(self, log: Optional[QkpLogSink] = None,
+                          usage: Optional[QkpLogSink] = None) -> None:
+        """Send the QKP logs to other sinks, see `rwa_wdm.net.qkplog`
+
+        The previous sinks are closed. Passing None for a log leaves its
+        sink unchanged.
+        """
+        if log is not None:
+            self._qkp_log.close()
+            self._qkp_log = log
+        if usage is not None:
+            self._qkp_usage_log.close()
+            self._qkp_usage_log = usage
+
+    def close_qkp_logs(self) -> None:
+        """Flush and close both QKP log sinks"""
+        self._qkp_log.close()
+        self._qkp_usage_log.close()
 
     def record_qkp_consumption(self, edge: Tuple[int, int], amount: int = 1, info: dict | None = None) -> None:
         """Record an event where keys were consumed from a QKP pool.
@@ -530,18 +1921,15 @@ class Network(object):
         amount: number of keys consumed
         info: optional dictionary with extra metadata (e.g., route or call id)
         """
-        try:
-            i = int(edge[0]); j = int(edge[1])
-            key = self._qkp_key_map.get((i, j))
-        except Exception:
-            key = None
-        if key is None:
-            key = self._normalize_edge(edge)
-        self._qkp_usage_log.append((key, int(amount), dict(info or {})))
+        self._qkp_usage_log.append((self._normalize_edge(edge), int(amount),
+                                    dict(info or {})))
 
     def get_qkp_usage_log(self) -> List[Tuple[Tuple[int, int], int, dict]]:
-        """Return a copy of the QKP consumption history log."""
-        return list(self._qkp_usage_log)
+        """Return a copy of the QKP consumption history log.
+
+        Same caveat as `get_qkp_log()` for sinks other than `MemorySink`.
+        """
+        return self._qkp_usage_log.entries()
 
 
     def plot_topology(self, bestroute: List[int] = None) -> None:
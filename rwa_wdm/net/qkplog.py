@@ -0,0 +1,349 @@
+"""Sinks for the QKP history logs
+
+`Network` logs every bypass deposit as an `(edge, amount)` record and every
+key consumption as an `(edge, amount, info)` record. Keeping them all in a
+list grows without bound over long runs, so records go to a sink instead:
+
+* `MemorySink` keeps every record in a list (the default, and what
+  `get_qkp_log()` / `get_qkp_usage_log()` return)
+* `CsvSink` appends records to a text file in fixed-size chunks, one
+  ``i,j,amount[,info]`` line each
+* `BinarySink` appends them as fixed-width binary records, memory-mapped
+  back by `load_qkp_records()`
+* `AggregateSink` only keeps the number of records and keys per edge
+* `SampledSink` forwards one record out of every `every` to another sink
+
+`make_qkp_sink()` builds a sink from the simulators' configuration strings.
+
+"""
+import json
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+__all__ = (
+    'QKP_RECORD_DTYPE',
+    'QkpLogSink',
+    'MemorySink',
+    'CsvSink',
+    'BinarySink',
+    'AggregateSink',
+    'SampledSink',
+    'make_qkp_sink',
+    'load_qkp_records',
+    'qkp_edge_nodes',
+    'qkp_edge_totals',
+)
+
+# fixed-width record of `BinarySink`. `edge` is the QKP pair id of the link,
+# see `qkp_edge_nodes()`; `call` is -1 and `time` NaN when the logged info
+# does not carry them. Other info fields (e.g. the route) are not kept.
+QKP_RECORD_DTYPE = np.dtype([('time', '<f8'), ('edge', '<i4'),
+                             ('amount', '<i4'), ('call', '<i4'),
+                             ('sim', '<i4')])
+
+DEFAULT_CHUNK_SIZE = 4096
+
+
+class QkpLogSink(object):
+    """Destination of QKP log records
+
+    Subclasses override `append()`; the remaining methods have sensible
+    defaults. `count` is the number of records received, whether kept or not.
+
+    """
+
+    def __init__(self) -> None:
+        self._count: int = 0
+
+    @property
+    def count(self) -> int:
+        """Number of records received"""
+        return self._count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, record: Tuple) -> None:
+        raise NotImplementedError
+
+    def extend(self, records: Iterable[Tuple]) -> None:
+        for record in records:
+            self.append(record)
+
+    def entries(self) -> List[Tuple]:
+        """Records still held in memory"""
+        return []
+
+    def comment(self, text: str) -> None:
+        """Write a comment line, where the format supports it"""
+
+    def flush(self) -> None:
+        """Push buffered records to their destination"""
+
+    def close(self) -> None:
+        """Flush and release the sink"""
+        self.flush()
+
+
+class MemorySink(QkpLogSink):
+    """Keep every record in a list"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._records: List[Tuple] = []
+
+    def append(self, record: Tuple) -> None:
+        self._records.append(record)
+        self._count += 1
+
+    def extend(self, records: Iterable[Tuple]) -> None:
+        size = len(self._records)
+        self._records.extend(records)
+        self._count += len(self._records) - size
+
+    def entries(self) -> List[Tuple]:
+        return list(self._records)
+
+
+class _ChunkedFileSink(QkpLogSink):
+    """Buffer records and write them to `path` every `chunk_size` records"""
+
+    def __init__(self, path: str,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        super().__init__()
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be positive')
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._path = path
+        self._chunk_size = chunk_size
+        self._buffer: List[Tuple] = []
+
+    @property
+    def path(self) -> str:
+        """File the records are appended to"""
+        return self._path
+
+    def append(self, record: Tuple) -> None:
+        self._buffer.append(record)
+        self._count += 1
+        if len(self._buffer) >= self._chunk_size:
+            self.flush()
+
+    def extend(self, records: Iterable[Tuple]) -> None:
+        size = len(self._buffer)
+        self._buffer.extend(records)
+        self._count += len(self._buffer) - size
+        if len(self._buffer) >= self._chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._buffer:
+            self._write(self._buffer)
+            self._buffer = []
+
+    def _write(self, records: List[Tuple]) -> None:
+        raise NotImplementedError
+
+
+class CsvSink(_ChunkedFileSink):
+    """Append records as ``i,j,amount[,info]`` text lines
+
+    The info dict of usage records is written as JSON.
+
+    Args:
+        path: file to append to
+        chunk_size: number of records buffered between writes
+        with_info: write the info dict of records that have one
+
+    """
+
+    def __init__(self, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 with_info: bool = True) -> None:
+        super().__init__(path, chunk_size)
+        self._with_info = with_info
+
+    def _format(self, record: Tuple) -> str:
+        (i, j), amount = record[0], record[1]
+        if len(record) > 2 and self._with_info:
+            return '%d,%d,%d,%s\n' % (i, j, amount,
+                                      json.dumps(record[2],
+                                                 ensure_ascii=False))
+        return '%d,%d,%d\n' % (i, j, amount)
+
+    def _write(self, records: List[Tuple]) -> None:
+        with open(self._path, 'a', encoding='utf-8') as f:
+            f.writelines(map(self._format, records))
+
+    def comment(self, text: str) -> None:
+        self.flush()
+        with open(self._path, 'a', encoding='utf-8') as f:
+            f.write('# %s\n' % text)
+
+
+class BinarySink(_ChunkedFileSink):
+    """Append records as fixed-width `QKP_RECORD_DTYPE` binary records
+
+    Each chunk is converted column by column and appended with a single
+    write; the file has no header, so simulations can keep appending to it.
+
+    Args:
+        path: file to append to
+        num_nodes: number of nodes of the network, to compute edge ids
+        chunk_size: number of records buffered between writes
+        sim: simulation number stored with records whose info has none
+
+    """
+
+    def __init__(self, path: str, num_nodes: int,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, sim: int = 0) -> None:
+        super().__init__(path, chunk_size)
+        self._num_nodes = num_nodes
+        self._sim = sim
+
+    def _write(self, records: List[Tuple]) -> None:
+        out = np.empty(len(records), dtype=QKP_RECORD_DTYPE)
+        edges = np.array([record[0] for record in records], dtype=np.int64)
+        i, j = edges.min(axis=1), edges.max(axis=1)
+        n = self._num_nodes
+        # position of (i, j) in np.triu_indices(n), as used by Network
+        out['edge'] = i * n - i * (i - 1) // 2 + (j - i)
+        out['amount'] = [record[1] for record in records]
+        infos = [record[2] if len(record) > 2 else {} for record in records]
+        out['time'] = [info.get('time', np.nan) for info in infos]
+        out['call'] = [info.get('call', -1) for info in infos]
+        out['sim'] = [info.get('sim', self._sim) for info in infos]
+        with open(self._path, 'ab') as f:
+            out.tofile(f)
+
+
+class AggregateSink(QkpLogSink):
+    """Keep only the number of records and the total amount per edge"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._totals: Dict[Tuple[int, int], List[int]] = \
+            defaultdict(lambda: [0, 0])
+
+    def append(self, record: Tuple) -> None:
+        total = self._totals[record[0]]
+        total[0] += 1
+        total[1] += record[1]
+        self._count += 1
+
+    def totals(self) -> Dict[Tuple[int, int], Tuple[int, int]]:
+        """Edge -> (number of records, total amount)"""
+        return {edge: (n, amount)
+                for edge, (n, amount) in self._totals.items()}
+
+    def entries(self) -> List[Tuple]:
+        """One `(edge, total amount)` record per edge"""
+        return [(edge, amount)
+                for edge, (_, amount) in sorted(self._totals.items())]
+
+
+class SampledSink(QkpLogSink):
+    """Forward every `every`-th record to `sink`
+
+    Args:
+        sink: sink receiving the sampled records
+        every: sampling period, in records
+
+    """
+
+    def __init__(self, sink: QkpLogSink, every: int) -> None:
+        super().__init__()
+        if every < 1:
+            raise ValueError('sampling period must be positive')
+        self._sink = sink
+        self._every = every
+
+    def append(self, record: Tuple) -> None:
+        if self._count % self._every == 0:
+            self._sink.append(record)
+        self._count += 1
+
+    def entries(self) -> List[Tuple]:
+        return self._sink.entries()
+
+    def comment(self, text: str) -> None:
+        self._sink.comment(text)
+
+    def flush(self) -> None:
+        self._sink.flush()
+
+    def close(self) -> None:
+        self._sink.close()
+
+
+def make_qkp_sink(mode: str, path: Optional[str] = None,
+                  sample: int = 1, sim: int = 0, num_nodes: int = 0,
+                  with_info: bool = True,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE) -> QkpLogSink:
+    """Build a sink from a configuration string
+
+    Args:
+        mode: 'memory', 'csv', 'binary' or 'aggregate'
+        path: output file, required by 'csv' and 'binary'
+        sample: keep one record out of every `sample`
+        sim: simulation number, stored by 'binary' records
+        num_nodes: number of network nodes, required by 'binary'
+        with_info: whether 'csv' lines carry the info dict
+        chunk_size: records buffered between writes by file sinks
+
+    Returns:
+        QkpLogSink: the sink
+
+    Raises:
+        ValueError: if `mode` is unknown or `path` is missing
+
+    """
+    if mode == 'memory':
+        sink: QkpLogSink = MemorySink()
+    elif mode == 'aggregate':
+        sink = AggregateSink()
+    elif mode in ('csv', 'binary'):
+        if path is None:
+            raise ValueError('QKP log mode "%s" needs an output path' % mode)
+        if mode == 'csv':
+            sink = CsvSink(path, chunk_size, with_info)
+        else:
+            sink = BinarySink(path, num_nodes, chunk_size, sim)
+    else:
+        raise ValueError('Unknown QKP log mode "%s"' % mode)
+    if sample > 1:
+        sink = SampledSink(sink, sample)
+    return sink
+
+
+def load_qkp_records(path: str) -> np.ndarray:
+    """Memory-map the records written by `BinarySink`
+
+    Nothing is read until the fields are used, so whole-run analyses are
+    array operations over the file, e.g. ``records['amount'].sum()``.
+
+    Returns:
+        np.ndarray: read-only array of `QKP_RECORD_DTYPE` records
+
+    """
+    if os.path.getsize(path) == 0:
+        return np.empty(0, dtype=QKP_RECORD_DTYPE)
+    return np.memmap(path, dtype=QKP_RECORD_DTYPE, mode='r')
+
+
+def qkp_edge_nodes(edge: np.ndarray,
+                   num_nodes: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Node pairs (i, j), i <= j, of an array of QKP edge ids"""
+    iu, ju = np.triu_indices(num_nodes)
+    return iu[edge], ju[edge]
+
+
+def qkp_edge_totals(records: np.ndarray, num_nodes: int) -> np.ndarray:
+    """Total amount of keys per QKP edge id over `records`"""
+    size = num_nodes * (num_nodes + 1) // 2
+    return np.bincount(records['edge'], weights=records['amount'],
+                       minlength=size).astype(np.int64)
@@ -0,0 +1,134 @@
+"""Periodic snapshots of the QKP pool levels
+
+The QKP logs record every deposit and consumption, so pool levels over time
+can only be recovered by replaying them. `QkpSnapshots` instead samples the
+level of every pool once every `interval` slots into a preallocated
+snapshots x pairs array: each sample is a single vectorized row write, and
+nothing at all happens between samples.
+
+Columns follow the QKP pair ids of `Network`, i.e. the order of
+``np.triu_indices(num_nodes)``. `save()` writes the samples to an ``.npz``
+file with the arrays ``time``, ``levels``, ``i`` and ``j`` (the nodes of each
+column) and ``interval``, to be read back with ``np.load``.
+
+"""
+import os
+
+import numpy as np
+
+__all__ = (
+    'QkpSnapshots',
+)
+
+DEFAULT_CAPACITY = 1024
+
+
+class QkpSnapshots(object):
+    """Time series of the QKP pool levels, sampled every `interval` slots
+
+    Args:
+        num_nodes: number of nodes of the network
+        interval: sampling period, in slots of the network clock
+        capacity: number of snapshots preallocated; the buffer doubles
+            whenever it runs out
+        start: network clock of the first sample
+
+    """
+
+    def __init__(self, num_nodes: int, interval: float = 1,
+                 capacity: int = DEFAULT_CAPACITY, start: float = 0.0) -> None:
+        if interval <= 0:
+            raise ValueError('snapshot interval must be positive')
+        self._num_nodes = num_nodes
+        self._interval = interval
+        num_pairs = num_nodes * (num_nodes + 1) // 2
+        capacity = max(int(capacity), 1)
+        self._times = np.empty(capacity, dtype=np.float64)
+        self._levels = np.empty((capacity, num_pairs), dtype=np.int64)
+        self._count: int = 0
+        self._next: float = start
+
+    @property
+    def interval(self) -> float:
+        """Sampling period, in slots"""
+        return self._interval
+
+    @property
+    def count(self) -> int:
+        """Number of snapshots taken"""
+        return self._count
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def times(self) -> np.ndarray:
+        """Network clock of each snapshot"""
+        return self._times[:self._count]
+
+    @property
+    def levels(self) -> np.ndarray:
+        """Snapshots x pairs array of pool levels"""
+        return self._levels[:self._count]
+
+    def due(self, clock: float) -> bool:
+        """Whether `clock` has reached the next sampling time"""
+        return clock >= self._next
+
+    def _reserve(self, extra: int) -> None:
+        size = self._count + extra
+        capacity = self._times.shape[0]
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        times = np.empty(capacity, dtype=np.float64)
+        levels = np.empty((capacity, self._levels.shape[1]), dtype=np.int64)
+        times[:self._count] = self.times
+        levels[:self._count] = self.levels
+        self._times, self._levels = times, levels
+
+    def sample(self, clock: float, levels) -> int:
+        """Record the pool levels for every sampling time up to `clock`
+
+        Several sampling times may have passed since the last call. With
+        continuous key generation the pools keep changing between events,
+        so `levels` is a function returning the levels at an array of
+        earlier times, e.g. `Network.qkp_levels_at()`, and each snapshot
+        gets the levels at its own sampling time. A plain array of levels
+        read at `clock` is recorded in every snapshot instead, which is
+        only exact when the pools change at events alone.
+
+        Either way, the levels must be read before the next event changes
+        the pools.
+
+        Returns:
+            int: number of snapshots recorded
+
+        """
+        if clock < self._next:
+            return 0
+        k = int((clock - self._next) // self._interval) + 1
+        self._reserve(k)
+        n = self._count
+        times = self._next + self._interval * np.arange(k)
+        self._times[n:n + k] = times
+        self._levels[n:n + k] = levels(times) if callable(levels) else levels
+        self._count += k
+        self._next += k * self._interval
+        return k
+
+    def reset(self, start: float = 0.0) -> None:
+        """Drop the snapshots, keeping the buffer, and sample again from
+        `start`"""
+        self._count = 0
+        self._next = start
+
+    def save(self, path: str) -> None:
+        """Write the snapshots to the ``.npz`` file `path`"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        i, j = np.triu_indices(self._num_nodes)
+        np.savez_compressed(path, time=self.times, levels=self.levels,
+                            i=i, j=j, interval=self._interval)
@@ -0,0 +1,239 @@
+"""Wavelength x timeslot occupancy of the network links
+
+The simulators keep time as a scalar remaining holding time per channel,
+which tells whether a channel is busy *now* but not *when* it is busy. This
+module adds, for every link and wavelength, a bitmap of the timeslots booked
+in advance over a finite horizon, so that a whole block of slots along a
+route can be checked (or searched for) at once.
+
+Slot `s` covers the time interval [s, s + 1) of the network clock. The
+bitmaps are stored as a ring: the column of the current slot moves forward
+as the clock advances and the columns that fall behind are recycled, free,
+at the far end of the horizon.
+
+The ongoing occupation of a channel is not kept in the bitmaps: a lightpath
+usually holds its channels for much longer than the horizon. Queries take it
+instead as the absolute slot where each channel becomes free ("busy until"),
+which has no horizon limit; the network derives it from its release
+schedule.
+
+"""
+from typing import Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+__all__ = (
+    'SlotGrid',
+    'FOREVER',
+)
+
+DEFAULT_HORIZON = 32
+
+# "busy until" slot of a channel held until released explicitly
+FOREVER = np.iinfo(np.int64).max
+
+
+class SlotGrid(object):
+    """Ring of per-link, per-wavelength advance booking bitmaps
+
+    Args:
+        num_edges: number of rows, i.e. undirected links (plus any sentinel)
+        num_channels: number of wavelength channels per link
+        horizon: number of timeslots that can be booked ahead of the current
+            one
+        head: absolute index of the current timeslot
+
+    """
+
+    def __init__(self, num_edges: int, num_channels: int,
+                 horizon: int = DEFAULT_HORIZON, head: int = 0) -> None:
+        if horizon < 1:
+            raise ValueError('horizon must be at least one slot')
+        self._num_channels = num_channels
+        self._horizon = horizon
+        self._busy = np.zeros((num_edges, num_channels, horizon),
+                              dtype=np.bool_)
+        self._head: int = head
+        self._bookings: int = 0
+
+    @property
+    def horizon(self) -> int:
+        """Number of timeslots covered by the bitmaps"""
+        return self._horizon
+
+    @property
+    def head(self) -> int:
+        """Absolute index of the current timeslot"""
+        return self._head
+
+    @property
+    def empty(self) -> bool:
+        """Whether no slot is booked"""
+        return not self._bookings
+
+    def _columns(self, start: int, length: int) -> np.ndarray:
+        """Ring columns of `length` slots beginning `start` slots ahead"""
+        if start < 0 or length < 0 or start + length > self._horizon:
+            raise ValueError('slots [%d, %d) fall outside the %d-slot '
+                             'horizon' % (start, start + length,
+                                          self._horizon))
+        return (self._head + np.arange(start, start + length)) % self._horizon
+
+    def _clip(self, start: int, length: int) -> int:
+        """Part of a block of `length` slots from `start` that lies within
+        the horizon; nothing is ever booked past it"""
+        return max(0, min(length, self._horizon - start))
+
+    def _ongoing(self, ends: Optional[np.ndarray], start: int,
+                 length: int) -> Optional[np.ndarray]:
+        """Mask of the channels whose ongoing occupation, ending at absolute
+        slots `ends`, overlaps the block of `length` slots from `start`"""
+        if ends is None or length <= 0:
+            return None
+        return np.asarray(ends) > self._head + start
+
+    def _ordered(self, eids: Sequence[int]) -> np.ndarray:
+        """Booking bitmaps of `eids` combined (OR) and rolled into time
+        order, as a W x H array"""
+        busy = self._busy[np.asarray(eids, dtype=np.intp)].any(axis=0)
+        return np.roll(busy, -(self._head % self._horizon), axis=1)
+
+    def occupy(self, eid: int, w: int, start: int, length: int) -> None:
+        """Book `length` slots of channel `w` on edge `eid`, from `start`
+        slots ahead of the current one
+
+        Raises:
+            ValueError: if the block does not lie within the horizon
+
+        """
+        cols = self._columns(start, length)
+        self._bookings += int(np.count_nonzero(~self._busy[eid, w, cols]))
+        self._busy[eid, w, cols] = True
+
+    def cancel(self, eid: int, w: int, start: int, length: int) -> None:
+        """Drop the bookings of channel `w` on edge `eid` over `length` slots
+        from `start`"""
+        length = self._clip(start, length)
+        cols = self._columns(start, length)
+        self._bookings -= int(np.count_nonzero(self._busy[eid, w, cols]))
+        self._busy[eid, w, cols] = False
+
+    def advance(self, slot: int) -> None:
+        """Move the ring head forward to absolute slot `slot`
+
+        The slots left behind are cleared and become the free tail of the
+        horizon.
+
+        """
+        steps = slot - self._head
+        if steps <= 0:
+            return
+        if self._bookings:
+            if steps >= self._horizon:
+                self._busy[...] = False
+                self._bookings = 0
+            else:
+                cols = self._columns(0, steps)
+                self._bookings -= int(np.count_nonzero(self._busy[:, :, cols]))
+                self._busy[:, :, cols] = False
+        self._head = slot
+
+    def fits(self, eids: Sequence[int], w: Union[int, Sequence[int]],
+             length: int, start: int = 0,
+             ends: Optional[Sequence[int]] = None) -> bool:
+        """Whether the block of `length` slots from `start` is free
+
+        Args:
+            eids: edges along the route
+            w: channel used on every edge, or one channel per edge
+            length: number of slots in the block; it may reach past the
+                horizon, where nothing is booked
+            start: offset of the block from the current slot
+            ends: absolute slot where the ongoing occupation of each
+                (edge, channel) ends, or None to ignore it, for callers
+                about to overwrite it
+
+        Returns:
+            bool: True if no slot of the block is busy on any edge
+
+        """
+        ongoing = self._ongoing(ends, start, length)
+        if ongoing is not None and ongoing.any():
+            return False
+        length = self._clip(start, length)
+        if not self._bookings or not length:
+            return True
+        eids = np.asarray(eids, dtype=np.intp)
+        ws = np.broadcast_to(np.asarray(w, dtype=np.intp), eids.shape)
+        cols = self._columns(start, length)
+        return not self._busy[eids[:, None], ws[:, None], cols].any()
+
+    def first_fit(self, eids: Sequence[int], length: int, start: int = 0,
+                  ends: Optional[np.ndarray] = None) -> Optional[int]:
+        """Lowest channel whose block of `length` slots from `start` is free
+        on every edge of the route, or None
+
+        `ends` is the len(eids) x W array of the slots where the ongoing
+        occupations end, as for `fits()`.
+
+        """
+        free = np.ones(self._num_channels, dtype=np.bool_)
+        ongoing = self._ongoing(ends, start, length)
+        if ongoing is not None:
+            free &= ~ongoing.any(axis=0)
+        length = self._clip(start, length)
+        if self._bookings and length:
+            cols = self._columns(start, length)
+            busy = self._busy[np.asarray(eids, dtype=np.intp)][:, :, cols]
+            free &= ~busy.any(axis=(0, 2))
+        free = np.flatnonzero(free)
+        return int(free[0]) if free.size else None
+
+    def earliest_fit(self, eids: Sequence[int], length: int,
+                     ends: Optional[np.ndarray] = None
+                     ) -> Optional[Tuple[int, int]]:
+        """Earliest (start, channel) pair at which a block of `length` slots
+        is free on every edge of the route, lowest channel first
+
+        Used for advance reservations: the search covers every start offset
+        within the horizon at once.
+
+        Returns:
+            tuple: (start offset, channel), or None if nothing fits
+
+        """
+        if length < 1 or length > self._horizon:
+            return None
+        busy = self._ordered(eids)
+        if ends is not None:
+            # the ongoing occupation covers the first slots of the horizon
+            until = np.asarray(ends).max(axis=0) - self._head
+            busy = busy | (np.arange(self._horizon) < until[:, None])
+        busy = busy.astype(np.int32)
+        csum = np.zeros((busy.shape[0], busy.shape[1] + 1), dtype=np.int32)
+        np.cumsum(busy, axis=1, out=csum[:, 1:])
+        window = csum[:, length:] - csum[:, :-length]   # W x (H - L + 1)
+        free = window == 0
+        starts = np.flatnonzero(free.any(axis=0))
+        if not starts.size:
+            return None
+        start = int(starts[0])
+        return start, int(np.flatnonzero(free[:, start])[0])
+
+    def reserve(self, eids: Sequence[int], w: Union[int, Sequence[int]],
+                length: int, start: int = 0,
+                ends: Optional[Sequence[int]] = None) -> bool:
+        """Book a block of slots along a route if it is free
+
+        Returns:
+            bool: True if the block was free and is now booked
+
+        """
+        if start + length > self._horizon or \
+                not self.fits(eids, w, length, start, ends):
+            return False
+        eids = np.asarray(eids, dtype=np.intp)
+        ws = np.broadcast_to(np.asarray(w, dtype=np.intp), eids.shape)
+        for eid, ch in zip(eids.tolist(), ws.tolist()):
+            self.occupy(eid, ch, start, length)
+        return True
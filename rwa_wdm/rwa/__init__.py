@@ -5,5 +5,9 @@ from .rwa import (
     yen_vertex_coloring,
     yen_first_fit,
     yen_random_fit,
+    dijkstra_most_used,
+    dijkstra_least_used,
+    yen_most_used,
+    yen_least_used,
     genetic_algorithm
 )
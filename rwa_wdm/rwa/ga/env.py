@@ -31,7 +31,8 @@ def evaluate(net: Network, chromosome: Chromosome) -> Fitness:
             link, and number of hops in the route
 
     """
-    labels = gof(net.n, net.nchannels, chromosome.genes)
+    # plain ndarray: gof() indexes it element by element
+    labels = gof(np.asarray(net.n), net.nchannels, chromosome.genes)
     lambdas_available = np.count_nonzero(labels == 1.0)
     route_length = len(chromosome)
 
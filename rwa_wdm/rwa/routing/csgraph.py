@@ -0,0 +1,135 @@
+"""scipy.sparse.csgraph routing backend
+
+The networkx backend stores the topology as a dict-of-dicts and walks it in
+pure Python. This backend keeps the adjacency as a CSR matrix and relies on
+the array-based shortest-path routines of `scipy.sparse.csgraph`, so a
+single call yields either single-source or all-pairs distances and
+predecessor arrays, from which paths are reconstructed.
+
+"""
+
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse import csgraph as _csgraph
+except ImportError:  # scipy is only required for this backend
+    csr_matrix = None
+    _csgraph = None
+
+# scipy's marker for "no predecessor" in predecessor arrays
+NO_PREDECESSOR = -9999
+
+
+def _require_scipy() -> None:
+    if _csgraph is None:
+        raise ImportError('The "csgraph" routing backend requires scipy. '
+                          'Install it or use the "networkx" backend.')
+
+
+def to_csr(mat: np.ndarray) -> 'csr_matrix':
+    """Convert an adjacency matrix into a CSR matrix
+
+    Zero entries are treated as missing edges, exactly as
+    `nx.from_numpy_array` does for the networkx backend.
+
+    Args:
+        mat: Network's adjacency matrix graph
+
+    Returns:
+        csr_matrix: sparse copy of `mat`
+
+    """
+    _require_scipy()
+    return csr_matrix(np.asarray(mat, dtype=np.float64))
+
+
+def shortest_paths(csr: Union['csr_matrix', np.ndarray],
+                   sources: Optional[Union[int, List[int]]] = None,
+                   unweighted: bool = False
+                   ) -> Tuple[np.ndarray, np.ndarray]:
+    """Single-source or all-pairs Dijkstra over an undirected graph
+
+    Args:
+        csr: adjacency as a CSR matrix (or anything csgraph accepts)
+        sources: a source node index, a list of them, or None for all pairs
+        unweighted: when True, minimize hop count instead of total weight
+
+    Returns:
+        tuple: (dist, predecessors) arrays. 1D when `sources` is a single
+            index, 2D (one row per source) otherwise.
+
+    """
+    _require_scipy()
+    return _csgraph.dijkstra(csr, directed=False, indices=sources,
+                             return_predecessors=True, unweighted=unweighted)
+
+
+def path_from_predecessors(pred: np.ndarray, s: int, d: int) -> List[int]:
+    """Rebuild the s -> d path from a predecessor array
+
+    Args:
+        pred: predecessor array of the single-source search rooted at `s`
+        s: source node index
+        d: destination node index
+
+    Returns:
+        :obj:`list` of :obj:`int`: the path, or an empty list if `d` is
+            unreachable from `s`
+
+    """
+    if s == d:
+        return [s]
+    if pred[d] == NO_PREDECESSOR:
+        return []
+    path = [d]
+    cur = d
+    while cur != s:
+        cur = int(pred[cur])
+        path.append(cur)
+    path.reverse()
+    return path
+
+
+def csgraph_dijkstra(csr: Union['csr_matrix', np.ndarray],
+                     s: int, d: int) -> List[int]:
+    """Dijkstra routing algorithm over a CSR adjacency
+
+    Args:
+        csr: adjacency as a CSR matrix
+        s: source node index
+        d: destination node index
+
+    Returns:
+        :obj:`list` of :obj:`int`: sequence of router indices encoding a path
+
+    """
+    _, pred = shortest_paths(csr, s)
+    return path_from_predecessors(pred, s, d)
+
+
+def csgraph_yen(csr: Union['csr_matrix', np.ndarray],
+                s: int, d: int, k: int) -> List[List[int]]:
+    """Yen's k-shortest loopless paths over a CSR adjacency
+
+    Paths are ranked by hop count, matching the networkx backend which runs
+    `shortest_simple_paths` with `weight=None`.
+
+    Args:
+        csr: adjacency as a CSR matrix
+        s: source node index
+        d: destination node index
+        k: number of alternate paths
+
+    Returns:
+        :obj:`list` of :obj:`list`: at most `k` paths
+
+    """
+    _require_scipy()
+    if k <= 0:
+        return []
+    _, preds = _csgraph.yen(csr, s, d, k, directed=False,
+                            return_predecessors=True, unweighted=True)
+    return [path_from_predecessors(row, s, d) for row in preds]
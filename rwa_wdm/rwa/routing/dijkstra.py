@@ -2,20 +2,24 @@
 
 """
 
-from typing import List
+from typing import List, Optional
 
 import math
 import numpy as np
 import networkx as nx
 import logging
 
+from .csgraph import csgraph_dijkstra, to_csr
+
 # logger used for debug tracing. Simulator configures this logger to write to
 # a file when args.debug_dijkstra is enabled so debug output doesn't get
 # overwritten by simulator's dynamic progress prints.
 _dij_logger = logging.getLogger('rwa_dijkstra_debug')
 
 
-def dijkstra(mat: np.ndarray, s: int, d: int, debug: bool = False) -> List[int]:
+def dijkstra(mat: np.ndarray, s: int, d: int, debug: bool = False,
+             graph: Optional[nx.Graph] = None, backend: str = 'networkx',
+             csr=None) -> List[int]:
     """Dijkstra routing algorithm
 
     Args:
@@ -23,6 +27,14 @@ def dijkstra(mat: np.ndarray, s: int, d: int, debug: bool = False) -> List[int]:
         s: source node index
         d: destination node index
         debug: when True, print step-by-step internal state for tracing
+        graph: optional networkx graph already built from `mat` (e.g.
+            `Network.graph`). When given, the graph is not rebuilt from the
+            adjacency matrix, which saves most of the per-call cost.
+        backend: 'networkx' (reference) or 'csgraph', which searches a CSR
+            copy of the adjacency with scipy's array-based Dijkstra. Debug
+            tracing always runs over the networkx graph.
+        csr: optional CSR matrix already built from `mat` (e.g.
+            `Network.csr`), used by the 'csgraph' backend
 
     Returns:
         :obj:`list` of :obj:`int`: sequence of router indices encoding a path
@@ -34,16 +46,24 @@ def dijkstra(mat: np.ndarray, s: int, d: int, debug: bool = False) -> List[int]:
         raise ValueError('Source nor destination nodes should exceed '
                          'adjacency matrix dimensions')
 
+    if backend == 'csgraph' and not debug:
+        return csgraph_dijkstra(csr if csr is not None else to_csr(mat), s, d)
+    elif backend not in ('networkx', 'csgraph'):
+        raise ValueError('Unknown routing backend "%s"' % backend)
+
+    if graph is None:
+        G = nx.from_numpy_array(mat, create_using=nx.Graph())
+    else:
+        G = graph
+
     # Fast path: delegate to networkx when no debug tracing requested
     if not debug:
-        G = nx.from_numpy_array(mat, create_using=nx.Graph())
         hops, path = nx.bidirectional_dijkstra(G, s, d, weight='weight')
         return path
     else:
-        # Debug path: build the same NetworkX graph as the fast path and
+        # Debug path: use the same NetworkX graph as the fast path and
         # implement Dijkstra over that graph so debug uses identical input
         # semantics (edge presence and 'weight' attribute).
-        G = nx.from_numpy_array(mat, create_using=nx.Graph())
         n = G.number_of_nodes()
         inf = math.inf
         dist = [inf] * n
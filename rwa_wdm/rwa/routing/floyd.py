@@ -0,0 +1,53 @@
+"""All-pairs shortest paths by vectorized Floyd-Warshall
+
+Building an auxiliary graph needs the shortest path between every pair of
+nodes. Running one Dijkstra search per pair repeats most of the work N^2
+times; Floyd-Warshall gets every distance and path at once, with one NumPy
+relaxation of the whole distance matrix per intermediate node.
+
+The predecessor matrix has the same layout as scipy's: `pred[s, v]` is the
+node before `v` on the s -> v path, or `NO_PREDECESSOR`, so rows can be
+passed to `csgraph.path_from_predecessors()`.
+
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+from .csgraph import NO_PREDECESSOR, path_from_predecessors
+
+
+def floyd_warshall(mat: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Distances and predecessors between all pairs of nodes
+
+    Args:
+        mat: Network's adjacency matrix graph. Zero (and negative) entries
+            are missing edges, as for the Dijkstra backends.
+
+    Returns:
+        tuple: (dist, pred) N x N arrays. `dist` is inf between nodes that
+            are not connected.
+
+    """
+    mat = np.asarray(mat, dtype=np.float64)
+    n = mat.shape[0]
+    edge = mat > 0
+    dist = np.where(edge, mat, np.inf)
+    np.fill_diagonal(dist, 0.0)
+    pred = np.where(edge, np.arange(n)[:, None], NO_PREDECESSOR)
+    np.fill_diagonal(pred, NO_PREDECESSOR)
+    for k in range(n):
+        # strict improvement only, so the first shortest path found is kept
+        alt = dist[:, k, None] + dist[k]
+        better = alt < dist
+        if better.any():
+            dist = np.where(better, alt, dist)
+            pred = np.where(better, pred[k], pred)
+    return dist, pred
+
+
+def all_pairs_path(pred: np.ndarray, s: int, d: int) -> List[int]:
+    """The s -> d path of an all-pairs predecessor matrix, or an empty list
+    if `d` is unreachable from `s`"""
+    return path_from_predecessors(pred[s], s, d)
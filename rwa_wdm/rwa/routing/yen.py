@@ -2,13 +2,18 @@
 
 """
 
-from typing import List
+from itertools import islice
+from typing import List, Optional
 
 import numpy as np
 import networkx as nx
 
+from .csgraph import csgraph_yen, to_csr
 
-def yen(mat: np.ndarray, s: int, d: int, k: int) -> List[List[int]]:
+
+def yen(mat: np.ndarray, s: int, d: int, k: int,
+        graph: Optional[nx.Graph] = None, backend: str = 'networkx',
+        csr=None) -> List[List[int]]:
     """Yen's routing algorithm, a.k.a. K-shortest paths
 
     Args:
@@ -16,6 +21,11 @@ def yen(mat: np.ndarray, s: int, d: int, k: int) -> List[List[int]]:
         s: source node index
         d: destination node index
         k: number of alternate paths
+        graph: optional prebuilt networkx graph for `mat` (e.g.
+            `Network.graph`), avoids rebuilding it on every call
+        backend: 'networkx' (reference) or 'csgraph'
+        csr: optional CSR matrix already built from `mat`, used by the
+            'csgraph' backend
 
     Returns:
         :obj:`list` of :obj:`list`: a sequence of `k` paths
@@ -29,6 +39,16 @@ def yen(mat: np.ndarray, s: int, d: int, k: int) -> List[List[int]]:
     if k < 0:
         raise ValueError('Number of alternate paths should be positive')
 
-    G = nx.from_numpy_array(mat, create_using=nx.Graph())
-    paths = list(nx.shortest_simple_paths(G, s, d, weight=None))
-    return paths[:k]
+    if backend == 'csgraph':
+        return csgraph_yen(csr if csr is not None else to_csr(mat), s, d, k)
+    elif backend != 'networkx':
+        raise ValueError('Unknown routing backend "%s"' % backend)
+
+    G = graph if graph is not None else \
+        nx.from_numpy_array(mat, create_using=nx.Graph())
+    # shortest_simple_paths is a generator: stop after k paths instead of
+    # enumerating every simple path between s and d
+    try:
+        return list(islice(nx.shortest_simple_paths(G, s, d, weight=None), k))
+    except nx.NetworkXNoPath:
+        return []
@@ -1,8 +1,9 @@
-from typing import Callable, Union
+from typing import Callable, List, Optional, Tuple, Union
 
-from ..net import Lightpath, Network
-from .routing import dijkstra, yen
-from .wlassignment import vertex_coloring, first_fit, random_fit
+from ..net import ExpandedRoute, Lightpath, Network
+from .routing import dijkstra
+from .wlassignment import (vertex_coloring, first_fit, qkp_links, random_fit,
+                           most_used, least_used)
 from .ga import GeneticAlgorithm
 
 __all__ = (
@@ -10,6 +11,10 @@ __all__ = (
     'dijkstra_first_fit',
     'yen_vertex_coloring',
     'yen_first_fit',
+    'dijkstra_most_used',
+    'dijkstra_least_used',
+    'yen_most_used',
+    'yen_least_used',
     'genetic_algorithm',
 )
 
@@ -19,99 +24,112 @@ __all__ = (
 ga: Union[GeneticAlgorithm, None] = None
 
 
-def dijkstra_vertex_coloring(net: Network, k: int, debug: bool = False) -> Union[Lightpath, None]:
+def _dijkstra_per_call(net: Network, s: int, d: int, debug: bool,
+                       backend: str) -> List[int]:
+    """Run Dijkstra for a single request over the network's cached graph"""
+    if backend == 'csgraph' and not debug:
+        return dijkstra(net.a, s, d, backend=backend, csr=net.csr)
+    return dijkstra(net.a, s, d, debug=debug, graph=net.graph)
+
+
+def _dijkstra_route(net: Network, s: int, d: int, debug: bool,
+                    aux_graph_mode: bool, backend: str
+                    ) -> Tuple[List[int], Optional[ExpandedRoute]]:
+    """Shortest route for a request, with auxiliary hops optionally expanded
+
+    Returns:
+        tuple: the route and, in auxiliary graph mode, its memoized
+            `ExpandedRoute` (None otherwise)
+
+    """
+    if net.route_table_mode and not debug:
+        if aux_graph_mode:
+            expanded = net.get_expanded_route(s, d, backend)
+            return expanded.route, expanded
+        return net.get_route(s, d, backend), None
+    route = _dijkstra_per_call(net, s, d, debug, backend)
+    if aux_graph_mode:
+        expanded = net.expand_route(route)
+        return expanded.route, expanded
+    return route, None
+
+
+def _route_lightpath(route: List[int], wavelength: int,
+                     expanded: Optional[ExpandedRoute]) -> Lightpath:
+    """Lightpath along `route`, carrying its auxiliary-hop expansion (and
+    precomputed links) when there is one"""
+    if expanded is None:
+        return Lightpath(route, wavelength)
+    lp = Lightpath(route, wavelength, expanded.links)
+    lp.contains_virtual = expanded.contains_virtual
+    lp.mapped_virtual_route = expanded.mapped_virtual_route
+    return lp
+
+
+def dijkstra_vertex_coloring(net: Network, s: int, d: int, k: int,
+                             debug: bool = False, aux_graph_mode: bool = False,
+                             enable_new_ff: bool = False,
+                             backend: str = 'networkx') -> Union[Lightpath, None]:
     """Dijkstra and vertex coloring combination as RWA algorithm
 
+    Takes the same arguments as `dijkstra_first_fit()`, so the simulators can
+    call either one.
+
     Args:
         net: Network topology instance
+        s: source node index
+        d: destination node index
         k: number of alternate paths (ignored)
+        aux_graph_mode: expand auxiliary hops into their physical subpaths
+        enable_new_ff: first-fit only (ignored)
+        backend: routing backend, 'networkx' (reference) or 'csgraph'
 
     Returns:
         Lightpath: if successful, returns both route and wavelength index as a
             lightpath
 
     """
-    route = dijkstra(net.a, net.s, net.d, debug=debug)
+    route, expanded = \
+        _dijkstra_route(net, s, d, debug, aux_graph_mode, backend)
+    if not route or len(route) < 2:
+        return None
     wavelength = vertex_coloring(net, Lightpath(route, None))
     if wavelength is not None and wavelength < net.nchannels:
-        return Lightpath(route, wavelength)
+        return _route_lightpath(route, wavelength, expanded)
     return None
 
 #temporarily just modified this, because only this is used
 def dijkstra_first_fit(net: Network, s: int, d: int, k: int, debug: bool = False,
-                       aux_graph_mode: bool = False, enable_new_ff: bool = False, 
-                       ) -> Union[Lightpath, None]:
+                       aux_graph_mode: bool = False, enable_new_ff: bool = False,
+                       backend: str = 'networkx',
+                       vectorized_ff: bool = False) -> Union[Lightpath, None]:
     """Dijkstra and first-fit combination as RWA algorithm
 
     Args:
         net: Network topology instance
         k: number of alternate paths (ignored)
+        backend: routing backend, 'networkx' (reference) or 'csgraph'
+        vectorized_ff: run the NumPy implementation of first-fit
 
     Returns:
         Lightpath: if successful, returns both route and wavelength index as a
-            lightpath
+            lightpath. QKP keys it needs are held until it is allocated, see
+            `Network.reserve_lightpath_qkp()`
 
     """
-    route = dijkstra(net.a, s, d, debug=debug)
-    # expand any auxiliary hops in the returned route to their stored
-    # physical paths before wavelength assignment
-    def _expand_aux_route(route):
-        """Expand auxiliary/virtual hops into their physical subpaths.
-
-        Always returns a 3-tuple: (route_nodes, contains_virtual_path, mapped_virtual_route)
-        where `mapped_virtual_route` is a list of physical subpaths (each a list
-        of nodes) corresponding to virtual hops found in the route.
-        """
-        contains_virtual_path = False
-        # normalized return even for trivial routes
-        if not route or len(route) < 2:
-            return route, contains_virtual_path, []
-
-        try:
-            mapping = net.virtual_adjacency2physical_path()
-        except Exception:
-            mapping = {}
-
-        expanded = []
-        mapped_virtual_route = []
-        for i in range(len(route) - 1):
-            u, v = route[i], route[i + 1]
-            key = (u, v)
-            if key in mapping:
-                contains_virtual_path = True
-                phys = mapping[key]
-                mapped_virtual_route.append(phys)
-                # append the physical path, but avoid duplicating the
-                # intermediate node when joining segments
-                if expanded and expanded[-1] == phys[0]:
-                    expanded.extend(phys[1:])
-                else:
-                    expanded.extend(phys)
-            else:
-                # no mapping: append the single hop (u) and let next
-                # iteration append v (or append both here for final)
-                if not expanded:
-                    expanded.append(u)
-                expanded.append(v)
-
-        # ensure route is a proper node sequence; if expansion failed,
-        # fall back to original route
-        if len(expanded) == 0:
-            return route, contains_virtual_path, mapped_virtual_route
-           
-        return expanded, contains_virtual_path, mapped_virtual_route
-    
-    # default values when not using auxiliary graph expansion
-    contains_virtual_path = False
-    mapped_virtual_route = []
-    if aux_graph_mode:
-        route, contains_virtual_path, mapped_virtual_route = _expand_aux_route(route)
+    # routes come from the route table when the adjacency is static; in
+    # auxiliary graph mode their virtual hops are expanded into physical
+    # subpaths, memoized per route by the network
+    route, expanded = \
+        _dijkstra_route(net, s, d, debug, aux_graph_mode, backend)
+    contains_virtual_path = expanded is not None and expanded.contains_virtual
 
     # call first_fit. It returns Optional[List[int]] where the list may
     # contain a single wavelength applied across the whole route or a
     # per-link wavelength assignment. The caller controls the new behavior
     # via enable_new_ff.
-    w_list = first_fit(net, route, contains_virtual_path, enable_new_ff=enable_new_ff)
+    w_list = first_fit(net, route, contains_virtual_path, enable_new_ff=enable_new_ff,
+                       vectorized=vectorized_ff)
 
     # Accept w_list even if some links were satisfied via QKP (negative sentinel values)
     # A valid per-link assignment is one where every entry is either a real wavelength
@@ -119,59 +137,61 @@ def dijkstra_first_fit(net: Network, s: int, d: int, k: int, debug: bool = False
     if w_list is not None and len(w_list) > 0 and all(((w >= 0 and w < net.nchannels) or (isinstance(w, int) and w < 0)) for w in w_list):
         # Choose a non-negative wavelength as the Lightpath base value if any; else fallback to 0
         base_w = next((w for w in w_list if isinstance(w, int) and w >= 0), 0)
-        lp = Lightpath(route, base_w)
+        lp = _route_lightpath(route, base_w, expanded)
         try:
             lp.w_list = list(w_list)
         except Exception:
             pass
-        try:
-            lp.contains_virtual = contains_virtual_path
-            lp.mapped_virtual_route = mapped_virtual_route
-        except Exception:
-            # backwards compatibility: ignore if properties not supported
-            pass
-        # NOTE: QKP recording must be performed only when the simulator
-        # actually allocates the lightpath (and knows the allocated holding
-        # time). The simulator sets `lightpath.holding_time` and calls
-        # `net.t.add_lightpath(lp)` later; therefore QKP bookkeeping is
-        # deferred to the simulator code so the deposited key amount matches
-        # the actual allocated time.
+        # links covered by QKP keys only get them held here: the keys are
+        # consumed (and logged) when the simulator actually allocates the
+        # lightpath via `net.add_lightpath(lp)` or `net.commit_qkp()`, and
+        # handed back if it drops the lightpath instead
+        links = qkp_links(route, w_list)
+        if links and not net.reserve_lightpath_qkp(lp, links, 10):
+            return None
         return lp
     return None
 
 
-def dijkstra_random_fit(net: Network, k: int, debug: bool = False) -> Union[Lightpath, None]:
+def dijkstra_random_fit(net: Network, k: int, debug: bool = False,
+                        backend: str = 'networkx') -> Union[Lightpath, None]:
     """Dijkstra and random-fit combination as RWA algorithm
 
     Args:
         net: Network topology instance
         k: number of alternate paths (ignored)
+        backend: routing backend, 'networkx' (reference) or 'csgraph'
 
     Returns:
         Lightpath: if successful, returns both route and wavelength index as a
             lightpath
 
     """
-    route = dijkstra(net.a, net.s, net.d, debug=debug)
+    if net.route_table_mode and not debug:
+        route = net.get_route(net.s, net.d, backend)
+    else:
+        route = _dijkstra_per_call(net, net.s, net.d, debug, backend)
     wavelength = random_fit(net, route)
     if wavelength is not None and wavelength < net.nchannels:
         return Lightpath(route, wavelength)
     return None
 
 
-def yen_vertex_coloring(net: Network, k: int) -> Union[Lightpath, None]:
+def yen_vertex_coloring(net: Network, k: int,
+                        backend: str = 'networkx') -> Union[Lightpath, None]:
     """Yen and vertex coloring combination as RWA algorithm
 
     Args:
         net: Network topology instance
         k: number of alternate paths (ignored)
+        backend: routing backend, 'networkx' (reference) or 'csgraph'
 
     Returns:
         Lightpath: if successful, returns both route and wavelength index as a
             lightpath
 
     """
-    routes = yen(net.a, net.s, net.d, k)
+    routes = net.get_k_paths(net.s, net.d, k, backend)
     for route in routes:
         wavelength = vertex_coloring(net, Lightpath(route, None))
         if wavelength is not None and wavelength < net.nchannels:
@@ -179,21 +199,26 @@ def yen_vertex_coloring(net: Network, k: int) -> Union[Lightpath, None]:
     return None
 
 
-def yen_first_fit(net: Network, k: int, enable_new_ff: bool = False) -> Union[Lightpath, None]:
+def yen_first_fit(net: Network, k: int, enable_new_ff: bool = False,
+                  backend: str = 'networkx',
+                  vectorized_ff: bool = False) -> Union[Lightpath, None]:
     """Yen and first-fit combination as RWA algorithm
 
     Args:
         net: Network topology instance
         k: number of alternate paths (ignored)
+        backend: routing backend, 'networkx' (reference) or 'csgraph'
+        vectorized_ff: run the NumPy implementation of first-fit
 
     Returns:
         Lightpath: if successful, returns both route and wavelength index as a
             lightpath
 
     """
-    routes = yen(net.a, net.s, net.d, k)
+    routes = net.get_k_paths(net.s, net.d, k, backend)
     for route in routes:
-        w_list = first_fit(net, route, enable_new_ff=enable_new_ff)
+        w_list = first_fit(net, route, enable_new_ff=enable_new_ff,
+                           vectorized=vectorized_ff)
         if w_list is not None and len(w_list) > 0 and all(((w >= 0 and w < net.nchannels) or (isinstance(w, int) and w < 0)) for w in w_list):
             base_w = next((w for w in w_list if isinstance(w, int) and w >= 0), 0)
             lp = Lightpath(route, base_w)
@@ -201,23 +226,28 @@ def yen_first_fit(net: Network, k: int, enable_new_ff: bool = False) -> Union[Li
                 lp.w_list = list(w_list)
             except Exception:
                 pass
+            links = qkp_links(route, w_list)
+            if links and not net.reserve_lightpath_qkp(lp, links, 10):
+                continue
             return lp
     return None
 
 
-def yen_random_fit(net: Network, k: int) -> Union[Lightpath, None]:
+def yen_random_fit(net: Network, k: int,
+                   backend: str = 'networkx') -> Union[Lightpath, None]:
     """Yen and random-fit combination as RWA algorithm
 
     Args:
         net: Network topology instance
         k: number of alternate paths (ignored)
+        backend: routing backend, 'networkx' (reference) or 'csgraph'
 
     Returns:
         Lightpath: if successful, returns both route and wavelength index as a
             lightpath
 
     """
-    routes = yen(net.a, net.s, net.d, k)
+    routes = net.get_k_paths(net.s, net.d, k, backend)
     for route in routes:
         wavelength = random_fit(net, route)
         if wavelength is not None and wavelength < net.nchannels:
@@ -225,6 +255,116 @@ def yen_random_fit(net: Network, k: int) -> Union[Lightpath, None]:
     return None
 
 
+def _dijkstra_usage_fit(net: Network, s: int, d: int, debug: bool,
+                        aux_graph_mode: bool, backend: str,
+                        assign: Callable) -> Union[Lightpath, None]:
+    """Dijkstra combined with a usage-driven wavelength assignment"""
+    route, expanded = \
+        _dijkstra_route(net, s, d, debug, aux_graph_mode, backend)
+    if not route or len(route) < 2:
+        return None
+    wavelength = assign(net, route)
+    if wavelength is not None and wavelength < net.nchannels:
+        return _route_lightpath(route, wavelength, expanded)
+    return None
+
+
+def dijkstra_most_used(net: Network, s: int, d: int, k: int,
+                       debug: bool = False, aux_graph_mode: bool = False,
+                       enable_new_ff: bool = False,
+                       backend: str = 'networkx') -> Union[Lightpath, None]:
+    """Dijkstra and most-used combination as RWA algorithm
+
+    Takes the same arguments as `dijkstra_first_fit()`, so the simulators can
+    call either one.
+
+    Args:
+        net: Network topology instance
+        s: source node index
+        d: destination node index
+        k: number of alternate paths (ignored)
+        aux_graph_mode: expand auxiliary hops into their physical subpaths
+        enable_new_ff: first-fit only (ignored)
+        backend: routing backend, 'networkx' (reference) or 'csgraph'
+
+    Returns:
+        Lightpath: if successful, returns both route and wavelength index as a
+            lightpath
+
+    """
+    return _dijkstra_usage_fit(net, s, d, debug, aux_graph_mode, backend,
+                               most_used)
+
+
+def dijkstra_least_used(net: Network, s: int, d: int, k: int,
+                        debug: bool = False, aux_graph_mode: bool = False,
+                        enable_new_ff: bool = False,
+                        backend: str = 'networkx') -> Union[Lightpath, None]:
+    """Dijkstra and least-used combination as RWA algorithm
+
+    Takes the same arguments as `dijkstra_first_fit()`, so the simulators can
+    call either one.
+
+    Args:
+        net: Network topology instance
+        s: source node index
+        d: destination node index
+        k: number of alternate paths (ignored)
+        aux_graph_mode: expand auxiliary hops into their physical subpaths
+        enable_new_ff: first-fit only (ignored)
+        backend: routing backend, 'networkx' (reference) or 'csgraph'
+
+    Returns:
+        Lightpath: if successful, returns both route and wavelength index as a
+            lightpath
+
+    """
+    return _dijkstra_usage_fit(net, s, d, debug, aux_graph_mode, backend,
+                               least_used)
+
+
+def yen_most_used(net: Network, k: int,
+                  backend: str = 'networkx') -> Union[Lightpath, None]:
+    """Yen and most-used combination as RWA algorithm
+
+    Args:
+        net: Network topology instance
+        k: number of alternate paths
+        backend: routing backend, 'networkx' (reference) or 'csgraph'
+
+    Returns:
+        Lightpath: if successful, returns both route and wavelength index as a
+            lightpath
+
+    """
+    for route in net.get_k_paths(net.s, net.d, k, backend):
+        wavelength = most_used(net, route)
+        if wavelength is not None and wavelength < net.nchannels:
+            return Lightpath(route, wavelength)
+    return None
+
+
+def yen_least_used(net: Network, k: int,
+                   backend: str = 'networkx') -> Union[Lightpath, None]:
+    """Yen and least-used combination as RWA algorithm
+
+    Args:
+        net: Network topology instance
+        k: number of alternate paths
+        backend: routing backend, 'networkx' (reference) or 'csgraph'
+
+    Returns:
+        Lightpath: if successful, returns both route and wavelength index as a
+            lightpath
+
+    """
+    for route in net.get_k_paths(net.s, net.d, k, backend):
+        wavelength = least_used(net, route)
+        if wavelength is not None and wavelength < net.nchannels:
+            return Lightpath(route, wavelength)
+    return None
+
+
 def genetic_algorithm_callback(net: Network, k: int) -> Union[Lightpath, None]:
     """Callback function to perform RWA via genetic algorithm
 
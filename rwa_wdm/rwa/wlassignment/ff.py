@@ -3,19 +3,26 @@
 """
 from typing import List, Optional
 
+import numpy as np
+
 # FIXME https://mypy.readthedocs.io/en/latest/common_issues.html#import-cycles
 from ...net import Network
 
 
-def first_fit(net: Network, route: List[int], contains_virtual: bool = False, enable_new_ff: bool = False) -> Optional[List[int]]:
+def first_fit(net: Network, route: List[int], contains_virtual: bool = False, enable_new_ff: bool = False,
+              vectorized: bool = False) -> Optional[List[int]]:
     """First-fit algorithm
 
     Select the wavelength with the lowest index available at the first link of
-    the path, starting of course from the source node.
+    the path, starting of course from the source node. Availability is read
+    from the network's packed per-link free-channel bitmasks.
 
     Args:
         net: Network object
         route: path encoded as a sequence of router indices
+        enable_new_ff: pick the first free wavelength independently on each
+            link instead of a single wavelength for the whole route
+        vectorized: use the NumPy implementation, `first_fit_vectorized()`
 
     Returns:
         :obj:`list[int]` or ``None``: upon wavelength assignment success, return
@@ -25,79 +32,112 @@ def first_fit(net: Network, route: List[int], contains_virtual: bool = False, en
             wavelength is used across the whole route. Returns ``None`` on
             failure.
 
+    A link that no usable wavelength reaches can instead be covered by 10 keys
+    of its QKP pool, marked by a -10 entry. The keys are only checked here:
+    the caller holds them with `Network.reserve_lightpath_qkp()` on
+    `qkp_links()` and they are consumed when the lightpath is committed.
+
     """
+    if vectorized:
+        return first_fit_vectorized(net, route, enable_new_ff=enable_new_ff)
+
     w_list = []
     # Sanity: route must contain at least one hop
     if not route or len(route) < 2:
         return None
     
+    # free-channel bitmask of every link along the route
+    links = [(route[idx], route[idx + 1]) for idx in range(len(route) - 1)]
+    masks = [net.free_mask(i, j) for (i, j) in links]
+
     if not enable_new_ff:
-        # try a single wavelength across the whole route (first-fit)
-        for w in range(net.nchannels):
-            ok = True
-            w_list_candidate = []
-            consumed_keys: list[tuple[int, int]] = []
-            # iterate pairwise over route to get links
-            for idx in range(len(route) - 1):
-                i, j = route[idx], route[idx + 1]
-                if net.n[i][j][w]:
-                    # wavelength available on this link
-                    w_list_candidate.append(w)
-                else:
-                    # wavelength not available: try consuming 10 QKP keys for this link
-                    # (each request occupies 10 time-slots in the data layer)
-                    try:
-                        used = net.use_qkp((i, j), 10)
-                    except Exception:
-                        used = False
-                    if used:
-                        # mark this link as satisfied by QKP (use sentinel -10)
-                        w_list_candidate.append(-10)
-                        consumed_keys.append((i, j))
-                    else:
-                        # cannot satisfy this link with this wavelength
-                        ok = False
-                        break
-            if ok:
-                return w_list_candidate
-            else:
-                # rollback any consumed QKP keys for this candidate wavelength
-                if consumed_keys:
-                    for (ii, jj) in consumed_keys:
-                        try:
-                            net.add_qkp((ii, jj), 10)
-                        except Exception:
-                            # best-effort rollback; ignore failures
-                            pass
+        # a wavelength can only succeed if, on every link, it is either free
+        # or the link has at least 10 QKP keys to fall back on. AND-ing those
+        # per-link masks skips wavelengths that are bound to fail.
+        qkp_ok = (net.free_qkp_batch(links) >= 10).tolist()
+        candidates = net.all_channels_mask
+        for mask, covered in zip(masks, qkp_ok):
+            candidates &= net.all_channels_mask if covered else mask
+            if not candidates:
+                return None
+
+        # try a single wavelength across the whole route (first-fit). Links
+        # where it is busy each need 10 QKP keys (each request occupies 10
+        # time-slots in the data layer); such links get the -10 sentinel
+        while candidates:
+            w = net.lowest_channel(candidates)
+            candidates ^= 1 << w
+            failing = [link for link, mask in zip(links, masks)
+                       if not (mask >> w) & 1]
+            if failing and not net.qkp_available(failing, 10):
+                continue
+            return [w if (mask >> w) & 1 else -10 for mask in masks]
         return None
-    
+
     else:
-        consumed_keys: list[tuple[int, int]] = []
-        for idx in range(len(route) - 1):
-            i, j = route[idx], route[idx + 1]
-            ok = False
-            for w in range(net.nchannels):
-                if net.n[i][j][w]:
-                    ok = True
-                    w_list.append(w)
-                    break
-            if not ok:
-                # try to consume 10 QKP keys for this link
-                try:
-                    used = net.use_qkp((i, j), 10)
-                except Exception:
-                    used = False
-                if used:
-                    w_list.append(-10)
-                    consumed_keys.append((i, j))
-                    ok = True
-                else:
-                    # rollback any previously consumed keys on failure
-                    if consumed_keys:
-                        for (ii, jj) in consumed_keys:
-                            try:
-                                net.add_qkp((ii, jj), 10)
-                            except Exception:
-                                pass
-                    return None
-        return w_list
\ No newline at end of file
+        failing = []
+        for (i, j), mask in zip(links, masks):
+            w = net.lowest_channel(mask)
+            if w >= 0:
+                w_list.append(w)
+            else:
+                w_list.append(-10)
+                failing.append((i, j))
+        # links without a free wavelength need 10 QKP keys each
+        if failing and not net.qkp_available(failing, 10):
+            return None
+        return w_list
+
+
+def qkp_links(route: List[int], w_list: List[int]) -> List[tuple]:
+    """Links of `route` covered by QKP keys (-10 entries) in a first-fit
+    assignment, i.e. the links to reserve keys on"""
+    return [(route[idx], route[idx + 1]) for idx, w in enumerate(w_list)
+            if w < 0]
+
+
+def first_fit_vectorized(net: Network, route: List[int],
+                         enable_new_ff: bool = False) -> Optional[List[int]]:
+    """First-fit algorithm over the route's link index arrays
+
+    NumPy counterpart of `first_fit()` with identical results, including the
+    -10 QKP sentinel. The availability of every link along the route is
+    gathered in one shot as a (hops x channels) block of the network's
+    per-edge availability array; the first fully free column (or the first
+    free channel of each row, in per-link mode) is then found with array
+    reductions, and the QKP fallback is only tried on the links that fail.
+
+    Args:
+        net: Network object
+        route: path encoded as a sequence of router indices
+        enable_new_ff: pick the first free wavelength independently on each
+            link instead of a single wavelength for the whole route
+
+    Returns:
+        :obj:`list[int]` or ``None``: same as `first_fit()`
+
+    """
+    if not route or len(route) < 2:
+        return None
+
+    avail = net.availability[net.route_edge_ids(route)]
+    links = list(zip(route[:-1], route[1:]))
+
+    if enable_new_ff:
+        free_any = avail.any(axis=1)
+        w_list = np.where(free_any, avail.argmax(axis=1), -10).tolist()
+        failing = [links[h] for h in np.flatnonzero(~free_any)]
+        if failing and not net.qkp_available(failing, 10):
+            return None
+        return w_list
+
+    # a link without a free column can still be covered by its QKP pool
+    qkp_ok = net.free_qkp_batch(links) >= 10
+    candidates = np.flatnonzero((avail | qkp_ok[:, None]).all(axis=0))
+    for w in candidates.tolist():
+        column = avail[:, w]
+        failing = [links[h] for h in np.flatnonzero(~column)]
+        if failing and not net.qkp_available(failing, 10):
+            continue
+        return np.where(column, w, -10).tolist()
+    return None
@@ -0,0 +1,32 @@
+"""Least-used wavelength assignment strategy
+
+"""
+from typing import List, Union
+
+import numpy as np
+
+# FIXME https://mypy.readthedocs.io/en/latest/common_issues.html#import-cycles
+from ...net import Network
+
+
+def least_used(net: Network, route: List[int]) -> Union[int, None]:
+    """Least-used algorithm
+
+    Among the wavelengths free on every link of the route, select the one
+    busy on the smallest number of links in the network, spreading the load
+    evenly over the spectrum. Ties are broken towards the lowest index.
+
+    Args:
+        net: Network object
+        route: path encoded as a sequence of router indices
+
+    Returns:
+        :obj:`int`: upon wavelength assignment success, return the wavelength
+            index to be used on the lightpath
+
+    """
+    candidates = net.mask_channels(net.route_free_mask(route))
+    if not candidates:
+        return None
+    usage = net.channel_usage[candidates]
+    return candidates[int(np.argmin(usage))]
@@ -0,0 +1,33 @@
+"""Most-used wavelength assignment strategy
+
+"""
+from typing import List, Union
+
+import numpy as np
+
+# FIXME https://mypy.readthedocs.io/en/latest/common_issues.html#import-cycles
+from ...net import Network
+
+
+def most_used(net: Network, route: List[int]) -> Union[int, None]:
+    """Most-used algorithm
+
+    Among the wavelengths free on every link of the route, select the one
+    already busy on the largest number of links in the network. Ties are
+    broken towards the lowest index, as in first-fit. Usage is read from the
+    counters maintained by the network, so no availability matrix is scanned.
+
+    Args:
+        net: Network object
+        route: path encoded as a sequence of router indices
+
+    Returns:
+        :obj:`int`: upon wavelength assignment success, return the wavelength
+            index to be used on the lightpath
+
+    """
+    candidates = net.mask_channels(net.route_free_mask(route))
+    if not candidates:
+        return None
+    usage = net.channel_usage[candidates]
+    return candidates[int(np.argmax(usage))]
@@ -26,6 +26,6 @@ def random_fit(net: Network, route: List[int]) -> Union[int, None]:
     """
     i, j = route[0], route[1]
     try:
-        return np.random.choice(np.flatnonzero(net.n[i][j]))
+        return np.random.choice(net.mask_channels(net.free_mask(i, j)))
     except ValueError:
         return None
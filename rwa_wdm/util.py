@@ -1,8 +1,43 @@
 import logging
-from argparse import Namespace
+from argparse import ArgumentTypeError, Namespace
 
 logger = logging.getLogger(__name__)
 
+TOPOLOGIES = ('nsf', 'clara', 'janet', 'rnp', 'pdf')
+
+
+def topology_name(name: str) -> str:
+    """Validates a network topology identifier given via command line
+
+    Either one of `TOPOLOGIES`, or one of them followed by '@' and the
+    comma-separated, increasing distance thresholds of its auxiliary layers,
+    e.g. 'nsf@2,3'.
+
+    Args:
+        name: topology identifier
+
+    Returns:
+        str: `name` itself, as an argparse `type`
+
+    Raises:
+        ArgumentTypeError: if `name` is not a valid identifier
+
+    """
+    base, aux, thresholds = name.partition('@')
+    if base not in TOPOLOGIES:
+        raise ArgumentTypeError('unknown topology "%s", choose from %s' %
+                                (base, ', '.join(TOPOLOGIES)))
+    if aux:
+        try:
+            values = [float(t) for t in thresholds.split(',')]
+        except ValueError:
+            raise ArgumentTypeError('expected comma-separated numbers as '
+                                    'thresholds, got "%s"' % thresholds) \
+                from None
+        if any(b <= a for a, b in zip(values, values[1:])):
+            raise ArgumentTypeError('thresholds must be strictly increasing')
+    return name
+
 
 def validate_args(args: Namespace) -> None:
     """Validates arguments passed via command line through argparse module
@@ -0,0 +1,22 @@
+import random
+
+import numpy as np
+import pytest
+
+from rwa_wdm.net import NationalScienceFoundation
+
+
+@pytest.fixture(autouse=True)
+def seed():
+    """Networks draw their initial channel state from the global RNGs"""
+    np.random.seed(1)
+    random.seed(1)
+
+
+@pytest.fixture
+def net():
+    """NSFNET with 8 channels, all of them free"""
+    net = NationalScienceFoundation(8)
+    # channels that start busy are released as soon as the clock moves
+    net.advance_clock(1)
+    return net
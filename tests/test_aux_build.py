@@ -0,0 +1,131 @@
+import random
+
+import numpy as np
+import pytest
+
+from rwa_wdm.net import auxgraph_aux_d1, auxgraph_aux_d2
+from rwa_wdm.net.aux_helpers import aux_pairs
+from rwa_wdm.rwa.routing import dijkstra
+from rwa_wdm.rwa.routing.floyd import all_pairs_path
+
+
+def path_length(mat, path):
+    return float(sum(mat[u, v] for u, v in zip(path, path[1:])))
+
+
+def dijkstra_aux_paths(mat, threshold):
+    """Virtual edges as the auxiliary graphs used to build them: one
+    Dijkstra search per ordered pair of non-adjacent nodes"""
+    paths = {}
+    for s in range(mat.shape[0]):
+        for d in range(mat.shape[0]):
+            if d == s or mat[s, d] > 0:
+                continue
+            try:
+                path = list(dijkstra(mat, s, d))
+            except Exception:
+                continue  # unreachable
+            if path_length(mat, path) <= threshold:
+                paths[(s, d)] = path
+    return paths
+
+
+def physical(net):
+    mat = np.zeros((net.nnodes, net.nnodes))
+    for i, j, weight in net.get_edges():
+        mat[i, j] = mat[j, i] = weight
+    return mat
+
+
+def test_d1_matches_dijkstra_build():
+    net = auxgraph_aux_d1(4)
+    phys = physical(net)
+    expected = dijkstra_aux_paths(phys, net.AUX_THRESHOLD)
+    assert net.virtual_adjacency2physical_path() == expected
+    assert net.get_aux_edges() == [(s, d, path_length(phys, path))
+                                   for (s, d), path in expected.items()]
+
+
+def test_d2_matches_dijkstra_build():
+    net = auxgraph_aux_d2(4)
+    phys = physical(net)
+    expected = dijkstra_aux_paths(phys, net.AUX_THRESHOLD)
+    # the old build stored each pair in both directions, as first found
+    mapping = {}
+    for (s, d), path in expected.items():
+        mapping.setdefault((s, d), path)
+        mapping.setdefault((d, s), list(reversed(path)))
+    assert net.virtual_adjacency2physical_path() == mapping
+    assert sorted(net.get_aux_edges()) == \
+        sorted((s, d, path_length(phys, path))
+               for (s, d), path in mapping.items())
+
+    # d2 virtual edges over the d1 graph
+    a_d1 = phys.copy()
+    for (s, d), path in dijkstra_aux_paths(
+            phys, auxgraph_aux_d1.AUX_THRESHOLD).items():
+        a_d1[s, d] = path_length(phys, path)
+    mapping = {}
+    for (s, d), path in dijkstra_aux_paths(a_d1, net.AUX_THRESHOLD).items():
+        mapping.setdefault((s, d), path)
+        mapping.setdefault((d, s), list(reversed(path)))
+    assert net.virtual_adjacency2d1_path() == mapping
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_aux_pairs_random_graphs(seed):
+    rng = random.Random(seed)
+    n = rng.randint(4, 12)
+    mat = np.zeros((n, n))
+    for i in range(n):
+        for j in range(i + 1, n):
+            if rng.random() < 0.3:
+                mat[i, j] = mat[j, i] = rng.randint(1, 10)
+    threshold = rng.randint(5, 25)
+    pairs, dist, pred = aux_pairs(mat, threshold)
+    expected = dijkstra_aux_paths(mat, threshold)
+    # equal-length paths may be broken differently: compare the pairs,
+    # their distances, and check every path is a shortest one
+    assert pairs == sorted(expected)
+    for s, d in pairs:
+        path = all_pairs_path(pred, s, d)
+        assert path[0] == s and path[-1] == d
+        assert all(mat[u, v] > 0 for u, v in zip(path, path[1:]))
+        assert path_length(mat, path) == dist[s, d] == \
+            path_length(mat, expected[(s, d)])
+
+
+class WithoutHopTable(object):
+    """auxgraph_aux_d2 as seen by map_to_other_aux() before the virtual hop
+    table existed"""
+
+    def __init__(self, net):
+        self.nchannels = net.nchannels
+        self.virtual_adjacency2d1_path = net.virtual_adjacency2d1_path
+
+
+@pytest.mark.parametrize('threshold', [39.0, 60.0, 80.0])
+def test_hop_table_matches_fallback(threshold):
+    from rwa_wdm.net import Lightpath
+    from rwa_wdm.net.aux_helpers import map_to_other_aux
+
+    # larger thresholds give d2 virtual edges whose d1 paths use d1
+    # virtual edges, which the shipped topology has none of
+    cls = type('aux_d2', (auxgraph_aux_d2,), {'AUX_THRESHOLD': threshold})
+    net = cls(4)
+    fallback = WithoutHopTable(net)
+    subpaths = list(net.virtual_adjacency2physical_path().values())
+    # physical links are not d2 virtual hops
+    subpaths += [[i, j] for i, j, _ in net.get_edges()]
+    rng = random.Random(2)
+    hits = set()
+    for k in range(200):
+        lightpath = Lightpath([0, 1], 0)
+        lightpath.mapped_virtual_route = \
+            [subpaths[k]] if k < len(subpaths) else \
+            rng.sample(subpaths, rng.randint(1, 3))
+        expected = map_to_other_aux(fallback, lightpath)
+        assert map_to_other_aux(net, lightpath) == expected
+        hits.add(expected)
+    assert hits == ({False} if threshold == auxgraph_aux_d2.AUX_THRESHOLD
+                    else {True, False})
@@ -0,0 +1,77 @@
+from argparse import ArgumentTypeError
+
+import numpy as np
+import pytest
+
+from rwa_wdm.net import (AuxGraphNetwork, AuxHierarchy, auxgraph_aux_d1,
+                         auxgraph_aux_d2)
+from rwa_wdm.util import topology_name
+
+
+@pytest.fixture
+def d1():
+    return auxgraph_aux_d1(4)
+
+
+@pytest.fixture
+def d2():
+    return auxgraph_aux_d2(4)
+
+
+@pytest.fixture
+def hierarchy(d1):
+    phys = np.zeros((d1.nnodes, d1.nnodes))
+    for i, j, weight in d1.get_edges():
+        phys[i, j] = phys[j, i] = weight
+    return AuxHierarchy(phys, [auxgraph_aux_d1.AUX_THRESHOLD,
+                               auxgraph_aux_d2.AUX_THRESHOLD])
+
+
+def test_layers_match_hand_built_graphs(hierarchy, d1, d2):
+    assert hierarchy.nlevels == 3
+    assert sorted(hierarchy.virtual_edges(1)) == sorted(d1.get_aux_edges())
+    assert hierarchy.physical_paths(1) == \
+        d1.virtual_adjacency2physical_path()
+    np.testing.assert_array_equal(hierarchy.adjacency(1), np.asarray(d1.a))
+
+    assert sorted(hierarchy.virtual_edges(2)) == sorted(d2.get_aux_edges())
+    assert hierarchy.physical_paths(2) == \
+        d2.virtual_adjacency2physical_path()
+    assert hierarchy.lower_paths(2) == d2.virtual_adjacency2d1_path()
+    np.testing.assert_array_equal(hierarchy.lower_virtual_hops(2),
+                                  d2.virtual_adjacency2d1_virtual())
+    np.testing.assert_array_equal(hierarchy.adjacency(2), np.asarray(d2.a))
+
+
+def test_network_matches_aux_d2(d1, d2):
+    net = AuxGraphNetwork(d1, [auxgraph_aux_d1.AUX_THRESHOLD,
+                               auxgraph_aux_d2.AUX_THRESHOLD])
+    assert net.name == 'auxgraph_aux_d1@33,39'
+    assert net.get_aux_edges() == d2.get_aux_edges()
+    assert net.virtual_adjacency2physical_path() == \
+        d2.virtual_adjacency2physical_path()
+    assert net.virtual_adjacency2d1_path() == d2.virtual_adjacency2d1_path()
+    np.testing.assert_array_equal(net.virtual_adjacency2d1_virtual(),
+                                  d2.virtual_adjacency2d1_virtual())
+    np.testing.assert_array_equal(np.asarray(net.a), np.asarray(d2.a))
+
+
+def test_bad_thresholds(hierarchy):
+    with pytest.raises(ValueError):
+        AuxHierarchy(hierarchy.adjacency(0), [])
+    with pytest.raises(ValueError):
+        AuxHierarchy(hierarchy.adjacency(0), [39, 33])
+    with pytest.raises(ValueError):
+        hierarchy.adjacency(3)
+
+
+@pytest.mark.parametrize('name', ['nsf', 'rnp', 'nsf@2', 'janet@2,3.5'])
+def test_topology_name(name):
+    assert topology_name(name) == name
+
+
+@pytest.mark.parametrize('name', ['foo', 'foo@2', 'nsf@', 'nsf@2,x',
+                                  'nsf@3,2', 'nsf@2,2'])
+def test_bad_topology_name(name):
+    with pytest.raises(ArgumentTypeError):
+        topology_name(name)
@@ -0,0 +1,90 @@
+import os
+
+import numpy as np
+
+from rwa_wdm.net import AuxHierarchy, NationalScienceFoundation
+from rwa_wdm.net import auxgraph_aux_d2
+from rwa_wdm.net.cache import (cache_file, cache_key, load_arrays,
+                               pack_routes, save_arrays, unpack_routes)
+
+
+def test_cache_key():
+    a = np.arange(6.0).reshape(2, 3)
+    assert cache_key(a, k=1) == cache_key(a.copy(), k=1)
+    assert cache_key(a, k=1) != cache_key(a, k=2)
+    assert cache_key(a) != cache_key(a.astype(np.float32))
+    assert cache_key(a) != cache_key(a.reshape(3, 2))
+
+
+def test_arrays_round_trip(tmp_path):
+    path = cache_file(str(tmp_path / 'sub'), 'kind', 'key')
+    assert load_arrays(path) is None
+    arrays = {'a': np.arange(5), 'b': np.eye(3, dtype=np.bool_)}
+    save_arrays(path, **arrays)
+    loaded = load_arrays(path)
+    assert sorted(loaded) == ['a', 'b']
+    for name, arr in arrays.items():
+        assert loaded[name].dtype == arr.dtype
+        np.testing.assert_array_equal(loaded[name], arr)
+    # no temporary file left behind
+    assert os.listdir(os.path.dirname(path)) == [os.path.basename(path)]
+    # a truncated entry reads as missing
+    with open(path, 'r+b') as f:
+        f.truncate(10)
+    assert load_arrays(path) is None
+
+
+def test_routes_round_trip():
+    routes = {(0, 1): [0, 1], (1, 0): [1, 0], (2, 5): [2, 3, 4, 5],
+              (3, 3): [3], (4, 6): []}
+    assert unpack_routes(pack_routes(routes)) == routes
+    assert unpack_routes(pack_routes({})) == {}
+
+
+def test_route_table_cache(tmp_path):
+    reference = NationalScienceFoundation(4)
+    reference.build_route_table()
+    cached = NationalScienceFoundation(4)
+    cached.route_cache_dir = str(tmp_path)
+    cached.build_route_table()
+    assert len(os.listdir(str(tmp_path))) == 1
+    loaded = NationalScienceFoundation(4)
+    loaded.route_cache_dir = str(tmp_path)
+    loaded.build_route_table()
+    for s in range(reference.nnodes):
+        for d in range(reference.nnodes):
+            assert loaded.get_route(s, d) == reference.get_route(s, d)
+
+
+def test_aux_layers_cache(tmp_path):
+    reference = auxgraph_aux_d2(4)
+    for _ in range(2):
+        net = auxgraph_aux_d2(4, str(tmp_path))
+        assert net.get_aux_edges() == reference.get_aux_edges()
+        assert net.virtual_adjacency2physical_path() == \
+            reference.virtual_adjacency2physical_path()
+        assert net.virtual_adjacency2d1_path() == \
+            reference.virtual_adjacency2d1_path()
+        np.testing.assert_array_equal(net.virtual_adjacency2d1_virtual(),
+                                      reference.virtual_adjacency2d1_virtual())
+        np.testing.assert_array_equal(np.asarray(net.a),
+                                      np.asarray(reference.a))
+    # physical and d1 shortest paths
+    assert sorted(os.listdir(str(tmp_path)))[0].startswith('floyd-')
+    assert len(os.listdir(str(tmp_path))) == 2
+
+
+def test_hierarchy_cache(tmp_path):
+    phys = np.asarray(NationalScienceFoundation(4).a, dtype=np.float64)
+    reference = AuxHierarchy(phys, [2, 3])
+    for _ in range(2):
+        hierarchy = AuxHierarchy.cached(phys, [2, 3], str(tmp_path))
+        assert hierarchy.thresholds == reference.thresholds
+        for level in range(reference.nlevels):
+            np.testing.assert_array_equal(hierarchy.adjacency(level),
+                                          reference.adjacency(level))
+            assert hierarchy.virtual_edges(level) == \
+                reference.virtual_edges(level)
+            assert hierarchy.lower_paths(level) == \
+                reference.lower_paths(level)
+    assert len(os.listdir(str(tmp_path))) == 1
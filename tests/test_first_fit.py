@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+from rwa_wdm.rwa.wlassignment.ff import first_fit, first_fit_vectorized
+
+
+def shuffle_state(net, rng):
+    """Random channel occupancy and QKP levels, some keys held"""
+    for i, j in net.edges:
+        for w in range(net.nchannels):
+            if rng.random() < 0.7:
+                net.occupy_channel(i, j, w)
+            else:
+                net.release_channel(i, j, w)
+        net.add_qkp_batch([(i, j)], rng.randint(0, 15))
+    held = rng.sample(net.edges, 3)
+    return net.reserve_qkp(held, rng.randint(0, 5))
+
+
+def random_route(net, rng):
+    if rng.random() < 0.8:
+        s, d = rng.sample(range(net.nnodes), 2)
+        return net.get_route(s, d)
+    # may use node pairs that are not linked
+    return rng.sample(range(net.nnodes), rng.randint(2, 5))
+
+
+@pytest.mark.parametrize('enable_new_ff', [False, True])
+def test_matches_bitmask_first_fit(net, enable_new_ff):
+    rng = random.Random(5)
+    results = set()
+    for _ in range(100):
+        reservation = shuffle_state(net, rng)
+        for _ in range(20):
+            route = random_route(net, rng)
+            expected = first_fit(net, route, enable_new_ff=enable_new_ff)
+            assert first_fit_vectorized(
+                net, route, enable_new_ff=enable_new_ff) == expected
+            assert first_fit(net, route, enable_new_ff=enable_new_ff,
+                             vectorized=True) == expected
+            results.add('none' if expected is None else
+                        'qkp' if min(expected) < 0 else 'free')
+        net.abort_qkp(reservation)
+    # every outcome was exercised
+    assert results == {'none', 'qkp', 'free'}
+
+
+def test_short_routes(net):
+    for route in ([], [1]):
+        assert first_fit(net, route) is None
+        assert first_fit_vectorized(net, route) is None
@@ -0,0 +1,73 @@
+import random
+
+from rwa_wdm.net import Lightpath, LightpathTable
+
+
+def random_lightpath(rng, num_nodes=14):
+    route = rng.sample(range(num_nodes), rng.randint(2, 7))
+    lightpath = Lightpath(route, rng.randrange(8))
+    lightpath.expiry = rng.randrange(100) / 4.0
+    return lightpath
+
+
+def check(table, stored, gone, now):
+    assert len(table) == len(stored)
+    for _id, lightpath in stored.items():
+        assert _id in table
+        assert table.route(_id) == lightpath.r
+        assert table.wavelength(_id) == lightpath.w
+        assert table.expiry(_id) == lightpath.expiry
+    for _id in gone:
+        assert _id not in table
+    assert sorted(table.expired(now).tolist()) == \
+        sorted(_id for _id, lp in stored.items() if lp.expiry <= now)
+
+
+def test_table_matches_dict():
+    rng = random.Random(5)
+    # a small capacity, so rows and route nodes both outgrow it
+    table, stored, gone = LightpathTable(capacity=4), {}, []
+    grown = compacted = False
+    for step in range(3000):
+        # phases of growth and shrinkage, crossing the compaction threshold
+        add = rng.random() < (0.7 if (step // 500) % 2 == 0 else 0.3)
+        if add or not stored:
+            capacity = table._ids.shape[0]
+            lightpath = random_lightpath(rng)
+            table.add(lightpath)
+            stored[lightpath.id] = lightpath
+            grown |= table._ids.shape[0] > capacity
+        else:
+            _id = rng.choice(list(stored))
+            nrows = table._nrows
+            table.remove(_id)
+            gone.append(stored.pop(_id).id)
+            compacted |= table._nrows < nrows
+        if rng.random() < 0.01:
+            table.compact()
+            assert table._nrows == len(stored)
+        check(table, stored, gone[-20:], rng.randrange(100) / 4.0)
+    assert grown and compacted
+    # removing an unknown or already removed id is a no-op
+    table.remove(gone[0])
+    table.remove(-1)
+    check(table, stored, gone, 25.0)
+
+
+def test_compact_keeps_routes():
+    table = LightpathTable(capacity=2)
+    lightpaths = [Lightpath(list(range(k, k + 2 + k % 4)), k)
+                  for k in range(10)]
+    for lightpath in lightpaths:
+        table.add(lightpath)
+    for lightpath in lightpaths[::2]:
+        table.remove(lightpath.id)
+    table.compact()
+    assert table._nrows == 5
+    stored = {lp.id: lp for lp in lightpaths[1::2]}
+    check(table, stored, [lp.id for lp in lightpaths[::2]], 0.0)
+    # rows appended after a compaction follow the kept ones
+    extra = Lightpath([3, 1, 4, 1, 5], 2)
+    table.add(extra)
+    stored[extra.id] = extra
+    check(table, stored, [], 0.0)
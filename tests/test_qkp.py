@@ -0,0 +1,78 @@
+import gc
+
+from rwa_wdm.net import Lightpath
+from rwa_wdm.rwa.rwa import dijkstra_first_fit
+
+LINKS = [(1, 8), (8, 9)]
+
+
+def free_keys(net, links=LINKS):
+    return net.free_qkp_batch(links).tolist()
+
+
+def test_reserve_commit_accounting(net):
+    net.add_qkp_batch(LINKS, 10)
+    before = net.get_qkp_batch(LINKS).tolist()
+    reservation = net.reserve_qkp(LINKS + [(8, 9)], 3)
+    assert reservation.pending
+    # held keys stay in the pools but cannot be reserved again
+    assert net.get_qkp_batch(LINKS).tolist() == before
+    assert free_keys(net) == [before[0] - 3, before[1] - 6]
+    assert net.reserve_qkp([(8, 9)], before[1] - 5) is None
+    assert not net.use_qkp_batch([(8, 9)], before[1] - 5)
+    net.commit_qkp(reservation, {'call': 1})
+    assert reservation.state == 'committed'
+    assert net.get_qkp_batch(LINKS).tolist() == [before[0] - 3,
+                                                 before[1] - 6]
+    assert free_keys(net) == net.get_qkp_batch(LINKS).tolist()
+    assert [entry[:2] for entry in net.get_qkp_usage_log()[-3:]] == \
+        [((1, 8), 3), ((8, 9), 3), ((8, 9), 3)]
+    # committing or aborting twice changes nothing
+    net.commit_qkp(reservation)
+    net.abort_qkp(reservation)
+    assert free_keys(net) == net.get_qkp_batch(LINKS).tolist()
+
+
+def test_abort_hands_keys_back(net):
+    net.add_qkp_batch(LINKS, 10)
+    before = free_keys(net)
+    reservation = net.reserve_qkp(LINKS, 10)
+    assert free_keys(net) == [n - 10 for n in before]
+    net.abort_qkp(reservation)
+    assert reservation.state == 'aborted'
+    assert free_keys(net) == before
+    assert net.get_qkp_batch(LINKS).tolist() == before
+
+
+def test_dropped_lightpath_releases_keys(net):
+    net.add_qkp_batch(LINKS, 10)
+    before = free_keys(net)
+    lp = Lightpath([1, 8, 9], 0)
+    assert net.reserve_lightpath_qkp(lp, LINKS, 10)
+    reservation = lp.qkp_reservation
+    assert free_keys(net) == [n - 10 for n in before]
+    del lp
+    gc.collect()
+    assert reservation.state == 'aborted'
+    assert free_keys(net) == before
+
+
+def test_rwa_reservation(net):
+    # no wavelength left on (8, 9): first-fit falls back to its QKP pool
+    for w in range(net.nchannels):
+        net.occupy_channel(8, 9, w)
+    net.add_qkp_batch([(8, 9)], 10)
+    before = net.get_qkp((8, 9))
+    lp = dijkstra_first_fit(net, net.s, net.d, 1, enable_new_ff=True)
+    assert lp.r == [1, 8, 9] and lp.w_list == [0, -10]
+    assert lp.qkp_reservation.links == [(8, 9)]
+    assert free_keys(net, [(8, 9)]) == [before - 10]
+    # an RWA result that is not allocated holds nothing
+    del lp
+    gc.collect()
+    assert free_keys(net, [(8, 9)]) == [before]
+    # allocating it consumes the keys
+    lp = dijkstra_first_fit(net, net.s, net.d, 1, enable_new_ff=True)
+    net.add_lightpath(lp)
+    assert lp.qkp_reservation.state == 'committed'
+    assert net.get_qkp((8, 9)) == before - 10
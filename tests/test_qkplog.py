@@ -0,0 +1,73 @@
+import numpy as np
+
+from rwa_wdm.net.qkplog import (AggregateSink, BinarySink, MemorySink,
+                                load_qkp_records, qkp_edge_nodes,
+                                qkp_edge_totals)
+
+
+def _log(net, sinks, num_calls=50):
+    """Bypass records over random links, half of them with info"""
+    net.set_qkp_log_sinks(log=sinks[0])
+    edges = list(net.get_edges())
+    rng = np.random.RandomState(3)
+    for call in range(num_calls):
+        i, j = edges[rng.randint(len(edges))]
+        amount = int(rng.randint(1, 20))
+        info = {'call': call, 'time': call / 4.0} if call % 2 else None
+        for sink in sinks[1:]:
+            sink.append(((min(i, j), max(i, j)), amount) +
+                        (() if info is None else (info,)))
+        net.record_bypass_saved_keys((j, i), amount, info)
+
+
+def test_binary_round_trip(net, tmp_path):
+    path = str(tmp_path / 'qkp.bin')
+    n = net.nnodes
+    memory, aggregate = MemorySink(), AggregateSink()
+    # small chunks: several writes appended to the same file
+    _log(net, [BinarySink(path, n, chunk_size=7, sim=2), memory, aggregate])
+    net.close_qkp_logs()
+
+    records = load_qkp_records(path)
+    entries = memory.entries()
+    assert len(records) == len(entries)
+    i, j = qkp_edge_nodes(records['edge'], n)
+    assert list(zip(i.tolist(), j.tolist())) == [e[0] for e in entries]
+    assert records['amount'].tolist() == [e[1] for e in entries]
+    infos = [e[2] if len(e) > 2 else {} for e in entries]
+    assert records['call'].tolist() == [info.get('call', -1) for info in infos]
+    np.testing.assert_array_equal(
+        records['time'], [info.get('time', np.nan) for info in infos])
+    assert (records['sim'] == 2).all()
+
+    totals = qkp_edge_totals(records, n)
+    assert totals.sum() == sum(e[1] for e in entries)
+    expected = np.zeros_like(totals)
+    for (a, b), (_, amount) in aggregate.totals().items():
+        expected[net.qkp_ids([(a, b)])[0]] = amount
+    np.testing.assert_array_equal(totals, expected)
+
+
+def test_binary_append(net, tmp_path):
+    path = str(tmp_path / 'qkp.bin')
+    n = net.nnodes
+    for sim in range(2):
+        sink = BinarySink(path, n, chunk_size=4, sim=sim)
+        sink.extend([((0, 1), 3), ((2, 1), 5, {'sim': 9, 'call': sim})])
+        sink.close()
+    records = load_qkp_records(path)
+    assert records['sim'].tolist() == [0, 9, 1, 9]
+    assert records['call'].tolist() == [-1, 0, -1, 1]
+    assert records['amount'].tolist() == [3, 5, 3, 5]
+    i, j = qkp_edge_nodes(records['edge'], n)
+    assert list(zip(i.tolist(), j.tolist())) == [(0, 1), (1, 2)] * 2
+    assert np.isnan(records['time']).all()
+
+
+def test_binary_empty(tmp_path):
+    path = str(tmp_path / 'qkp.bin')
+    BinarySink(path, 14).close()
+    open(path, 'ab').close()
+    records = load_qkp_records(path)
+    assert len(records) == 0
+    assert qkp_edge_totals(records, 14).sum() == 0
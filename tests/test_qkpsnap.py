@@ -0,0 +1,81 @@
+import numpy as np
+
+from rwa_wdm.net import NationalScienceFoundation
+from rwa_wdm.net.qkpsnap import QkpSnapshots
+
+
+def accruing_net(links):
+    np.random.seed(1)
+    net = NationalScienceFoundation(8)
+    net.set_qkp_rate(links[0], 1.0)
+    net.set_qkp_rate(links[1], 0.7, cap=9)
+    net.set_qkp_rate(links[2], 0.25)
+    return net
+
+
+def test_backfill_levels_at_sampling_times(net):
+    edge = next(iter(net.get_edges()))
+    net.set_qkp_rate(edge, 1.0)
+    pid = net.qkp_ids([edge])[0]
+    start = net.get_qkp(edge)
+    snapshots = QkpSnapshots(net.nnodes, 1, start=net.clock)
+    assert snapshots.sample(net.clock, net.qkp_levels_at) == 1
+    net.advance_clock(5)
+    assert snapshots.sample(net.clock, net.qkp_levels_at) == 5
+    np.testing.assert_array_equal(snapshots.times - snapshots.times[0],
+                                  np.arange(6))
+    assert (snapshots.levels[:, pid] - start).tolist() == [0, 1, 2, 3, 4, 5]
+
+
+def test_snapshots_match_stepped_network():
+    links = [(0, 1), (2, 3), (4, 5)]
+    net, ref = accruing_net(links), accruing_net(links)
+    interval = 0.5
+    snapshots = QkpSnapshots(net.nnodes, interval, capacity=2)
+    # events several sampling intervals apart, touching the accruing pools
+    events = [(0.3, 'use', 0), (4.9, 'add', 1), (5.0, 'use', 1),
+              (12.7, 'use', 2), (13.1, 'add', 0), (30.0, 'use', 0)]
+
+    def apply(network, op, k):
+        if op == 'use':
+            network.use_qkp(links[k], min(3, network.get_qkp(links[k])))
+        else:
+            network.add_qkp(links[k], 2)
+
+    for time, op, k in events:
+        net.advance_clock(time - net.clock)
+        if snapshots.due(net.clock):
+            snapshots.sample(net.clock, net.qkp_levels_at)
+        apply(net, op, k)
+
+    # the reference settles its pools at every sampling time
+    expected, t = [], 0.0
+    for time, op, k in events:
+        while t <= time:
+            ref.advance_clock(t - ref.clock)
+            expected.append(ref.qkp_levels.copy())
+            t += interval
+        ref.advance_clock(time - ref.clock)
+        apply(ref, op, k)
+
+    np.testing.assert_allclose(snapshots.times,
+                               interval * np.arange(len(expected)))
+    np.testing.assert_array_equal(snapshots.levels, np.array(expected))
+    # the pools did change between events
+    ids = net.qkp_ids(links)
+    assert (np.diff(snapshots.levels[:, ids], axis=0) > 0).any(axis=0).all()
+
+
+def test_levels_at_does_not_settle(net):
+    edge = next(iter(net.get_edges()))
+    net.set_qkp_rate(edge, 0.5, cap=3)
+    net.advance_clock(4)
+    pid = net.qkp_ids([edge])[0]
+    levels = net.qkp_levels_at(net.clock - np.array([4.0, 2.0, 0.0]))
+    base = net._qkp[pid]
+    assert (levels[:, pid] - base).tolist() == [0, 1, 2]
+    assert net._qkp[pid] == base
+    net.advance_clock(10)
+    # capped
+    assert net.qkp_levels_at([net.clock])[0, pid] == max(base, 3)
+    assert net.get_qkp(edge) == max(base, 3)
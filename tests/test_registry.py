@@ -0,0 +1,124 @@
+import random
+
+from rwa_wdm.net import Lightpath
+from rwa_wdm.net.net import LightpathRegistry
+
+
+def random_route(rng, num_nodes=10):
+    return rng.sample(range(num_nodes), rng.randint(2, 5))
+
+
+class ScanRegistry(object):
+    """Running lightpaths as the simulators used to keep them: a list whose
+    remaining holding times are all decremented on every event"""
+
+    def __init__(self):
+        self.lightpaths = []
+
+    def add(self, lightpath):
+        self.lightpaths.append([lightpath, lightpath.holding_time])
+
+    def remove(self, _id):
+        self.lightpaths = [e for e in self.lightpaths if e[0].id != _id]
+
+    def advance(self, elapsed):
+        retired = []
+        for entry in list(self.lightpaths):
+            if entry[1] > elapsed:
+                entry[1] -= elapsed
+            else:
+                self.lightpaths.remove(entry)
+                retired.append(entry[0])
+        return retired
+
+
+def test_expiry_matches_scan():
+    rng = random.Random(7)
+    registry, scan = LightpathRegistry(), ScanRegistry()
+    for _ in range(2000):
+        op = rng.random()
+        if op < 0.5:
+            lightpath = Lightpath(random_route(rng), rng.randrange(8))
+            # quarter slots keep both clocks exact, ties included
+            lightpath.holding_time = rng.randint(1, 40) / 4
+            registry.add_lightpath(lightpath)
+            scan.add(lightpath)
+        elif op < 0.6 and scan.lightpaths:
+            _id = rng.choice(scan.lightpaths)[0].id
+            registry.remove_lightpath_by_id(_id)
+            scan.remove(_id)
+        else:
+            elapsed = rng.randint(0, 8) / 4
+            retired = registry.advance_clock(elapsed)
+            expected = scan.advance(elapsed)
+            assert sorted(lp.id for lp in retired) == \
+                sorted(lp.id for lp in expected)
+            # retired in expiry order
+            assert [lp.expiry for lp in retired] == \
+                sorted(lp.expiry for lp in retired)
+        assert sorted(lp.id for lp in registry.lightpaths) == \
+            sorted(e[0].id for e in scan.lightpaths)
+        assert registry.nconns == len(scan.lightpaths)
+
+
+def test_readd_resets_expiry():
+    registry = LightpathRegistry()
+    lightpath = Lightpath([0, 1], 0)
+    lightpath.holding_time = 2
+    registry.add_lightpath(lightpath)
+    registry.advance_clock(1)
+    registry.add_lightpath(lightpath)
+    assert registry.advance_clock(1.5) == []
+    assert registry.advance_clock(0.5) == [lightpath]
+    assert registry.nconns == 0
+
+
+def shares_link(r1, r2):
+    """Pairwise hop comparison of the former vertex coloring"""
+    for m in range(1, len(r1)):
+        for n in range(1, len(r2)):
+            if (r1[m - 1] == r2[n - 1] and r1[m] == r2[n]) or \
+               (r1[m] == r2[n - 1] and r1[m - 1] == r2[n]):
+                return True
+    return False
+
+
+def test_conflicts_match_scan():
+    rng = random.Random(11)
+    registry, live = LightpathRegistry(), {}
+    for _ in range(1000):
+        if rng.random() < 0.6 or not live:
+            lightpath = Lightpath(random_route(rng), rng.randrange(8))
+            lightpath.holding_time = rng.randint(1, 20)
+            registry.add_lightpath(lightpath)
+            live[lightpath.id] = lightpath
+        elif rng.random() < 0.5:
+            _id = rng.choice(sorted(live))
+            registry.remove_lightpath_by_id(_id)
+            del live[_id]
+        else:
+            for lightpath in registry.advance_clock(rng.randint(0, 5)):
+                del live[lightpath.id]
+        route = random_route(rng)
+        expected = [_id for _id in sorted(live)
+                    if shares_link(live[_id].r, route)]
+        assert [lp.id for lp in registry.conflicting(route)] == expected
+
+
+def test_vertex_coloring_matches_scan(net):
+    from rwa_wdm.rwa.wlassignment.vcolor import vertex_coloring
+
+    rng = random.Random(3)
+    for _ in range(200):
+        lightpath = Lightpath(random_route(rng), None)
+        neighbour_colors = {lp.w for lp in net.lightpaths
+                            if lp.w is not None and
+                            shares_link(lp.r, lightpath.r)}
+        expected = min(set(range(len(neighbour_colors) + 1)) -
+                       neighbour_colors)
+        color = vertex_coloring(net, lightpath)
+        assert color == expected
+        lightpath = Lightpath(lightpath.r, color)
+        lightpath.holding_time = rng.randint(1, 30)
+        net.add_lightpath(lightpath)
+        net.advance_clock(1)
@@ -0,0 +1,113 @@
+from rwa_wdm.net import SlotGrid
+
+ROUTE = [1, 8, 9]
+
+
+def test_ongoing_occupation_past_horizon(net):
+    # holding times are much longer than the slot ring
+    assert net.slot_span(100) > net.slots.horizon
+    net.occupy_channel(1, 8, 0, 100)
+    net.advance_clock(40)
+    assert not net.is_free(1, 8, 0)
+    assert net.route_slot_first_fit(ROUTE, 10) == 1
+    assert not net.route_slots_fit(ROUTE, 0, 10)
+    assert net.route_slots_fit(ROUTE, 1, 10)
+    net.advance_clock(60)
+    assert net.is_free(1, 8, 0)
+    assert net.route_slots_fit(ROUTE, 0, 10)
+
+
+def test_channel_held_until_released(net):
+    net.occupy_channel(8, 9, 0)
+    net.advance_clock(1000)
+    assert not net.route_slots_fit(ROUTE, 0, 1)
+    net.release_channel(8, 9, 0)
+    assert net.route_slots_fit(ROUTE, 0, 1)
+
+
+def test_reserve_slots(net):
+    assert not net.has_slot_bookings
+    net.occupy_channel(1, 8, 0, 100)
+    assert net.reserve_slots(ROUTE, 5) == (0, 1)
+    assert net.has_slot_bookings
+    assert net.reserve_slots(ROUTE, 5, w=1) == (5, 1)
+    assert net.reserve_slots(ROUTE, 5, w=1, start=2) is None
+    assert net.reserve_slots(ROUTE, 5, start=3) == (3, 2)
+    assert net.reserve_slots(ROUTE, net.slots.horizon + 1) is None
+    # a booking conflicts even when the ongoing occupation is replaced
+    assert not net.links_slots_fit([(1, 8)], 1, 10, replace=True)
+    assert net.links_slots_fit([(1, 8)], 0, 10, replace=True)
+    net.advance_clock(net.slots.horizon)
+    assert not net.has_slot_bookings
+
+
+def test_grid_earliest_fit():
+    grid = SlotGrid(2, 2, horizon=8)
+    assert grid.empty
+    assert grid.reserve([0, 1], 0, 4, start=2)
+    assert grid.earliest_fit([0, 1], 4) == (0, 1)
+    assert grid.earliest_fit([0], 2) == (0, 0)
+    assert grid.earliest_fit([0], 3) == (0, 1)
+    grid.advance(6)
+    assert grid.empty
+    assert grid.earliest_fit([0, 1], 8) == (0, 0)
+
+
+def test_tp_alloc_time(net):
+    links = [(1, 8), (8, 9)]
+    # nothing booked: the TP holding time is granted as is
+    assert net.tp_alloc_time(links, 1, 10, 15) == 15
+    assert net.reserve_slots([1, 8], 3, w=1, start=12) == (12, 1)
+    assert net.tp_alloc_time(links, 1, 10, 15) == 10
+    assert net.tp_alloc_time(links, 1, 10, 12) == 12
+    assert net.tp_alloc_time(links, 0, 10, 15) == 15
+    assert net.tp_alloc_time(links, [1, 0], 10, 15) == 10
+    # links covered by QKP keys lock no channel
+    assert net.tp_alloc_time(links, [-10, 1], 10, 15) == 15
+    assert net.tp_alloc_time(links, 1, 10, 10) == 10
+
+
+def _run_pb_modified(tmp_path, monkeypatch, book):
+    from argparse import Namespace
+
+    import rwa_wdm.PB_Modified as pb
+
+    holding_times = []
+    make_net = pb.get_net_instance_from_args
+
+    def get_net(*args):
+        net = make_net(*args)
+        advance_clock, add_lightpath = net.advance_clock, net.add_lightpath
+
+        def advance(elapsed):
+            advance_clock(elapsed)
+            if book:
+                # every channel is booked from 10 slots ahead onwards
+                slots = net.slots
+                for eid in range(len(net.get_edges())):
+                    for w in range(net.nchannels):
+                        slots.occupy(eid, w, 10, slots.horizon - 10)
+
+        def add(lightpath):
+            holding_times.append(lightpath.holding_time)
+            add_lightpath(lightpath)
+
+        net.advance_clock, net.add_lightpath = advance, add
+        return net
+
+    monkeypatch.setattr(pb, 'get_net_instance_from_args', get_net)
+    args = Namespace(topology='auxgraph_aux_d2', channels=8, r='dijkstra',
+                     w='first-fit', rwa=None, y=2, load=30, load_min=30,
+                     load_step=1, calls=200, num_sim=1,
+                     result_dir=str(tmp_path), plot=False, plot_topo=False,
+                     routing_backend='networkx')
+    pb.simulator(args)
+    return holding_times
+
+
+def test_pb_modified_tp_falls_back(tmp_path, monkeypatch):
+    # the TP multipliers extend some holding times past the base 10 slots
+    assert max(_run_pb_modified(tmp_path, monkeypatch, False)) > 10
+    # unless that runs into advance reservations
+    holding_times = _run_pb_modified(tmp_path, monkeypatch, True)
+    assert holding_times and max(holding_times) == 10